@@ -1,6 +1,68 @@
-from typing import Any, Dict, List, Optional
+"""
+Claude API access for the RAG chatbot.
+
+Performance profile: this module is network-bound. A query spends seconds
+waiting on the Anthropic API and tool searches, and well under 1% of its wall
+time in Python here. Don't reach for Numba or Cython; there is no numeric hot
+loop to compile. Optimisations belong in fewer round-trips, fewer tokens and
+more cache hits, e.g. prompt caching, streaming with early tool dispatch,
+concurrent tool rounds, response caching and query coalescing.
+"""
+
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import anthropic
+import httpx
+from jsonschema import Draft202012Validator
+from jsonschema.exceptions import best_match
+from response_cache import ResponseCache
+
+# Pool sizing for bursts of concurrent queries; keep-alive outlives short lulls
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=256, max_keepalive_connections=64, keepalive_expiry=60.0
+)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+@lru_cache(maxsize=None)
+def _shared_http_client() -> httpx.Client:
+    """Connection pool shared by every AIGenerator so TLS sessions are reused"""
+    return anthropic.DefaultHttpxClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def _shared_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of _shared_http_client"""
+    return anthropic.DefaultAsyncHttpxClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=8)
+def _shared_client(client_cls: type, api_key: str) -> anthropic.Anthropic:
+    """
+    One SDK client per API key, built on the shared connection pool.
+
+    Keyed on the client class too, so a patched anthropic.Anthropic never
+    receives a client cached before the patch.
+    """
+    return client_cls(api_key=api_key, http_client=_shared_http_client())
+
+
+@lru_cache(maxsize=None)
+def _shared_tool_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by every AIGenerator for a round's tool calls"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool-exec")
+
+
+@lru_cache(maxsize=8)
+def _shared_async_client(client_cls: type, api_key: str) -> anthropic.AsyncAnthropic:
+    """Async counterpart of _shared_client"""
+    return client_cls(api_key=api_key, http_client=_shared_async_http_client())
 
 
 class AIGenerator:
@@ -51,12 +113,204 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    # Cached system block - identical on every call so Anthropic can reuse the prefix
+    SYSTEM_BLOCK = {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    }
+
+    # System content for history-free calls, shared rather than rebuilt per call
+    _SYSTEM_ONLY = [SYSTEM_BLOCK]
+
+    # Shared by every tool-enabled call; never mutated
+    _TOOL_CHOICE_AUTO = {"type": "auto"}
+    # Final call once the tool budget is spent: tools stay in the request so
+    # the cached tools/system prefix still matches, but none may be called
+    _TOOL_CHOICE_NONE = {"type": "none"}
+
+    # Tool rounds (assistant tool_use + user tool_result pairs) sent per call;
+    # older rounds are dropped so prefill stays bounded on long tool loops
+    MAX_HISTORY_TURNS = 6
+
+    # Tool failures Claude cannot work around; answered without another API call
+    _UNAVAILABLE_ERRORS = (ConnectionError, TimeoutError)
+    UNAVAILABLE_MESSAGE = (
+        "I'm having trouble reaching the knowledge base right now. Please retry."
+    )
+
+    # Label for the history block; joined with one concat per call
+    _HISTORY_PREFIX = "Previous conversation:\n"
+
+    # Sessions whose history blocks are remembered for prefix caching
+    MAX_CACHED_SESSIONS = 1024
+
+    def __init__(
+        self, api_key: str, model: str, stream: bool = False, max_rounds: int = 2
+    ):
+        self.client = _shared_client(anthropic.Anthropic, api_key)
+        self.aclient = _shared_async_client(anthropic.AsyncAnthropic, api_key)
         self.model = model
+        self.stream = stream
+        # Sequential tool rounds allowed per query before a text answer is forced
+        self.max_rounds = max_rounds
+
+        # Pre-build base API parameters as a read-only template
+        self._api_template = MappingProxyType(
+            {"model": self.model, "temperature": 0, "max_tokens": 800}
+        )
+        self.base_params = self._api_template
+
+        # Answers to repeated questions, keyed by query, history, model and tools
+        self.response_cache = ResponseCache(maxsize=2048, ttl=600)
+
+        # Last tools list seen and its cache-marked copy, reused while unchanged
+        self._cached_tools: Tuple[Optional[List], Optional[List]] = (None, None)
+
+        # Last tools list hashed for response cache keys and its digest
+        self._tools_digest: Tuple[Optional[List], bytes] = (None, b"")
+
+        # Compiled input_schema validators, keyed by tool name
+        self._tool_validators: Dict[str, Draft202012Validator] = {}
+
+        # History blocks last sent per session, oldest session first
+        self._session_history: Dict[str, List[Dict[str, str]]] = {}
+
+        # Shared pool for running a round's tool calls concurrently
+        self.tool_executor = _shared_tool_executor()
+
+    def _build_system(
+        self, conversation_history: Optional[str], session_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build the structured system content for a request.
+
+        The static prompt is the cached first block; history goes in a second,
+        uncached block so it never invalidates the cached prefix. Within a
+        session, history is split into the blocks sent last turn plus one for
+        what is new, and the cache breakpoint moves to the end, so follow-ups
+        only prefill the latest exchange.
+        """
+        if not conversation_history:
+            return self._SYSTEM_ONLY
+
+        history = self._HISTORY_PREFIX + conversation_history
+        if session_id is None:
+            return [self.SYSTEM_BLOCK, {"type": "text", "text": history}]
+
+        blocks = self._history_blocks(session_id, history)
+        return [
+            self.SYSTEM_BLOCK,
+            *blocks[:-1],
+            {**blocks[-1], "cache_control": {"type": "ephemeral"}},
+        ]
+
+    def _history_blocks(self, session_id: str, history: str) -> List[Dict[str, str]]:
+        """
+        Extend the session's previous history blocks with the new tail.
+
+        When the session window has slid and the old blocks are no longer a
+        prefix, history starts over as a single block.
+        """
+        blocks = self._session_history.pop(session_id, None) or []
+        sent = "".join(block["text"] for block in blocks)
+        if not (blocks and history.startswith(sent)):
+            blocks, sent = [], ""
+        if len(history) > len(sent):
+            blocks = [*blocks, {"type": "text", "text": history[len(sent) :]}]
+
+        # Re-inserting keeps the dict ordered by last use for eviction
+        self._session_history[session_id] = blocks
+        if len(self._session_history) > self.MAX_CACHED_SESSIONS:
+            del self._session_history[next(iter(self._session_history))]
+        return blocks
+
+    def forget_session(self, session_id: str):
+        """Release a session's cached history blocks once it is cleared or deleted"""
+        self._session_history.pop(session_id, None)
+
+    def _with_cached_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Mark the last tool definition as a cache breakpoint for the tool schema.
+
+        The marked copy is kept and handed out again for as long as callers
+        pass the same tools list, so every call shares one list object.
+        """
+        source, marked = self._cached_tools
+        if source is tools:
+            return marked
+
+        marked = [*tools[:-1], {**tools[-1], "cache_control": {"type": "ephemeral"}}]
+        self._cached_tools = (tools, marked)
+        return marked
 
-        # Pre-build base API parameters
-        self.base_params = {"model": self.model, "temperature": 0, "max_tokens": 800}
+    def _params(
+        self,
+        messages: List[Dict[str, Any]],
+        system: List[Dict[str, Any]],
+        tools: Optional[List] = None,
+        final: bool = False,
+    ) -> Dict[str, Any]:
+        """Copy the API template and fill in the per-call fields"""
+        # mappingproxy.copy() is the underlying dict's fast copy; dict() on the
+        # proxy walks it key by key
+        params = self._api_template.copy()
+        params["messages"] = messages
+        params["system"] = system
+        if tools:
+            params["tools"] = tools
+            params["tool_choice"] = (
+                self._TOOL_CHOICE_NONE if final else self._TOOL_CHOICE_AUTO
+            )
+        return params
+
+    def _cache_key(
+        self,
+        query: str,
+        conversation_history: Optional[str],
+        tools: Optional[List],
+    ) -> bytes:
+        """Hash the inputs that determine an answer into a compact cache key"""
+        raw = f"{query}\0{conversation_history or ''}\0{self.model}\0".encode()
+        return hashlib.blake2b(raw + self._tools_key(tools), digest_size=16).digest()
+
+    def _tools_key(self, tools: Optional[List]) -> bytes:
+        """
+        Digest of the full tool schemas, so an edited description or schema
+        never reuses answers given under the old one.
+
+        Like the cache-marked copy, the digest is kept while callers pass the
+        same tools list, so the schemas are serialized once rather than per call.
+        """
+        if not tools:
+            return b""
+
+        source, digest = self._tools_digest
+        if source is tools:
+            return digest
+
+        digest = hashlib.blake2b(
+            json.dumps(tools, sort_keys=True, default=str).encode(), digest_size=16
+        ).digest()
+        self._tools_digest = (tools, digest)
+        return digest
+
+    def _build_initial_params(
+        self,
+        query: str,
+        conversation_history: Optional[str],
+        tools: Optional[List],
+        session_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build the parameters for the first API call of a query"""
+        if tools:
+            self._compile_tool_validators(tools)
+
+        return self._params(
+            [{"role": "user", "content": query}],
+            self._build_system(conversation_history, session_id),
+            self._with_cached_tools(tools) if tools else None,
+        )
 
     def generate_response(
         self,
@@ -64,6 +318,7 @@ Provide only the direct answer to what was asked.
         conversation_history: Optional[str] = None,
         tools: Optional[List] = None,
         tool_manager=None,
+        session_id: Optional[str] = None,
     ) -> str:
         """
         Generate AI response with optional tool usage and conversation context.
@@ -73,150 +328,517 @@ Provide only the direct answer to what was asked.
             conversation_history: Previous messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
+            session_id: Conversation the history belongs to, for prefix caching
 
         Returns:
             Generated response as string
         """
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
+        # Repeated questions are answered without an API call
+        cache_key = self._cache_key(query, conversation_history, tools)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # Prepare API call parameters efficiently
-        api_params = {
-            **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content,
-        }
-
-        # Add tools if available
-        if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
+        api_params = self._build_initial_params(
+            query, conversation_history, tools, session_id
+        )
 
         # Get response from Claude
-        response = self.client.messages.create(**api_params)
+        response, pending = self._create_message(api_params, tool_manager)
 
         # Handle tool execution if needed
         if response.stop_reason == "tool_use" and tool_manager:
-            return self._handle_tool_execution(response, api_params, tool_manager)
+            return self._handle_tool_execution(
+                response, api_params, tool_manager, pending
+            )
+
+        # Only direct answers are cached; tool results go stale as content changes
+        text = response.content[0].text
+        self.response_cache.set(cache_key, text)
+        return text
+
+    async def agenerate_response(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+        session_id: Optional[str] = None,
+    ) -> str:
+        """
+        Async counterpart of generate_response using the AsyncAnthropic client.
+
+        Awaiting the API keeps the event loop free to serve other requests
+        while Claude is generating.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            session_id: Conversation the history belongs to, for prefix caching
+
+        Returns:
+            Generated response as string
+        """
+        cache_key = self._cache_key(query, conversation_history, tools)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        api_params = self._build_initial_params(
+            query, conversation_history, tools, session_id
+        )
+
+        response, pending = await self._acreate_message(api_params, tool_manager)
+
+        if response.stop_reason == "tool_use" and tool_manager:
+            return await self._ahandle_tool_execution(
+                response, api_params, tool_manager, pending
+            )
+
+        text = response.content[0].text
+        self.response_cache.set(cache_key, text)
+        return text
+
+    async def agenerate_response_stream(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+        session_id: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the answer text as Claude generates it.
+
+        Tool rounds run as in agenerate_response, but every call is streamed
+        and its text yielded as it arrives, so the first words reach the
+        caller long before the answer is complete.
 
-        # Return direct response
-        return response.content[0].text
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            session_id: Conversation the history belongs to, for prefix caching
+
+        Yields:
+            Chunks of response text
+        """
+        cache_key = self._cache_key(query, conversation_history, tools)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        params = self._build_initial_params(
+            query, conversation_history, tools, session_id
+        )
+        messages = list(params["messages"])
+        system = params["system"]
+        tools = params.get("tools")
+        round_count = 0
+        breakpoint_block = None
+        chunks = []
+        final = False
+
+        while True:
+            async with self.aclient.messages.stream(**params) as stream:
+                async for text in stream.text_stream:
+                    chunks.append(text)
+                    yield text
+                message = await stream.get_final_message()
+
+            if message.stop_reason != "tool_use" or not tool_manager or final:
+                break
+            if round_count >= self.max_rounds:
+                # No rounds left to run the tools: ask again with tool use off
+                final = True
+                params = self._params(self._window(messages), system, tools, final=True)
+                continue
+
+            round_count += 1
+            try:
+                tool_results = await self._aexecute_tool_round(message, tool_manager)
+            except self._UNAVAILABLE_ERRORS:
+                yield self.UNAVAILABLE_MESSAGE
+                return
+            if not tool_results:
+                yield "I encountered an issue while using the available tools."
+                return
+
+            breakpoint_block = self._move_cache_breakpoint(
+                breakpoint_block, tool_results
+            )
+            messages.extend(
+                (
+                    {"role": "assistant", "content": message.content},
+                    {"role": "user", "content": tool_results},
+                )
+            )
+            final = round_count >= self.max_rounds
+            params = self._params(self._window(messages), system, tools, final=final)
+
+        # Only complete direct answers are cached, as in generate_response
+        if not final and round_count == 0 and message.stop_reason != "tool_use":
+            self.response_cache.set(cache_key, "".join(chunks))
+
+    def _create_message(self, params: Dict[str, Any], tool_manager=None):
+        """
+        Call the Messages API, streaming when enabled.
+
+        While streaming, each tool_use block is dispatched to the tool pool as
+        soon as it closes, so tool latency overlaps the rest of the stream.
+
+        Args:
+            params: Messages API parameters
+            tool_manager: Manager to execute tools early; None disables dispatch
+
+        Returns:
+            Tuple of (final message, {tool_use_id: Future} for started tools)
+        """
+        if not self.stream:
+            return self.client.messages.create(**params), {}
+
+        pending = {}
+        started = set()
+        with self.client.messages.stream(**params) as stream:
+            for event in stream:
+                if (
+                    tool_manager
+                    and event.type == "content_block_stop"
+                    and event.content_block.type == "tool_use"
+                ):
+                    block = event.content_block
+                    key = self._tool_call_key(block)
+                    if key in started:
+                        continue  # duplicate call reuses the first one's result
+                    started.add(key)
+                    pending[block.id] = self.tool_executor.submit(
+                        self._run_tool, block, tool_manager
+                    )
+            message = stream.get_final_message()
+
+        return message, pending
+
+    async def _acreate_message(self, params: Dict[str, Any], tool_manager=None):
+        """Async counterpart of _create_message; early tools run as to_thread tasks"""
+        if not self.stream:
+            return await self.aclient.messages.create(**params), {}
+
+        pending = {}
+        started = set()
+        async with self.aclient.messages.stream(**params) as stream:
+            async for event in stream:
+                if (
+                    tool_manager
+                    and event.type == "content_block_stop"
+                    and event.content_block.type == "tool_use"
+                ):
+                    block = event.content_block
+                    key = self._tool_call_key(block)
+                    if key in started:
+                        continue
+                    started.add(key)
+                    pending[block.id] = asyncio.create_task(
+                        asyncio.to_thread(self._run_tool, block, tool_manager)
+                    )
+            message = await stream.get_final_message()
+
+        return message, pending
+
+    def _compile_tool_validators(self, tools: List[Dict[str, Any]]):
+        """Compile a validator for each tool schema not seen before"""
+        for tool in tools:
+            name = tool.get("name")
+            if name not in self._tool_validators and "input_schema" in tool:
+                self._tool_validators[name] = Draft202012Validator(tool["input_schema"])
+
+    def _run_tool(self, content_block, tool_manager) -> Dict[str, Any]:
+        """Execute a single tool_use block and wrap the outcome as a tool_result"""
+        validator = self._tool_validators.get(content_block.name)
+
+        # Reject malformed arguments up front instead of raising inside the tool
+        if validator is not None and not validator.is_valid(content_block.input):
+            error = best_match(validator.iter_errors(content_block.input))
+            content = f"Tool execution failed: invalid arguments ({error.message})"
+        else:
+            try:
+                content = tool_manager.execute_tool(
+                    content_block.name, content_block.input
+                )
+            except self._UNAVAILABLE_ERRORS:
+                # Retry context will not help; the round is abandoned
+                raise
+            except Exception as e:
+                # Return error result instead of failing completely
+                content = f"Tool execution failed: {str(e)}"
+
+        return {
+            "type": "tool_result",
+            "tool_use_id": content_block.id,
+            "content": content,
+        }
+
+    @staticmethod
+    def _tool_call_key(content_block) -> str:
+        """Identify a tool call by its name and canonicalised arguments"""
+        arguments = json.dumps(content_block.input, sort_keys=True, default=str)
+        return f"{content_block.name}:{arguments}"
+
+    @classmethod
+    def _unique_tool_calls(cls, tool_blocks) -> Tuple[List[str], Dict[str, Any]]:
+        """Key every block and keep the first block for each distinct call"""
+        keys = [cls._tool_call_key(block) for block in tool_blocks]
+        unique: Dict[str, Any] = {}
+        for key, block in zip(keys, tool_blocks):
+            unique.setdefault(key, block)
+        return keys, unique
+
+    @staticmethod
+    def _fan_out_results(
+        tool_blocks, keys: List[str], results: Dict[str, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Answer each tool_use block, replaying one result for duplicate calls"""
+        return [
+            {**results[key], "tool_use_id": block.id}
+            for block, key in zip(tool_blocks, keys)
+        ]
+
+    def _window(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the original question plus the newest MAX_HISTORY_TURNS rounds.
+
+        Messages run question, then (tool_use, tool_result) pairs, so cutting
+        on a pair boundary never leaves a tool_result without its tool_use.
+        Below the cap the list is returned as is, keeping the cached prefix.
+        """
+        keep = 2 * self.MAX_HISTORY_TURNS
+        if len(messages) <= keep + 1:
+            return messages
+        return [messages[0], *messages[-keep:]]
+
+    @staticmethod
+    def _move_cache_breakpoint(
+        previous: Optional[Dict[str, Any]], tool_results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Mark the newest tool_result so the next round's prefill is cached.
+
+        Only the latest round keeps its marker; the API allows four
+        breakpoints per request and the system prompt, tools and session
+        history hold up to three.
+        """
+        if previous is not None:
+            previous.pop("cache_control", None)
+        latest = tool_results[-1]
+        latest["cache_control"] = {"type": "ephemeral"}
+        return latest
 
     def _execute_tool_round(
-        self, response, tool_manager
+        self, response, tool_manager, pending: Optional[Dict[str, Any]] = None
     ) -> Optional[List[Dict[str, Any]]]:
         """
         Execute all tools in a response and return results.
 
+        Independent tool calls in the same response run concurrently and
+        identical calls run once; results keep the order of the tool_use blocks
+        they answer.
+
         Args:
             response: API response potentially containing tool use blocks
             tool_manager: Manager to execute tools
+            pending: Futures for tools already started while streaming
 
         Returns:
             List of tool results or None if no tools were executed
         """
-        tool_results = []
-
-        for content_block in response.content:
-            if content_block.type == "tool_use":
-                try:
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name, **content_block.input
-                    )
-
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result,
-                        }
-                    )
-                except Exception as e:
-                    # Return error result instead of failing completely
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": f"Tool execution failed: {str(e)}",
-                        }
-                    )
+        pending = pending or {}
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+
+        if not tool_blocks:
+            return None
+
+        keys, unique = self._unique_tool_calls(tool_blocks)
+
+        # A single call gains nothing from a thread hop
+        if len(unique) == 1 and not pending:
+            key, block = next(iter(unique.items()))
+            results = {key: self._run_tool(block, tool_manager)}
+        else:
+            futures = {
+                key: pending.get(block.id)
+                or self.tool_executor.submit(self._run_tool, block, tool_manager)
+                for key, block in unique.items()
+            }
+            results = {key: future.result() for key, future in futures.items()}
 
-        return tool_results if tool_results else None
+        return self._fan_out_results(tool_blocks, keys, results)
 
     def _handle_tool_execution(
-        self, initial_response, base_params: Dict[str, Any], tool_manager
+        self,
+        initial_response,
+        base_params: Dict[str, Any],
+        tool_manager,
+        pending: Optional[Dict[str, Any]] = None,
     ):
         """
-        Handle execution of tool calls with support for up to 2 sequential rounds.
+        Handle execution of tool calls for up to max_rounds sequential rounds.
 
         Args:
             initial_response: The response containing tool use requests
             base_params: Base API parameters
             tool_manager: Manager to execute tools
+            pending: Tools already started while the response streamed
 
         Returns:
             Final response text after tool execution
         """
         # Initialize conversation state
-        messages = base_params["messages"].copy()
+        messages = list(base_params["messages"])
         current_response = initial_response
-        max_rounds = 2
         round_count = 0
+        system = base_params["system"]
+        tools = base_params.get("tools")
+        breakpoint_block = None
 
         # Process tool calls in sequential rounds
-        while round_count < max_rounds and current_response.stop_reason == "tool_use":
+        while (
+            round_count < self.max_rounds and current_response.stop_reason == "tool_use"
+        ):
             round_count += 1
 
-            # Add Claude's response to message history
-            messages.append({"role": "assistant", "content": current_response.content})
-
             # Execute tools for this round
-            tool_results = self._execute_tool_round(current_response, tool_manager)
+            try:
+                tool_results = self._execute_tool_round(
+                    current_response, tool_manager, pending
+                )
+            except self._UNAVAILABLE_ERRORS:
+                return self.UNAVAILABLE_MESSAGE
 
             if not tool_results:
                 # No tools executed or error occurred
                 return "I encountered an issue while using the available tools."
 
-            # Add tool results to conversation
-            messages.append({"role": "user", "content": tool_results})
+            # Append-only, so each round's request extends the previous prefix
+            breakpoint_block = self._move_cache_breakpoint(
+                breakpoint_block, tool_results
+            )
+
+            # Add Claude's tool request and our results to the conversation
+            messages.extend(
+                (
+                    {"role": "assistant", "content": current_response.content},
+                    {"role": "user", "content": tool_results},
+                )
+            )
+
+            # Once the tool budget is spent, forbid tool use so Claude must answer
+            tools_left = round_count < self.max_rounds
+            next_params = self._params(
+                self._window(messages), system, tools, final=not tools_left
+            )
 
-            # Check if we've reached max rounds
-            if round_count >= max_rounds:
-                # Max rounds reached, make final call without tools
-                break
+            try:
+                current_response, pending = self._create_message(
+                    next_params, tool_manager if tools_left else None
+                )
+            except Exception as e:
+                return f"Error during tool execution round {round_count}: {str(e)}"
 
-            # Make next API call with tools still available for potential second round
-            next_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": base_params["system"],
-                "tools": base_params.get("tools", []),  # Keep tools available
-                "tool_choice": {"type": "auto"},
-            }
+        return current_response.content[0].text
+
+    async def _aexecute_tool_round(
+        self, response, tool_manager, pending: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Async counterpart of _execute_tool_round.
+
+        Tools are synchronous, so each call runs in a worker thread and the
+        round is gathered; results keep the order of the tool_use blocks.
+        """
+        pending = pending or {}
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+
+        if not tool_blocks:
+            return None
+
+        keys, unique = self._unique_tool_calls(tool_blocks)
+        gathered = await asyncio.gather(
+            *(
+                pending.get(block.id)
+                or asyncio.to_thread(self._run_tool, block, tool_manager)
+                for block in unique.values()
+            )
+        )
+
+        return self._fan_out_results(tool_blocks, keys, dict(zip(unique, gathered)))
+
+    async def _ahandle_tool_execution(
+        self,
+        initial_response,
+        base_params: Dict[str, Any],
+        tool_manager,
+        pending: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Async counterpart of _handle_tool_execution (up to max_rounds rounds).
+
+        Args:
+            initial_response: The response containing tool use requests
+            base_params: Base API parameters
+            tool_manager: Manager to execute tools
+            pending: Tools already started while the response streamed
+
+        Returns:
+            Final response text after tool execution
+        """
+        messages = list(base_params["messages"])
+        current_response = initial_response
+        round_count = 0
+        system = base_params["system"]
+        tools = base_params.get("tools")
+        breakpoint_block = None
+
+        while (
+            round_count < self.max_rounds and current_response.stop_reason == "tool_use"
+        ):
+            round_count += 1
 
             try:
-                current_response = self.client.messages.create(**next_params)
+                tool_results = await self._aexecute_tool_round(
+                    current_response, tool_manager, pending
+                )
+            except self._UNAVAILABLE_ERRORS:
+                return self.UNAVAILABLE_MESSAGE
 
-                # If Claude responds with text only (no more tools), return that response
-                if current_response.stop_reason != "tool_use":
-                    return current_response.content[0].text
+            if not tool_results:
+                return "I encountered an issue while using the available tools."
+
+            # Append-only, so each round's request extends the previous prefix
+            breakpoint_block = self._move_cache_breakpoint(
+                breakpoint_block, tool_results
+            )
+            messages.extend(
+                (
+                    {"role": "assistant", "content": current_response.content},
+                    {"role": "user", "content": tool_results},
+                )
+            )
+
+            tools_left = round_count < self.max_rounds
+            next_params = self._params(
+                self._window(messages), system, tools, final=not tools_left
+            )
 
+            try:
+                current_response, pending = await self._acreate_message(
+                    next_params, tool_manager if tools_left else None
+                )
             except Exception as e:
                 return f"Error during tool execution round {round_count}: {str(e)}"
 
-        # After loop: either max rounds reached or Claude stopped using tools
-        # Make final call without tools to get text response
-        final_params = {
-            **self.base_params,
-            "messages": messages,
-            "system": base_params["system"],
-            # No tools parameter - forcing text response
-        }
-
-        final_response = self.client.messages.create(**final_params)
-        return final_response.content[0].text
+        return current_response.content[0].text
@@ -23,6 +23,42 @@ class Config:
     CHUNK_OVERLAP: int = 100  # Characters to overlap between chunks
     MAX_RESULTS: int = 5  # Maximum search results to return
     MAX_HISTORY: int = 2  # Number of conversation messages to remember
+    HISTORY_TOKEN_BUDGET: int = 2000  # Approximate token cap on sent history
+    MAX_TOOL_ROUNDS: int = 2  # Sequential tool rounds before forcing an answer
+    # Skip the tool schema for questions without course-related keywords
+    TOOL_GATING: bool = os.getenv("TOOL_GATING", "false").lower() == "true"
+    # Answer catalog listings and outline requests from the store, without Claude
+    DIRECT_LOOKUP: bool = os.getenv("DIRECT_LOOKUP", "false").lower() == "true"
+
+    # Answer concurrent identical history-free queries with one API call
+    BATCH_QUERIES: bool = os.getenv("BATCH_QUERIES", "false").lower() == "true"
+
+    # Reuse answers to exact repeats of a question within the same conversation
+    QUERY_CACHE: bool = os.getenv("QUERY_CACHE", "false").lower() == "true"
+    QUERY_CACHE_SIZE: int = 2048  # Entries kept before the least recent is evicted
+    QUERY_CACHE_TTL: float = 600.0  # Seconds a cached answer stays valid
+
+    # Reuse vector search results for repeated searches until the data changes
+    SEARCH_CACHE: bool = os.getenv("SEARCH_CACHE", "false").lower() == "true"
+    SEARCH_CACHE_SIZE: int = 1000  # Entries kept before the least recent is evicted
+    SEARCH_CACHE_TTL: float = 300.0  # Seconds cached search results stay valid
+
+    # Reuse answers to near-duplicate questions (cosine similarity of embeddings)
+    SEMANTIC_CACHE: bool = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+    SEMANTIC_CACHE_SIZE: int = 4096  # Entries kept before the oldest is replaced
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Minimum similarity for a hit
+
+    # Stream Claude's responses so tool calls start before the reply finishes
+    STREAM_RESPONSES: bool = os.getenv("STREAM_RESPONSES", "false").lower() == "true"
+
+    # Search small content collections by exact scan instead of the HNSW index
+    EXACT_SEARCH: bool = os.getenv("EXACT_SEARCH", "false").lower() == "true"
+    EXACT_SEARCH_MAX_CHUNKS: int = 2000  # Larger collections keep using the index
+    # Hold the exact-search copy as int8 codes, re-scoring a float32 shortlist
+    EXACT_SEARCH_INT8: bool = os.getenv("EXACT_SEARCH_INT8", "false").lower() == "true"
+
+    # Build new collections on a cosine HNSW index tuned for small corpora
+    COSINE_HNSW: bool = os.getenv("COSINE_HNSW", "false").lower() == "true"
 
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
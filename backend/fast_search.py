@@ -0,0 +1,180 @@
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from quant import int8_dot, quantize_int8
+
+
+def nearest(
+    query: np.ndarray,
+    matrix: np.ndarray,
+    k: int,
+    space: str = "l2",
+    row_norms: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact k-nearest-neighbour search over the rows of a matrix.
+
+    Below a few thousand vectors one matrix-vector product beats walking an
+    HNSW graph. Distances follow ChromaDB's definitions for each space, so
+    results can stand in for a collection query.
+
+    Args:
+        query: Query vector, shape (d,)
+        matrix: Candidate vectors, shape (n, d)
+        k: Number of neighbours to return
+        space: "l2" (squared euclidean), "cosine" or "ip"
+        row_norms: Precomputed euclidean norms of the rows, if available
+
+    Returns:
+        Tuple of (row indices, distances), nearest first
+    """
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if row_norms is None and space in ("l2", "cosine"):
+        row_norms = np.linalg.norm(matrix, axis=1)
+
+    distances = _distances(matrix @ query, query, row_norms, space)
+    indices = _top_k(distances, k)
+    return indices, distances[indices]
+
+
+def _distances(scores, query, row_norms, space: str) -> np.ndarray:
+    """Chroma's distance for each row, given the rows' dot products with query"""
+    if space == "l2":
+        return row_norms**2 - 2 * scores + query @ query
+    if space == "cosine":
+        norms = row_norms * np.linalg.norm(query)
+        return 1 - scores / np.maximum(norms, np.finfo(np.float32).tiny)
+    if space == "ip":
+        return 1 - scores
+    raise ValueError(f"Unknown distance space: {space}")
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest distances, smallest first"""
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Partial sort: only the k best candidates are ordered. When k is close to
+    # N the partition saves little, so one full sort is cheaper.
+    if 2 * k >= len(distances):
+        return np.argsort(distances, kind="stable")[:k]
+    indices = np.argpartition(distances, k - 1)[:k]
+    return indices[np.argsort(distances[indices], kind="stable")]
+
+
+class ContentMatrix:
+    """
+    Column-oriented in-memory copy of a content collection for exact search.
+
+    Embeddings sit in one contiguous float32 matrix with their norms
+    precomputed, and the filterable metadata in parallel integer arrays, so
+    course and lesson filters are a vectorised mask instead of a Python loop
+    over metadata dicts.
+
+    Given `fetch_embeddings`, the matrix is kept as int8 codes instead (a
+    quarter of the memory). Scans then shortlist `rerank` candidates from the
+    codes and re-score only those with their float32 embeddings, fetched by
+    id, so returned distances stay exact.
+    """
+
+    def __init__(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        space: str = "l2",
+        ids: Optional[List[str]] = None,
+        fetch_embeddings: Optional[Callable[[List[str]], np.ndarray]] = None,
+        rerank: int = 32,
+    ):
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.norms = np.linalg.norm(vectors, axis=1)
+        self.documents = documents
+        self.metadatas = metadatas
+        self.space = space
+        self.ids = ids
+        self.fetch_embeddings = fetch_embeddings
+        self.rerank = rerank
+
+        if fetch_embeddings is None:
+            self.embeddings, self.codes, self.scales = vectors, None, None
+        else:
+            self.embeddings = None
+            self.codes, self.scales = quantize_int8(vectors)
+
+        # Course titles become small integer codes; -1 marks a missing lesson
+        self.course_codes: Dict[str, int] = {}
+        self.courses = np.array(
+            [
+                self.course_codes.setdefault(
+                    meta.get("course_title"), len(self.course_codes)
+                )
+                for meta in metadatas
+            ],
+            dtype=np.int32,
+        )
+        self.lessons = np.array(
+            [
+                -1 if meta.get("lesson_number") is None else meta["lesson_number"]
+                for meta in metadatas
+            ],
+            dtype=np.int32,
+        )
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        limit: int,
+        course_title: Optional[str] = None,
+        lesson_number: Optional[int] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[float]]:
+        """
+        Nearest rows to a query embedding among those matching the filters.
+
+        Returns:
+            Tuple of (documents, metadatas, distances), nearest first
+        """
+        if course_title is not None and course_title not in self.course_codes:
+            return [], [], []
+
+        rows = np.ones(len(self), dtype=bool)
+        if course_title is not None:
+            rows &= self.courses == self.course_codes[course_title]
+        if lesson_number is not None:
+            rows &= self.lessons == lesson_number
+        candidates = np.flatnonzero(rows)
+        if len(candidates) == 0:
+            return [], [], []
+        # Unfiltered scans read the arrays in place rather than copying them
+        select = (lambda array: array) if rows.all() else itemgetter(candidates)
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if self.codes is None:
+            matrix = select(self.embeddings)
+        else:
+            # Shortlist from the int8 codes, then re-score in float32
+            approximate = _distances(
+                int8_dot(query, select(self.codes), select(self.scales)),
+                query,
+                select(self.norms),
+                self.space,
+            )
+            candidates = candidates[_top_k(approximate, max(limit, self.rerank))]
+            matrix = self.fetch_embeddings([self.ids[i] for i in candidates])
+            select = itemgetter(candidates)
+
+        indices, distances = nearest(
+            query, matrix, limit, self.space, row_norms=select(self.norms)
+        )
+        indices = candidates[indices]
+        return (
+            [self.documents[i] for i in indices],
+            [self.metadatas[i] for i in indices],
+            distances.tolist(),
+        )
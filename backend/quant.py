@@ -0,0 +1,28 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def quantize_int8(vectors) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization.
+
+    Each row is scaled so its largest component maps to +/-127, so that
+    vectors ~= codes * scales[:, None].
+
+    Returns:
+        Tuple of (int8 codes, float32 per-row scales)
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_dot(query, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Approximate dot products of a float query with quantized rows"""
+    query_codes, query_scale = quantize_int8(query)
+    # Accumulate in int32 so the int8 products cannot overflow
+    products = np.einsum("ij,j->i", codes, query_codes[0].astype(np.int32))
+    return products * scales * query_scale[0]
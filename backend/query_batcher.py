@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent identical history-free queries into one generation.
+
+    Only exact repeats share a call: each distinct question still gets its own
+    prompt and tool path, so no user's text can reach another user's answer.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def submit(self, query: str, generate: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Answer a query, joining an identical query already in flight.
+
+        Args:
+            query: User's question, the coalescing key
+            generate: Produces the answer when no identical query is running
+
+        Returns:
+            Whatever generate returned for the first caller
+        """
+        future = self._in_flight.get(query)
+        if future is None:
+            future = asyncio.ensure_future(generate())
+            self._in_flight[query] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(query, None))
+
+        # One caller giving up must not cancel the call the others wait on
+        return await asyncio.shield(future)
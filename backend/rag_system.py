@@ -1,18 +1,61 @@
+import asyncio
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from ai_generator import AIGenerator
 from document_processor import DocumentProcessor
 from models import Course, CourseChunk, Lesson
+from query_batcher import QueryBatcher
+from response_cache import ResponseCache
 from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
+from semantic_cache import SemanticCache
 from session_manager import SessionManager
-from vector_store import VectorStore
+from vector_store import COSINE_HNSW, VectorStore
+
+# Words that suggest a question is about the course catalog or its content
+COURSE_KEYWORDS = frozenset(
+    {
+        "course",
+        "courses",
+        "lesson",
+        "lessons",
+        "outline",
+        "syllabus",
+        "module",
+        "modules",
+        "instructor",
+        "chapter",
+        "curriculum",
+        "taught",
+        "covered",
+        "covers",
+    }
+)
+
+
+# Structural questions answered straight from the course catalog
+COURSE_LIST_RE = re.compile(
+    r"^\s*(?:what|which|list|show)(?: me)?(?: all)?(?: the)?(?: available)? courses"
+    r"(?: (?:are|do you have|are there))?(?: (?:available|offered|there))?\s*[?.!]?\s*$",
+    re.IGNORECASE,
+)
+COURSE_OUTLINE_RE = re.compile(
+    r"^\s*(?:show|give|get|what is)(?: me)? (?:the )?(?:course )?(?:outline|syllabus)"
+    r" (?:for|of) (?:the )?(?P<course>.+?)(?: course)?\s*[?.!]?\s*$",
+    re.IGNORECASE,
+)
+
+
+def likely_needs_tools(query: str) -> bool:
+    """Cheap keyword check for whether a query should be offered the search tools"""
+    return not COURSE_KEYWORDS.isdisjoint(re.findall(r"[a-z]+", query.lower()))
 
 
 class RAGSystem:
     """Main orchestrator for the Retrieval-Augmented Generation system"""
 
-    def __init__(self, config):
+    def __init__(self, config, query_cache: Optional[ResponseCache] = None):
         self.config = config
 
         # Initialize core components
@@ -20,12 +63,31 @@ class RAGSystem:
             config.CHUNK_SIZE, config.CHUNK_OVERLAP
         )
         self.vector_store = VectorStore(
-            config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
+            config.CHROMA_PATH,
+            config.EMBEDDING_MODEL,
+            config.MAX_RESULTS,
+            hnsw=COSINE_HNSW if config.COSINE_HNSW else None,
+            search_cache=(
+                ResponseCache(config.SEARCH_CACHE_SIZE, config.SEARCH_CACHE_TTL)
+                if config.SEARCH_CACHE
+                else None
+            ),
+            exact_search_max=(
+                config.EXACT_SEARCH_MAX_CHUNKS if config.EXACT_SEARCH else 0
+            ),
+            exact_search_int8=config.EXACT_SEARCH_INT8,
         )
         self.ai_generator = AIGenerator(
-            config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            stream=config.STREAM_RESPONSES,
+            max_rounds=config.MAX_TOOL_ROUNDS,
+        )
+        self.session_manager = SessionManager(
+            config.MAX_HISTORY,
+            config.HISTORY_TOKEN_BUDGET,
+            on_session_dropped=self.ai_generator.forget_session,
         )
-        self.session_manager = SessionManager(config.MAX_HISTORY)
 
         # Initialize search tools
         self.tool_manager = ToolManager()
@@ -34,6 +96,23 @@ class RAGSystem:
         self.tool_manager.register_tool(self.search_tool)
         self.tool_manager.register_tool(self.outline_tool)
 
+        # Optional coalescing of concurrent identical history-free queries
+        self.query_batcher = QueryBatcher() if config.BATCH_QUERIES else None
+
+        # Optional reuse of answers to exact repeats; callers may inject a cache
+        if query_cache is None and config.QUERY_CACHE:
+            query_cache = ResponseCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
+        self.query_cache = query_cache
+
+        # Optional reuse of answers to near-duplicate questions
+        self.semantic_cache = None
+        if config.SEMANTIC_CACHE:
+            self.semantic_cache = SemanticCache(
+                self.vector_store.embedding_function,
+                config.SEMANTIC_CACHE_SIZE,
+                config.SEMANTIC_CACHE_THRESHOLD,
+            )
+
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
         Add a single course document to the knowledge base.
@@ -55,6 +134,7 @@ class RAGSystem:
 
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
+            self._invalidate_cached_answers()
 
             return course, len(course_chunks)
         except Exception as e:
@@ -81,6 +161,7 @@ class RAGSystem:
         if clear_existing:
             print("Clearing existing data for fresh rebuild...")
             self.vector_store.clear_all_data()
+            self._invalidate_cached_answers()
 
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
@@ -88,6 +169,7 @@ class RAGSystem:
 
         # Get existing course titles to avoid re-processing
         existing_course_titles = set(self.vector_store.get_existing_course_titles())
+        new_courses: List[Tuple[Course, List[CourseChunk]]] = []
 
         # Process each file in the folder
         for file_name in os.listdir(folder_path):
@@ -103,22 +185,76 @@ class RAGSystem:
                     )
 
                     if course and course.title not in existing_course_titles:
-                        # This is a new course - add it to the vector store
-                        self.vector_store.add_course_metadata(course)
-                        self.vector_store.add_course_content(course_chunks)
-                        total_courses += 1
-                        total_chunks += len(course_chunks)
-                        print(
-                            f"Added new course: {course.title} ({len(course_chunks)} chunks)"
-                        )
+                        # This is a new course - queue it for the batched write
+                        new_courses.append((course, course_chunks))
                         existing_course_titles.add(course.title)
                     elif course:
                         print(f"Course already exists: {course.title} - skipping")
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
 
+        if new_courses:
+            total_courses, total_chunks = self._add_new_courses(new_courses)
         return total_courses, total_chunks
 
+    def _add_new_courses(
+        self, new_courses: List[Tuple[Course, List[CourseChunk]]]
+    ) -> Tuple[int, int]:
+        """
+        Store parsed courses with one write per collection, so every chunk is
+        embedded in a single embedding call instead of one call per course.
+
+        If the batch fails, each course is retried on its own, so one bad
+        course cannot keep the others out.
+
+        Returns:
+            Tuple of (courses added, chunks added)
+        """
+        try:
+            self._store_courses(new_courses)
+            added = new_courses
+        except Exception as e:
+            print(f"Batched add failed, adding courses one at a time: {e}")
+            added = [entry for entry in new_courses if self._store_course(entry)]
+
+        for course, course_chunks in added:
+            print(f"Added new course: {course.title} ({len(course_chunks)} chunks)")
+        if added:
+            self._invalidate_cached_answers()
+        return len(added), sum(len(chunks) for _, chunks in added)
+
+    def _store_course(self, entry: Tuple[Course, List[CourseChunk]]) -> bool:
+        """Store one course, reporting rather than raising a failure"""
+        try:
+            self._store_courses([entry])
+            return True
+        except Exception as e:
+            print(f"Error adding course {entry[0].title}: {e}")
+            return False
+
+    def _store_courses(self, courses: List[Tuple[Course, List[CourseChunk]]]):
+        """Write catalog entries, then chunks; a failed chunk write undoes both"""
+        self.vector_store.add_course_metadata(*(course for course, _ in courses))
+        try:
+            self.vector_store.add_course_content(
+                [chunk for _, course_chunks in courses for chunk in course_chunks]
+            )
+        except Exception:
+            # A catalog entry without content would be skipped as "already
+            # exists" by every later load, so it must not outlive the failure
+            self.vector_store.delete_course_metadata(
+                [course.title for course, _ in courses]
+            )
+            raise
+
+    def _invalidate_cached_answers(self):
+        """Drop cached answers once the course content they came from changes"""
+        self.ai_generator.response_cache.clear()
+        if self.query_cache is not None:
+            self.query_cache.clear()
+        if self.semantic_cache:
+            self.semantic_cache.clear()
+
     def query(
         self, query: str, session_id: Optional[str] = None
     ) -> Tuple[str, List[str]]:
@@ -132,28 +268,285 @@ class RAGSystem:
         Returns:
             Tuple of (response, sources list - empty for tool-based approach)
         """
-        # Create prompt for the AI with clear instructions
-        prompt = f"""Answer this question about course materials: {query}"""
+        prompt, history = self._prepare_query(query, session_id)
 
-        # Get conversation history if session exists
-        history = None
-        if session_id:
-            history = self.session_manager.get_conversation_history(session_id)
+        # Catalog listings and outlines need no generation at all
+        direct = self._direct_answer(query)
+        if direct is not None:
+            return self._complete_query(query, session_id, direct)
+
+        # Exact repeats of a question and its history reuse their answer
+        query_key = None
+        if self.query_cache is not None:
+            query_key = (query, history)
+            cached = self._query_cache_hit(query_key, query, session_id)
+            if cached:
+                return cached
+
+        # Near-duplicates of earlier fresh questions reuse their answer
+        cache_vector = None
+        if self.semantic_cache and not history:
+            cache_vector = self.semantic_cache.embed_query(query)
+            cached = self._semantic_cache_hit(cache_vector, query, session_id)
+            if cached:
+                return cached
 
         # Generate response using AI with tools
         response = self.ai_generator.generate_response(
             query=prompt,
             conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
+            tools=self._tools_for(query),
             tool_manager=self.tool_manager,
+            session_id=session_id,
+        )
+
+        return self._complete_query(
+            query, session_id, response, cache_vector, query_key
         )
 
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
+    async def aquery(
+        self, query: str, session_id: Optional[str] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Async counterpart of query for use inside the event loop.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Returns:
+            Tuple of (response, sources list)
+        """
+        prompt, history = self._prepare_query(query, session_id)
+
+        # Keep this query's sources separate from other in-flight queries
+        self.tool_manager.start_request_scope()
+
+        direct = await asyncio.to_thread(self._direct_answer, query)
+        if direct is not None:
+            return self._complete_query(query, session_id, direct)
+
+        query_key = None
+        if self.query_cache is not None:
+            query_key = (query, history)
+            cached = self._query_cache_hit(query_key, query, session_id)
+            if cached:
+                return cached
+
+        cache_vector = None
+        if self.semantic_cache and not history:
+            cache_vector = await asyncio.to_thread(
+                self.semantic_cache.embed_query, query
+            )
+            cached = self._semantic_cache_hit(cache_vector, query, session_id)
+            if cached:
+                return cached
+
+        # Fresh conversations asking the same question at once share one call
+        if self.query_batcher and not history:
+            response, sources = await self.query_batcher.submit(
+                query, lambda: self._agenerate_with_sources(prompt, query)
+            )
+            return self._complete_query(
+                query, session_id, response, cache_vector, query_key, sources
+            )
+
+        response = await self.ai_generator.agenerate_response(
+            query=prompt,
+            conversation_history=history,
+            tools=self._tools_for(query),
+            tool_manager=self.tool_manager,
+            session_id=session_id,
+        )
+
+        return self._complete_query(
+            query, session_id, response, cache_vector, query_key
+        )
+
+    async def _agenerate_with_sources(
+        self, prompt: str, query: str
+    ) -> Tuple[str, List[str]]:
+        """Answer a history-free query, returning the sources its tools found"""
+        response = await self.ai_generator.agenerate_response(
+            query=prompt, tools=self._tools_for(query), tool_manager=self.tool_manager
+        )
+        return response, list(self.tool_manager.get_last_sources())
+
+    async def aquery_stream(
+        self, query: str, session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of aquery.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Yields:
+            {"type": "token", "text": ...} events as the answer is generated,
+            then one {"type": "done", "answer": ..., "sources": [...]} event
+        """
+        prompt, history = self._prepare_query(query, session_id)
+
+        # Keep this query's sources separate from other in-flight queries
+        self.tool_manager.start_request_scope()
+
+        direct = await asyncio.to_thread(self._direct_answer, query)
+        if direct is not None:
+            response, sources = self._complete_query(query, session_id, direct)
+            yield {"type": "token", "text": response}
+            yield {"type": "done", "answer": response, "sources": sources}
+            return
+
+        query_key = None
+        if self.query_cache is not None:
+            query_key = (query, history)
+            cached = self._query_cache_hit(query_key, query, session_id)
+            if cached:
+                response, sources = cached
+                yield {"type": "token", "text": response}
+                yield {"type": "done", "answer": response, "sources": sources}
+                return
+
+        cache_vector = None
+        if self.semantic_cache and not history:
+            cache_vector = await asyncio.to_thread(
+                self.semantic_cache.embed_query, query
+            )
+            cached = self._semantic_cache_hit(cache_vector, query, session_id)
+            if cached:
+                response, sources = cached
+                yield {"type": "token", "text": response}
+                yield {"type": "done", "answer": response, "sources": sources}
+                return
+
+        chunks = []
+        async for text in self.ai_generator.agenerate_response_stream(
+            query=prompt,
+            conversation_history=history,
+            tools=self._tools_for(query),
+            tool_manager=self.tool_manager,
+            session_id=session_id,
+        ):
+            chunks.append(text)
+            yield {"type": "token", "text": text}
+
+        response, sources = self._complete_query(
+            query, session_id, "".join(chunks), cache_vector, query_key
+        )
+        yield {"type": "done", "answer": response, "sources": sources}
+
+    def _prepare_query(
+        self, query: str, session_id: Optional[str]
+    ) -> Tuple[str, Optional[str]]:
+        """Build the AI prompt and fetch conversation history for a query"""
+        # Create prompt for the AI with clear instructions
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        # Get conversation history if session exists
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        return prompt, history
+
+    def _direct_answer(self, query: str) -> Optional[str]:
+        """
+        Answer a catalog listing or outline request without calling Claude.
+
+        Returns None when the query is not one of those shapes or the course
+        title does not match, so the caller falls back to the normal flow.
+        """
+        if not self.config.DIRECT_LOOKUP:
+            return None
+
+        if COURSE_LIST_RE.match(query):
+            titles = self.vector_store.get_existing_course_titles()
+            if not titles:
+                return None
+            lines = [f"**Available courses ({len(titles)}):**"]
+            lines.extend(f"- {title}" for title in titles)
+            return "\n".join(lines)
+
+        match = COURSE_OUTLINE_RE.match(query)
+        # Only a title match is certain enough to skip Claude: the embedding
+        # fallback always picks some course, even for one that does not exist
+        title = match and self.vector_store.match_course_title(match["course"])
+        if title:
+            outline = self.tool_manager.execute_tool(
+                "get_course_outline", {"course_title": title}
+            )
+            # The outline tool records a source only when it found the course
+            if self.tool_manager.get_last_sources():
+                return outline
+
+        return None
+
+    def _tools_for(self, query: str) -> Optional[List[Dict]]:
+        """Tool definitions to offer for a query, or None to skip tools entirely"""
+        if self.config.TOOL_GATING and not likely_needs_tools(query):
+            return None
+        return self.tool_manager.get_tool_definitions()
+
+    def _query_cache_hit(
+        self, query_key, query: str, session_id: Optional[str]
+    ) -> Optional[Tuple[str, List[str]]]:
+        """Serve a cached answer for an exact repeat of a question, if there is one"""
+        return self._serve_cached(self.query_cache.get(query_key), query, session_id)
+
+    def _semantic_cache_hit(
+        self, cache_vector, query: str, session_id: Optional[str]
+    ) -> Optional[Tuple[str, List[str]]]:
+        """Serve a cached answer for a near-duplicate question, if there is one"""
+        cached = self.semantic_cache.lookup(cache_vector, self._tools_signature(query))
+        return self._serve_cached(cached, query, session_id)
+
+    def _serve_cached(
+        self, cached, query: str, session_id: Optional[str]
+    ) -> Optional[Tuple[str, List[str]]]:
+        """Record a cache hit in the conversation and return a copy of its answer"""
+        if cached is None:
+            return None
+
+        response, sources = cached
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, response)
+
+        return response, list(sources)
+
+    def _tools_signature(self, query: str) -> str:
+        """Identify the tool set offered for a query so cached answers match it"""
+        return ",".join(sorted(tool["name"] for tool in self._tools_for(query) or []))
+
+    def _complete_query(
+        self,
+        query: str,
+        session_id: Optional[str],
+        response: str,
+        cache_vector=None,
+        query_key=None,
+        sources: Optional[List[str]] = None,
+    ) -> Tuple[str, List[str]]:
+        """
+        Collect sources and record the exchange once a response is generated.
+
+        Sources come from the search tool unless given, as they are for an
+        answer shared with a coalesced query.
+        """
+        if sources is None:
+            sources = self.tool_manager.get_last_sources()
 
         # Reset sources after retrieving them
         self.tool_manager.reset_sources()
 
+        # Remember the answer for exact repeats and near-duplicate questions
+        if query_key is not None:
+            self.query_cache.set(query_key, (response, list(sources)))
+        if cache_vector is not None:
+            self.semantic_cache.store(
+                cache_vector, self._tools_signature(query), (response, list(sources))
+            )
+
         # Update conversation history
         if session_id:
             self.session_manager.add_exchange(session_id, query, response)
@@ -1,8 +1,56 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Protocol
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Protocol
 
 from vector_store import SearchResults, VectorStore
 
+# Sources recorded per request, keyed by tool. Only set inside a request scope
+# (see ToolManager.start_request_scope) so concurrent async queries stay isolated.
+_request_sources: ContextVar[Optional[Dict["Tool", list]]] = ContextVar(
+    "request_sources", default=None
+)
+
+
+# Tool schemas are static, so each is built once at import and shared by every
+# instance and request; callers must not mutate them.
+_OUTLINE_DEFINITION: Dict[str, Any] = {
+    "name": "get_course_outline",
+    "description": "Get complete course outline including title, link, and all lessons",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "course_title": {
+                "type": "string",
+                "description": "Course title to get outline for (partial matches work)",
+            }
+        },
+        "required": ["course_title"],
+    },
+}
+
+_SEARCH_DEFINITION: Dict[str, Any] = {
+    "name": "search_course_content",
+    "description": "Search course materials with smart course name matching and lesson filtering",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "What to search for in the course content",
+            },
+            "course_name": {
+                "type": "string",
+                "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
+            },
+            "lesson_number": {
+                "type": "integer",
+                "description": "Specific lesson number to search within (e.g. 1, 2, 3)",
+            },
+        },
+        "required": ["query"],
+    },
+}
+
 
 class Tool(ABC):
     """Abstract base class for all tools"""
@@ -17,6 +65,13 @@ class Tool(ABC):
         """Execute the tool with given parameters"""
         pass
 
+    def _record_sources(self, sources: list):
+        """Track sources on the tool and in the current request scope, if any"""
+        self.last_sources = sources
+        request_sources = _request_sources.get()
+        if request_sources is not None:
+            request_sources[self] = sources
+
 
 class CourseOutlineTool(Tool):
     """Tool for retrieving course outline with lesson structure"""
@@ -27,20 +82,7 @@ class CourseOutlineTool(Tool):
 
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "get_course_outline",
-            "description": "Get complete course outline including title, link, and all lessons",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "course_title": {
-                        "type": "string",
-                        "description": "Course title to get outline for (partial matches work)",
-                    }
-                },
-                "required": ["course_title"],
-            },
-        }
+        return _OUTLINE_DEFINITION
 
     def execute(self, course_title: str) -> str:
         """
@@ -52,21 +94,17 @@ class CourseOutlineTool(Tool):
         Returns:
             Formatted course outline or error message
         """
-        import json
-
         # Resolve course name using semantic search
         resolved_title = self.store._resolve_course_name(course_title)
         if not resolved_title:
             return f"No course found matching '{course_title}'"
 
         try:
-            # Get course metadata directly from catalog
-            results = self.store.course_catalog.get(ids=[resolved_title])
-            if not results or not results["metadatas"] or not results["metadatas"][0]:
+            # Catalog metadata, lessons already parsed (memoized by the store)
+            metadata = self.store.get_course_metadata(resolved_title)
+            if not metadata:
                 return f"No metadata found for course '{course_title}'"
 
-            metadata = results["metadatas"][0]
-
             # Build formatted outline
             outline = []
             outline.append(f"**Course Title:** {metadata.get('title', 'Unknown')}")
@@ -80,10 +118,8 @@ class CourseOutlineTool(Tool):
             instructor = metadata.get("instructor", "Unknown")
             outline.append(f"**Instructor:** {instructor}")
 
-            # Parse and format lessons
-            lessons_json = metadata.get("lessons_json", "[]")
-            lessons = json.loads(lessons_json)
-
+            # Format lessons
+            lessons = metadata.get("lessons", [])
             if lessons:
                 outline.append(f"\n**Lessons ({len(lessons)} total):**")
                 for lesson in lessons:
@@ -102,7 +138,7 @@ class CourseOutlineTool(Tool):
             source_data = {"text": metadata.get("title", "Unknown")}
             if course_link:
                 source_data["link"] = course_link
-            self.last_sources = [source_data]
+            self._record_sources([source_data])
 
             return "\n".join(outline)
 
@@ -119,28 +155,7 @@ class CourseSearchTool(Tool):
 
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "search_course_content",
-            "description": "Search course materials with smart course name matching and lesson filtering",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "What to search for in the course content",
-                    },
-                    "course_name": {
-                        "type": "string",
-                        "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
-                    },
-                    "lesson_number": {
-                        "type": "integer",
-                        "description": "Specific lesson number to search within (e.g. 1, 2, 3)",
-                    },
-                },
-                "required": ["query"],
-            },
-        }
+        return _SEARCH_DEFINITION
 
     def execute(
         self,
@@ -183,48 +198,55 @@ class CourseSearchTool(Tool):
 
     def _format_results(self, results: SearchResults) -> str:
         """Format search results with course and lesson context"""
+        contexts = [
+            (meta.get("course_title", "unknown"), meta.get("lesson_number"))
+            for meta in results.metadata
+        ]
+        # Fetch every distinct course/lesson's links in one store call
+        unique_contexts = list(dict.fromkeys(contexts))
+        links = dict(zip(unique_contexts, self.store.get_links_bulk(unique_contexts)))
+
         formatted = []
         sources = []  # Track sources for the UI (with links)
-
-        for doc, meta in zip(results.documents, results.metadata):
-            course_title = meta.get("course_title", "unknown")
-            lesson_num = meta.get("lesson_number")
-
-            # Build context header
-            header = f"[{course_title}"
-            if lesson_num is not None:
-                header += f" - Lesson {lesson_num}"
-            header += "]"
-
-            # Track source for the UI with link
-            source_text = course_title
-            if lesson_num is not None:
-                source_text += f" - Lesson {lesson_num}"
-                # Get lesson link from vector store
-                lesson_link = self.store.get_lesson_link(course_title, lesson_num)
-            else:
-                # Get course link if no specific lesson
-                lesson_link = self.store.get_course_link(course_title)
-
-            # Store source as dict with text and optional link
-            source_data = {"text": source_text}
-            if lesson_link:
-                source_data["link"] = lesson_link
+        for doc, context in zip(results.documents, contexts):
+            source_data = _make_source(*context, *links[context])
             sources.append(source_data)
-
-            formatted.append(f"{header}\n{doc}")
+            formatted.append(f"[{source_data['text']}]\n{doc}")
 
         # Store sources for retrieval
-        self.last_sources = sources
+        self._record_sources(sources)
 
         return "\n\n".join(formatted)
 
 
+def _make_source(
+    course_title: str,
+    lesson_num: Optional[int],
+    lesson_link: Optional[str],
+    course_link: Optional[str],
+) -> Dict[str, str]:
+    """UI source for a result: the lesson's link, or the course's without one"""
+    if lesson_num is not None:
+        source_data = {"text": f"{course_title} - Lesson {lesson_num}"}
+        link = lesson_link
+    else:
+        source_data = {"text": course_title}
+        link = course_link
+
+    # Store source as dict with text and optional link
+    if link:
+        source_data["link"] = link
+    return source_data
+
+
 class ToolManager:
     """Manages available tools for the AI"""
 
     def __init__(self):
         self.tools = {}
+        # tool name -> bound execute, so dispatch is a single dict lookup
+        self._dispatch: Dict[str, Callable[..., str]] = {}
+        self._definitions: list = []
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -233,20 +255,45 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self._dispatch[tool_name] = tool.execute
+        # Registration is rare, so the definitions list is rebuilt here in
+        # registration order and every LLM turn just reads it
+        self._definitions = [tool.get_tool_definition() for tool in self.tools.values()]
 
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """
+        Get all tool definitions for Anthropic tool calling.
+
+        Built at registration and shared; callers must not mutate it.
+        """
+        return self._definitions
 
-    def execute_tool(self, tool_name: str, **kwargs) -> str:
-        """Execute a tool by name with given parameters"""
-        if tool_name not in self.tools:
+    def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        """Execute a tool by name with the arguments dict from its tool_use block"""
+        execute = self._dispatch.get(tool_name)
+        if execute is None:
             return f"Tool '{tool_name}' not found"
 
-        return self.tools[tool_name].execute(**kwargs)
+        return execute(**arguments)
+
+    def start_request_scope(self):
+        """
+        Give the current context its own source tracking.
+
+        Tools run in worker threads that copy the caller's context, so sources
+        recorded during one async query are not visible to another.
+        """
+        _request_sources.set({})
 
     def get_last_sources(self) -> list:
         """Get sources from the last search operation"""
+        request_sources = _request_sources.get()
+        if request_sources is not None:
+            for tool in self.tools.values():
+                if request_sources.get(tool):
+                    return request_sources[tool]
+            return []
+
         # Check all tools for last_sources attribute
         for tool in self.tools.values():
             if hasattr(tool, "last_sources") and tool.last_sources:
@@ -255,6 +302,10 @@ class ToolManager:
 
     def reset_sources(self):
         """Reset sources from all tools that track sources"""
+        request_sources = _request_sources.get()
+        if request_sources is not None:
+            request_sources.clear()
+
         for tool in self.tools.values():
             if hasattr(tool, "last_sources"):
                 tool.last_sources = []
@@ -0,0 +1,66 @@
+import threading
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    In-memory cache of past answers looked up by query embedding similarity.
+
+    Embeddings are unit-normalised and kept in a fixed-size ring buffer, so a
+    nearest-neighbour lookup is a single matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Sequence[Sequence[float]]],
+        capacity: int = 4096,
+        threshold: float = 0.95,
+    ):
+        self.embed = embed
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[Tuple[str, Any]]] = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed and normalise a query so dot products are cosine similarities"""
+        vector = np.asarray(self.embed([query])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector: np.ndarray, signature: str) -> Optional[Any]:
+        """Return the cached value of the most similar query above the threshold"""
+        with self._lock:
+            if not self._size:
+                return None
+
+            scores = self._vectors[: self._size] @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            cached_signature, value = self._entries[best]
+            return value if cached_signature == signature else None
+
+    def store(self, vector: np.ndarray, signature: str, value: Any):
+        """Remember a value for a query, overwriting the oldest slot when full"""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, len(vector)), np.float32)
+
+            self._vectors[self._next] = vector
+            self._entries[self._next] = (signature, value)
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        """Forget every entry, e.g. after the course content changes"""
+        with self._lock:
+            self._entries = [None] * self.capacity
+            self._size = 0
+            self._next = 0
@@ -1,5 +1,8 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+
+# Rough English average; good enough to bound prompt size without an API call
+CHARS_PER_TOKEN = 4
 
 
 @dataclass
@@ -13,8 +16,17 @@ class Message:
 class SessionManager:
     """Manages conversation sessions and message history"""
 
-    def __init__(self, max_history: int = 5):
+    def __init__(
+        self,
+        max_history: int = 5,
+        history_token_budget: Optional[int] = None,
+        on_session_dropped: Optional[Callable[[str], None]] = None,
+    ):
         self.max_history = max_history
+        self.history_token_budget = history_token_budget
+        # Called with a session ID once its messages are cleared or deleted, so
+        # state derived from them elsewhere can be released too
+        self.on_session_dropped = on_session_dropped
         self.sessions: Dict[str, List[Message]] = {}
         self.session_counter = 0
 
@@ -54,18 +66,42 @@ class SessionManager:
             return None
 
         # Format messages for context
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append(f"{msg.role.title()}: {msg.content}")
+        formatted_messages = [f"{msg.role.title()}: {msg.content}" for msg in messages]
+
+        if self.history_token_budget is not None:
+            formatted_messages = self._trim_to_budget(formatted_messages)
 
         return "\n".join(formatted_messages)
 
+    def _trim_to_budget(self, formatted_messages: List[str]) -> List[str]:
+        """Drop the oldest messages until the history fits the token budget"""
+        budget_chars = self.history_token_budget * CHARS_PER_TOKEN
+        kept = []
+        used = 0
+
+        # Walk newest first; the latest message is always kept
+        for line in reversed(formatted_messages):
+            used += len(line) + 1
+            if kept and used > budget_chars:
+                break
+            kept.append(line)
+
+        kept.reverse()
+        return kept
+
     def clear_session(self, session_id: str):
         """Clear all messages from a session"""
         if session_id in self.sessions:
             self.sessions[session_id] = []
+            self._session_dropped(session_id)
 
     def delete_session(self, session_id: str):
         """Delete a session entirely from memory"""
         if session_id in self.sessions:
             del self.sessions[session_id]
+            self._session_dropped(session_id)
+
+    def _session_dropped(self, session_id: str):
+        """Tell the listener, if any, that a session's messages are gone"""
+        if self.on_session_dropped is not None:
+            self.on_session_dropped(session_id)
@@ -25,7 +25,7 @@ def demonstrate_sequential_tools():
     mock_tool_manager = Mock()
 
     # Define what tools return
-    def execute_tool_mock(tool_name, **kwargs):
+    def execute_tool_mock(tool_name, arguments):
         if tool_name == "get_course_outline":
             return """
 **Course Title:** Advanced Python Programming
@@ -44,8 +44,8 @@ def demonstrate_sequential_tools():
 - Lesson 10: Advanced Design Patterns
 """
         elif tool_name == "search_course_content":
-            query = kwargs.get("query", "")
-            lesson = kwargs.get("lesson_number")
+            query = arguments.get("query", "")
+            lesson = arguments.get("lesson_number")
             if "metaclass" in query.lower() or lesson == 5:
                 return """
 [Advanced Python Programming - Lesson 5]
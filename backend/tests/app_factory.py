@@ -0,0 +1,123 @@
+"""
+Shared FastAPI app factory for API tests, free of static file mounts
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+class QueryRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+
+
+class StubRag:
+    """
+    Minimal RAG system stand-in for the API tests.
+
+    Set what each method answers in `results` (a value, an exception to
+    raise, or a callable taking the call's arguments); every call is
+    appended to `calls` as (method name, *args).
+    """
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.calls: List[Tuple] = []
+
+    def reset(self):
+        """Forget configured results and recorded calls"""
+        self.results.clear()
+        self.calls.clear()
+
+    def _answer(self, name: str, *args):
+        self.calls.append((name, *args))
+        result = self.results[name]
+        if isinstance(result, Exception):
+            raise result
+        if callable(result):
+            return result(*args)
+        return result
+
+    def process_query(self, query, session_id):
+        return self._answer("process_query", query, session_id)
+
+    def get_all_courses(self):
+        return self._answer("get_all_courses")
+
+    def get_stats(self):
+        return self._answer("get_stats")
+
+
+def get_rag():
+    """RAG system dependency; each app overrides it with its own instance"""
+    raise RuntimeError("create_app_for_testing() must override get_rag")
+
+
+# Routes are built once at import; apps only include the router. The
+# handlers return plain dicts with no response_model, so FastAPI serializes
+# them without another Pydantic validation pass per request.
+router = APIRouter()
+
+
+@router.get("/")
+async def root():
+    return {"message": "Course Materials RAG System"}
+
+
+@router.get("/api/health")
+async def health_check():
+    return {"status": "healthy", "service": "rag-system"}
+
+
+@router.post("/api/query")
+async def query_course(request: QueryRequest, rag_system=Depends(get_rag)):
+    try:
+        response = rag_system.process_query(request.query, request.session_id)
+        return {
+            "answer": response.get("answer", ""),
+            "sources": response.get("sources", []),
+            "session_id": response.get("session_id", ""),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/courses")
+async def get_course_list(rag_system=Depends(get_rag)):
+    try:
+        courses = rag_system.get_all_courses()
+        return {"courses": courses}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/stats")
+async def get_stats(rag_system=Depends(get_rag)):
+    try:
+        return rag_system.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def create_app_for_testing(mock_rag_system=None):
+    """
+    Create an isolated FastAPI app around the shared routes.
+
+    No CORS middleware: in-process test clients never make cross-origin
+    requests, so it would only add a hop to every request.
+
+    Args:
+        mock_rag_system: RAG system to serve; a fresh StubRag when omitted
+
+    Returns:
+        Tuple of (app, RAG system the app uses)
+    """
+    app = FastAPI(title="Test RAG System", default_response_class=ORJSONResponse)
+    app.include_router(router)
+
+    rag_system = mock_rag_system or StubRag()
+    app.dependency_overrides[get_rag] = lambda: rag_system
+    return app, rag_system
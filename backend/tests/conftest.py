@@ -1,43 +1,343 @@
+import copy
+import hashlib
 import os
-import sys
-import tempfile
-from pathlib import Path
-from unittest.mock import Mock, MagicMock, patch
-from typing import Dict, List, Any
-import asyncio
-
+import time
+from collections import deque
+from dataclasses import FrozenInstanceError, InitVar, dataclass, field
+from functools import lru_cache
+from typing import Optional
+from unittest.mock import AsyncMock, Mock, create_autospec, patch
+
+import chromadb
+import numpy as np
 import pytest
+import pytest_asyncio
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.config import Settings
+from httpx import ASGITransport, AsyncClient
 
-# Add parent directory to path to import backend modules
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
+from ai_generator import AIGenerator
+from app_factory import create_app_for_testing
 from config import Config
+from document_processor import DocumentProcessor
 from models import Course, CourseChunk, Lesson
+from rag_system import RAGSystem
 from vector_store import SearchResults, VectorStore
 
+# Skip collecting the live API modules unless they are enabled, so a default
+# run does not pay for importing them
+collect_ignore_glob = []
+if not os.getenv("RUN_LIVE_TESTS"):
+    collect_ignore_glob.extend(["test_actual_api_call.py", "test_api_endpoint.py"])
+
+# Autospecced instance built once at import, so search signatures are checked
+# without re-walking the class per test; the fixture resets it via _fresh_mock.
+# Session and tool manager mocks only return canned values and stay bare.
+_VECTOR_STORE_SPEC = create_autospec(VectorStore, instance=True)
+
+
+def _fresh_mock(template):
+    """Clear calls, return values and side effects left by the previous test"""
+    template.reset_mock(return_value=True, side_effect=True)
+    return template
+
+
+# File contents written once per session by the file-backed fixtures
+_DOC_CONTENT = """Course Title: Building Towards Computer Use with Anthropic
+Course Link: https://www.deeplearning.ai/short-courses/building-toward-computer-use-with-anthropic/
+Course Instructor: Colt Steele
+
+Lesson 0: Introduction
+Lesson Link: https://learn.deeplearning.ai/courses/lesson0
+Welcome to Building Toward Computer Use with Anthropic. In this course, you will learn about computer use capabilities.
+
+Lesson 1: Getting Started
+Lesson Link: https://learn.deeplearning.ai/courses/lesson1
+Let's begin by understanding the basics of how LLMs can control computers.
+
+Lesson 2: Advanced Techniques
+This lesson covers advanced techniques for computer use without a specific link.
+"""
+
+_COURSE1_CONTENT = """Course Title: Python Basics
+Course Link: https://example.com/python
+Course Instructor: John Doe
+
+Lesson 0: Introduction
+Welcome to Python programming.
+
+Lesson 1: Variables
+Learn about variables and data types.
+"""
+
+_COURSE2_CONTENT = """Course Title: Data Science with Python
+Course Link: https://example.com/datascience
+Course Instructor: Jane Smith
+
+Lesson 0: Overview
+Introduction to data science concepts.
+
+Lesson 1: NumPy Basics
+Working with NumPy arrays.
+"""
+
+
+# SearchResults is frozen, so these are shared by every test that reads them
+_SAMPLE_SEARCH_RESULTS = SearchResults(
+    documents=[
+        "Python is a versatile programming language.",
+        "Variables in Python can store different data types.",
+    ],
+    metadata=[
+        {"course_title": "Test Course on Python Programming", "lesson_number": 0},
+        {"course_title": "Test Course on Python Programming", "lesson_number": 1},
+    ],
+    distances=[0.1, 0.2],
+)
+
+_DEFAULT_VS_SEARCH = SearchResults(
+    documents=["Test document content"],
+    metadata=[{"course_title": "Test Course", "lesson_number": 0}],
+    distances=[0.1]
+)
+
+_SAMPLE_QUERY_RESPONSES = {
+    "direct_answer": {
+        "answer": "Python is a high-level, interpreted programming language.",
+        "sources": [],
+        "session_id": "session-001"
+    },
+    "with_search": {
+        "answer": "Based on the course materials, Python uses dynamic typing where variable types are determined at runtime.",
+        "sources": [
+            {"text": "Variables and Data Types", "link": "https://example.com/lesson1"},
+            {"text": "Python Type System", "link": "https://example.com/lesson2"}
+        ],
+        "session_id": "session-002"
+    },
+    "course_outline": {
+        "answer": "Here's the course outline for Python Basics:\n\n1. Introduction\n2. Variables and Data Types\n3. Control Flow",
+        "sources": [
+            {"text": "Python Basics Course", "link": "https://example.com/python"}
+        ],
+        "session_id": "session-003"
+    }
+}
+
+
+@dataclass(slots=True)
+class MockContent:
+    """Stand-in for an Anthropic text or tool_use content block"""
+
+    text: Optional[str] = None
+    type: str = "text"
+    name: Optional[str] = None
+    input: Optional[dict] = None
+    id: Optional[str] = None
+
+
+@dataclass(slots=True)
+class MockResponse:
+    """Stand-in for an Anthropic message, optionally requesting a tool call"""
+
+    content_text: InitVar[str] = "Test response"
+    stop_reason: str = "end"
+    tool_use: InitVar[bool] = False
+    content: list = field(init=False)
+
+    def __post_init__(self, content_text, tool_use):
+        if tool_use:
+            self.stop_reason = "tool_use"
+            self.content = [
+                MockContent(
+                    type="tool_use",
+                    name="search_course_content",
+                    input={"query": "Python basics"},
+                    id="tool_123",
+                )
+            ]
+        else:
+            self.content = [MockContent(text=content_text)]
+
+
+class DeterministicEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Stand-in for the SentenceTransformer embedding function.
+
+    Each text maps to a fixed random vector seeded from its hash, so Chroma
+    has something to index and search without loading or running a model.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [self._vector(text) for text in input]
+
+    def _vector(self, text: str) -> np.ndarray:
+        seed = hashlib.blake2b(text.encode(), digest_size=8).digest()
+        rng = np.random.default_rng(int.from_bytes(seed, "little"))
+        return rng.standard_normal(self.dimensions).astype(np.float32)
+
+    @staticmethod
+    def name() -> str:
+        return "deterministic-test"
+
+    def get_config(self) -> dict:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "DeterministicEmbeddingFunction":
+        return DeterministicEmbeddingFunction(config["dimensions"])
+
+
+_DETERMINISTIC_EMBEDDINGS = DeterministicEmbeddingFunction()
+
+
+_parse_course_document = DocumentProcessor.process_course_document
+
+
+@lru_cache(maxsize=64)
+def _parsed_course_document(path, mtime, chunk_size, chunk_overlap):
+    """Parse a document once per (file version, chunking); mtime keys edits"""
+    processor = DocumentProcessor(chunk_size, chunk_overlap)
+    return _parse_course_document(processor, path)
+
+
+def _cached_process_course_document(self, file_path):
+    path = os.path.realpath(file_path)
+    # Copies, so a caller mutating its Course or chunks cannot affect another
+    return copy.deepcopy(
+        _parsed_course_document(
+            path, os.path.getmtime(path), self.chunk_size, self.chunk_overlap
+        )
+    )
+
 
 @pytest.fixture
+def cached_document_parsing():
+    """
+    Reuse parsed course documents across the tests that request this.
+
+    Opt-in, for tests that re-parse the same docs files: it only serves
+    existing files, so error handling for missing ones is not exercised.
+    """
+    with patch.object(
+        DocumentProcessor, "process_course_document", _cached_process_course_document
+    ):
+        yield
+
+
+@dataclass
+class FrozenConfig(Config):
+    """Config that rejects assignment once built, so a shared one stays intact"""
+
+    def __post_init__(self):
+        object.__setattr__(self, "_frozen", True)
+
+    def __setattr__(self, name, value):
+        if "_frozen" in self.__dict__:
+            raise FrozenInstanceError(f"cannot assign to field {name!r}")
+        super().__setattr__(name, value)
+
+
+@pytest.fixture(scope="session")
 def mock_config():
-    """Create a test configuration"""
-    config = Config()
-    config.ANTHROPIC_API_KEY = "test-key"
-    config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
-    config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-    config.CHUNK_SIZE = 800
-    config.CHUNK_OVERLAP = 100
-    config.MAX_RESULTS = 5
-    config.MAX_HISTORY = 2
-    return config
+    """Create a test configuration (shared and frozen; vary it with replace)"""
+    return FrozenConfig(
+        ANTHROPIC_API_KEY="test-key",
+        ANTHROPIC_MODEL="claude-sonnet-4-20250514",
+        EMBEDDING_MODEL="all-MiniLM-L6-v2",
+        CHUNK_SIZE=800,
+        CHUNK_OVERLAP=100,
+        MAX_RESULTS=5,
+        MAX_HISTORY=2,
+    )
+
+
+@pytest.fixture(scope="session")
+def live_config():
+    """Real configuration from the environment, for opt-in live tests"""
+    return Config()
+
+
+@pytest.fixture(scope="session")
+def live_rag_system(live_config):
+    """RAG system over the real docs, built once per session for live tests"""
+    if not live_config.ANTHROPIC_API_KEY:
+        pytest.skip("no API key")
+    rag = RAGSystem(live_config)
+    rag.add_course_folder("../docs", clear_existing=False)
+    return rag
+
+
+@pytest.fixture
+def temp_chroma_db(tmp_path_factory):
+    """Create a temporary ChromaDB directory, unique per test and xdist worker"""
+    return str(tmp_path_factory.mktemp("chroma", numbered=True))
 
 
 @pytest.fixture
-def temp_chroma_db():
-    """Create a temporary ChromaDB instance for testing"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        yield tmpdir
+def fake_embeddings():
+    """Make every VectorStore built in the test embed deterministically"""
+    with patch(
+        "vector_store._shared_embedding_function",
+        return_value=_DETERMINISTIC_EMBEDDINGS,
+    ):
+        yield _DETERMINISTIC_EMBEDDINGS
+
+
+@pytest.fixture(scope="session")
+def populate_store():
+    """
+    Helper adding (course, chunks) pairs to a store in two batched writes:
+    one catalog add for every course and one content add for every chunk.
+    """
+
+    def populate(store, *courses_with_chunks):
+        store.add_course_metadata(*(course for course, _ in courses_with_chunks))
+        store.add_course_content(
+            [chunk for _, chunks in courses_with_chunks for chunk in chunks]
+        )
+
+    return populate
+
+
+@pytest.fixture(scope="session")
+def chroma_pool():
+    """
+    Idle VectorStores reused across tests.
+
+    Stores are in-memory and each xdist worker has its own session, so
+    pooled stores are never shared between processes.
+    """
+    return []
 
 
 @pytest.fixture
+def vector_store(chroma_pool, mock_config):
+    """Empty VectorStore borrowed from the pool and returned after the test"""
+    idle = chroma_pool
+    if idle:
+        # Dropping and recreating the collections is far cheaper than a new
+        # client
+        store = idle.pop()
+        store.clear_all_data()
+    else:
+        # In-memory: no sqlite writes, and nothing needs to outlive the session.
+        # Ephemeral clients share one backend per process, which is safe
+        # because stores are cleared on checkout and used one test at a time.
+        client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+        store = VectorStore.from_client(
+            client,
+            mock_config.EMBEDDING_MODEL,
+            embedding_function=_DETERMINISTIC_EMBEDDINGS,
+        )
+    yield store
+    idle.append(store)
+
+
+@pytest.fixture(scope="session")
 def sample_course():
     """Create a sample course for testing"""
     course = Course(
@@ -61,12 +361,9 @@ def sample_course():
     return course
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_chunks(sample_course):
     """Create sample course chunks for testing"""
-    chunks = []
-    chunk_index = 0
-
     # Map lesson content for testing
     lesson_content = {
         0: "Welcome to Python programming. Python is a versatile language.",
@@ -74,90 +371,92 @@ def sample_chunks(sample_course):
         2: "Control flow in Python uses if statements, for loops, and while loops to control program execution.",
     }
 
-    for lesson in sample_course.lessons:
-        # Create chunks for each lesson
-        chunk = CourseChunk(
-            course_title=sample_course.title,
-            lesson_number=lesson.lesson_number,
-            content=lesson_content.get(lesson.lesson_number, "Default content"),
-            chunk_index=chunk_index,
+    # One validated prototype; model_copy skips re-validating the shared fields
+    proto = CourseChunk(
+        course_title=sample_course.title, lesson_number=0, content="", chunk_index=0
+    )
+    return [
+        proto.model_copy(
+            update={
+                "lesson_number": lesson.lesson_number,
+                "content": lesson_content.get(lesson.lesson_number, "Default content"),
+                "chunk_index": chunk_index,
+            }
         )
-        chunks.append(chunk)
-        chunk_index += 1
-
-    return chunks
+        for chunk_index, lesson in enumerate(sample_course.lessons)
+    ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_search_results():
     """Create sample search results for testing"""
-    return SearchResults(
-        documents=[
-            "Python is a versatile programming language.",
-            "Variables in Python can store different data types.",
-        ],
-        metadata=[
-            {"course_title": "Test Course on Python Programming", "lesson_number": 0},
-            {"course_title": "Test Course on Python Programming", "lesson_number": 1},
-        ],
-        distances=[0.1, 0.2],
-    )
+    return _SAMPLE_SEARCH_RESULTS
 
 
-@pytest.fixture
-def sample_course_doc(tmp_path):
+@pytest.fixture(scope="session")
+def sample_course_doc(tmp_path_factory):
     """Create a sample course document file for testing"""
-    doc_content = """Course Title: Building Towards Computer Use with Anthropic
-Course Link: https://www.deeplearning.ai/short-courses/building-toward-computer-use-with-anthropic/
-Course Instructor: Colt Steele
+    doc_path = tmp_path_factory.mktemp("course_doc") / "test_course.txt"
+    doc_path.write_text(_DOC_CONTENT)
+    return str(doc_path)
 
-Lesson 0: Introduction
-Lesson Link: https://learn.deeplearning.ai/courses/lesson0
-Welcome to Building Toward Computer Use with Anthropic. In this course, you will learn about computer use capabilities.
 
-Lesson 1: Getting Started
-Lesson Link: https://learn.deeplearning.ai/courses/lesson1
-Let's begin by understanding the basics of how LLMs can control computers.
+class AnthropicStub:
+    """Patched Anthropic client whose messages.create replays queued responses"""
+
+    def __init__(self, client):
+        self.client = client
+        self._responses = deque()
+        # Params of each call, with messages copied as they were when sent
+        self.requests = []
+        client.messages.create.side_effect = self._next_response
+
+    def _next_response(self, **params):
+        self.requests.append({**params, "messages": list(params["messages"])})
+        response = self._responses.popleft()
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    @staticmethod
+    def response(text="Test response", stop_reason="end", tool_uses=()):
+        """Build a response; tool_uses are (id, name, input) tuples"""
+        response = MockResponse(content_text=text, stop_reason=stop_reason)
+        if tool_uses:
+            response.stop_reason = "tool_use"
+            response.content = [
+                MockContent(type="tool_use", name=name, input=tool_input, id=tool_id)
+                for tool_id, name, tool_input in tool_uses
+            ]
+        return response
+
+    def queue(self, text="Test response", stop_reason="end", tool_uses=()):
+        """Queue the next response, built as by response()"""
+        response = self.response(text, stop_reason, tool_uses)
+        self._responses.append(response)
+        return response
+
+    def queue_error(self, error: Exception):
+        """Make the next call raise error (still recorded in requests)"""
+        self._responses.append(error)
 
-Lesson 2: Advanced Techniques
-This lesson covers advanced techniques for computer use without a specific link.
-"""
 
-    doc_path = tmp_path / "test_course.txt"
-    doc_path.write_text(doc_content)
-    return str(doc_path)
+@pytest.fixture
+def mock_anthropic():
+    """Patch ai_generator's Anthropic client; queue responses with .queue()"""
+    with patch("ai_generator.anthropic.Anthropic") as mock_class:
+        yield AnthropicStub(mock_class.return_value)
 
 
 @pytest.fixture
-def mock_anthropic_response():
-    """Mock response from Anthropic API"""
+def generator(mock_anthropic):
+    """AIGenerator wired to the patched client from mock_anthropic"""
+    return AIGenerator(api_key="test-key", model="test-model")
 
-    class MockContent:
-        def __init__(self, text=None, type="text", name=None, input=None, id=None):
-            self.text = text
-            self.type = type
-            self.name = name
-            self.input = input
-            self.id = id
-
-    class MockResponse:
-        def __init__(
-            self, content_text="Test response", stop_reason="end", tool_use=False
-        ):
-            if tool_use:
-                self.stop_reason = "tool_use"
-                self.content = [
-                    MockContent(
-                        type="tool_use",
-                        name="search_course_content",
-                        input={"query": "Python basics"},
-                        id="tool_123",
-                    )
-                ]
-            else:
-                self.stop_reason = stop_reason
-                self.content = [MockContent(text=content_text)]
 
+@pytest.fixture(scope="session")
+def mock_anthropic_response():
+    """Mock response from Anthropic API"""
     return MockResponse
 
 
@@ -180,26 +479,18 @@ def mock_anthropic_client():
 @pytest.fixture
 def mock_vector_store():
     """Mock vector store for testing"""
-    mock_store = Mock(spec=VectorStore)
+    mock_store = _fresh_mock(_VECTOR_STORE_SPEC)
     
     # Default search results
-    mock_store.search.return_value = SearchResults(
-        documents=["Test document content"],
-        metadata=[{"course_title": "Test Course", "lesson_number": 0}],
-        distances=[0.1]
-    )
-    
-    mock_store.search_courses.return_value = SearchResults(
-        documents=["Test Course on Python Programming"],
-        metadata=[{"course_title": "Test Course on Python Programming"}],
-        distances=[0.05]
-    )
+    mock_store.search.return_value = _DEFAULT_VS_SEARCH
+    # No links unless a test sets them
+    mock_store.get_links_bulk.side_effect = lambda contexts: [(None, None)] * len(contexts)
     
-    mock_store.get_all_courses.return_value = [
+    mock_store.get_all_courses_metadata.return_value = [
         {
             "title": "Test Course on Python Programming",
             "instructor": "John Doe",
-            "lessons": 5
+            "lessons": []
         }
     ]
     
@@ -209,9 +500,7 @@ def mock_vector_store():
 @pytest.fixture
 def mock_session_manager():
     """Mock session manager for testing"""
-    from backend.session_manager import SessionManager
-    
-    mock_manager = Mock(spec=SessionManager)
+    mock_manager = Mock()
     mock_manager.get_or_create_session.return_value = "test-session-id"
     mock_manager.get_conversation_history.return_value = []
     mock_manager.add_exchange.return_value = None
@@ -254,36 +543,34 @@ def mock_rag_system():
     return mock_rag
 
 
-@pytest.fixture
-def test_data_dir(tmp_path):
+@pytest.fixture(scope="session")
+def api_app():
+    """Test app and its RAG stub, built once; callers reset the stub per test"""
+    return create_app_for_testing()
+
+
+# The test app has no startup/shutdown handlers, and httpx's ASGITransport
+# never sends lifespan events, so there is no lifespan to hold open here
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def api_client(api_app):
+    """One in-process async client over api_app, shared by the whole session"""
+    app, _ = api_app
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def test_data_dir(tmp_path_factory):
     """Create a temporary directory with test data files"""
-    test_dir = tmp_path / "test_data"
-    test_dir.mkdir()
+    test_dir = tmp_path_factory.mktemp("test_data")
     
     # Create sample course files
     course1 = test_dir / "python_basics.txt"
-    course1.write_text("""Course Title: Python Basics
-Course Link: https://example.com/python
-Course Instructor: John Doe
-
-Lesson 0: Introduction
-Welcome to Python programming.
-
-Lesson 1: Variables
-Learn about variables and data types.
-""")
+    course1.write_text(_COURSE1_CONTENT)
     
     course2 = test_dir / "data_science.txt"
-    course2.write_text("""Course Title: Data Science with Python
-Course Link: https://example.com/datascience
-Course Instructor: Jane Smith
-
-Lesson 0: Overview
-Introduction to data science concepts.
-
-Lesson 1: NumPy Basics
-Working with NumPy arrays.
-""")
+    course2.write_text(_COURSE2_CONTENT)
     
     return test_dir
 
@@ -291,9 +578,7 @@ Working with NumPy arrays.
 @pytest.fixture
 def mock_tool_manager():
     """Mock tool manager for testing"""
-    from backend.search_tools import ToolManager
-    
-    mock_manager = Mock(spec=ToolManager)
+    mock_manager = Mock()
     mock_manager.execute_tool.return_value = {
         "results": [
             {
@@ -319,26 +604,10 @@ def mock_env_variables(monkeypatch):
     }
 
 
-@pytest.fixture(autouse=True)
-def reset_singletons():
-    """Reset singleton instances between tests"""
-    # This ensures clean state between tests
-    yield
-    # Clean up any singleton instances if needed
-
-
-@pytest.fixture
+@pytest.fixture(scope="session")
 def async_mock():
-    """Helper to create async mock objects"""
-    def _create_async_mock(return_value=None):
-        async def async_func(*args, **kwargs):
-            return return_value
-        
-        mock = Mock()
-        mock.side_effect = async_func
-        return mock
-    
-    return _create_async_mock
+    """Helper to create async mock objects, e.g. async_mock(return_value=x)"""
+    return AsyncMock
 
 
 @pytest.fixture
@@ -364,53 +633,38 @@ def mock_chroma_client():
     return mock_client
 
 
-@pytest.fixture
-def sample_query_responses():
-    """Sample query responses for testing"""
-    return {
-        "direct_answer": {
-            "answer": "Python is a high-level, interpreted programming language.",
-            "sources": [],
-            "session_id": "session-001"
-        },
-        "with_search": {
-            "answer": "Based on the course materials, Python uses dynamic typing where variable types are determined at runtime.",
-            "sources": [
-                {"text": "Variables and Data Types", "link": "https://example.com/lesson1"},
-                {"text": "Python Type System", "link": "https://example.com/lesson2"}
-            ],
-            "session_id": "session-002"
-        },
-        "course_outline": {
-            "answer": "Here's the course outline for Python Basics:\n\n1. Introduction\n2. Variables and Data Types\n3. Control Flow",
-            "sources": [
-                {"text": "Python Basics Course", "link": "https://example.com/python"}
-            ],
-            "session_id": "session-003"
-        }
-    }
+@pytest.fixture(
+    name="sample_query_response",
+    scope="session",
+    params=list(_SAMPLE_QUERY_RESPONSES),
+    ids=list(_SAMPLE_QUERY_RESPONSES),
+)
+def _sample_query_response(request):
+    """Sample query response for testing, one scenario per parametrized run"""
+    return _SAMPLE_QUERY_RESPONSES[request.param]
+
+
+@dataclass(slots=True)
+class Timer:
+    """Monotonic stopwatch for performance tests"""
+    start_ns: Optional[int] = None
+    end_ns: Optional[int] = None
+
+    def start(self):
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+
+    def stop(self):
+        self.end_ns = time.perf_counter_ns()
+
+    @property
+    def elapsed(self):
+        if self.start_ns is not None and self.end_ns is not None:
+            return (self.end_ns - self.start_ns) / 1e9
+        return None
 
 
 @pytest.fixture
 def performance_timer():
     """Helper fixture for performance testing"""
-    import time
-    
-    class Timer:
-        def __init__(self):
-            self.start_time = None
-            self.end_time = None
-        
-        def start(self):
-            self.start_time = time.time()
-        
-        def stop(self):
-            self.end_time = time.time()
-        
-        @property
-        def elapsed(self):
-            if self.start_time and self.end_time:
-                return self.end_time - self.start_time
-            return None
-    
     return Timer()
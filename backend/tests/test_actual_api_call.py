@@ -4,38 +4,26 @@ Test with actual API call to identify the real issue
 
 import os
 import sys
-from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import pytest
 
 from config import Config
 from rag_system import RAGSystem
 
 
-def test_real_api_call():
+@pytest.mark.live
+@pytest.mark.enable_socket
+@pytest.mark.skipif(
+    not os.getenv("RUN_LIVE_TESTS"), reason="set RUN_LIVE_TESTS=1 to enable"
+)
+def test_real_api_call(live_rag_system):
     """Test with actual Anthropic API to identify failure"""
-    config = Config()
-
     print(f"\n[LIVE TEST] Testing with real API")
-    print(f"[LIVE TEST] API Key present: {bool(config.ANTHROPIC_API_KEY)}")
-
-    if not config.ANTHROPIC_API_KEY:
-        print("[LIVE TEST] ERROR: No API key found!")
-        print("[LIVE TEST] Please set ANTHROPIC_API_KEY in .env file")
-        return False
 
     try:
-        # Create RAG system
-        rag_system = RAGSystem(config)
-
-        # Load documents
-        print("[LIVE TEST] Loading documents...")
-        courses, chunks = rag_system.add_course_folder("../docs", clear_existing=False)
-        print(f"[LIVE TEST] Loaded {courses} new courses with {chunks} chunks")
-
         # Test a simple query
         print("[LIVE TEST] Testing query: 'What is Python?'")
-        response, sources = rag_system.query("What is Python?")
+        response, sources = live_rag_system.query("What is Python?")
 
         print(f"[LIVE TEST] Response: {response[:200]}...")
         print(f"[LIVE TEST] Sources: {sources}")
@@ -51,7 +39,18 @@ def test_real_api_call():
 
 
 if __name__ == "__main__":
-    success = test_real_api_call()
+    config = Config()
+    if not config.ANTHROPIC_API_KEY:
+        print("[LIVE TEST] ERROR: No API key found!")
+        print("[LIVE TEST] Please set ANTHROPIC_API_KEY in .env file")
+        sys.exit(1)
+
+    rag_system = RAGSystem(config)
+    print("[LIVE TEST] Loading documents...")
+    courses, chunks = rag_system.add_course_folder("../docs", clear_existing=False)
+    print(f"[LIVE TEST] Loaded {courses} new courses with {chunks} chunks")
+
+    success = test_real_api_call(rag_system)
     if success:
         print("\n✅ API call successful!")
     else:
@@ -1,14 +1,141 @@
-import sys
-from pathlib import Path
-from unittest.mock import MagicMock, Mock, patch
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+from unittest.mock import AsyncMock, MagicMock, Mock, call, patch
 
 import pytest
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from ai_generator import AIGenerator
 
 
+@dataclass(frozen=True)
+class FlowCase:
+    """One scripted conversation through the tool loop"""
+
+    id: str
+    responses: Tuple[Dict[str, Any], ...]  # mock_anthropic.queue kwargs
+    tool_results: Tuple[Any, ...]  # execute_tool return values or exceptions
+    expected_text: str
+    expected_tool_calls: Tuple[Tuple[str, Dict[str, Any]], ...]
+    tool_choices: Tuple[str, ...]  # tool_choice type sent with each API call
+    max_rounds: int = 2
+    result_contains: Tuple[str, ...] = ()
+
+
+class FakeAsyncStream:
+    """Async context manager standing in for AsyncAnthropic messages.stream"""
+
+    def __init__(self, texts, message):
+        self.texts = texts
+        self.message = message
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        for text in self.texts:
+            yield text
+
+    async def get_final_message(self):
+        return self.message
+
+
+FLOW_CASES = [
+    FlowCase(
+        id="single_round",
+        responses=(
+            {
+                "tool_uses": [
+                    ("tool_123", "search_course_content", {"query": "Python basics"})
+                ]
+            },
+            {"text": "Here's what I found about Python basics..."},
+        ),
+        tool_results=("Python is a programming language...",),
+        expected_text="Here's what I found about Python basics...",
+        expected_tool_calls=(("search_course_content", {"query": "Python basics"}),),
+        # Claude stopped on its own, so tools were still on offer
+        tool_choices=("auto", "auto"),
+        result_contains=("Python is a programming language...",),
+    ),
+    FlowCase(
+        id="two_rounds",
+        responses=(
+            {
+                "tool_uses": [
+                    ("tool_1", "get_course_outline", {"course_title": "Python Course"})
+                ]
+            },
+            {
+                "tool_uses": [
+                    (
+                        "tool_2",
+                        "search_course_content",
+                        {"query": "advanced topics", "lesson_number": 10},
+                    )
+                ]
+            },
+            {"text": "Based on the course outline and search results..."},
+        ),
+        tool_results=(
+            "Course Title: Python\nLessons:\n- Lesson 1: Basics\n- Lesson 10: Advanced Topics",
+            "Advanced topics include decorators, metaclasses, and async programming...",
+        ),
+        expected_text="Based on the course outline and search results...",
+        expected_tool_calls=(
+            ("get_course_outline", {"course_title": "Python Course"}),
+            (
+                "search_course_content",
+                {"query": "advanced topics", "lesson_number": 10},
+            ),
+        ),
+        tool_choices=("auto", "auto", "none"),
+        result_contains=("decorators",),
+    ),
+    FlowCase(
+        id="max_rounds_forces_answer",
+        responses=(
+            {"tool_uses": [("tool_id", "search_course_content", {"query": "test"})]},
+            {"tool_uses": [("tool_id", "search_course_content", {"query": "test"})]},
+            {"text": "Final answer after 2 rounds"},
+        ),
+        tool_results=("Tool result", "Tool result"),
+        expected_text="Final answer after 2 rounds",
+        expected_tool_calls=(("search_course_content", {"query": "test"}),) * 2,
+        tool_choices=("auto", "auto", "none"),
+    ),
+    FlowCase(
+        id="single_round_budget",
+        responses=(
+            {"tool_uses": [("tool_id", "search_course_content", {"query": "test"})]},
+            {"text": "Answer after one round", "stop_reason": "end_turn"},
+        ),
+        tool_results=("Tool result",),
+        expected_text="Answer after one round",
+        expected_tool_calls=(("search_course_content", {"query": "test"}),),
+        tool_choices=("auto", "none"),
+        max_rounds=1,
+    ),
+    FlowCase(
+        id="tool_error",
+        responses=(
+            {"tool_uses": [("tool_123", "search_course_content", {"query": "test"})]},
+            {"text": "I encountered an error but here's what I can tell you..."},
+        ),
+        tool_results=(Exception("Database connection failed"),),
+        expected_text="I encountered an error but here's what I can tell you...",
+        expected_tool_calls=(("search_course_content", {"query": "test"}),),
+        tool_choices=("auto", "auto"),
+        result_contains=("Tool execution failed", "Database connection failed"),
+    ),
+]
+
+
 class TestAIGenerator:
     """Test the AIGenerator functionality"""
 
@@ -22,19 +149,105 @@ class TestAIGenerator:
         assert generator.base_params["temperature"] == 0
         assert generator.base_params["max_tokens"] == 800
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_without_tools(self, mock_anthropic_class):
-        """Test generating response without tools"""
-        # Setup mock
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+    def test_generators_share_connection_pool(self):
+        """Test that separate generators reuse one pooled HTTP client"""
+        first = AIGenerator(api_key="test-key", model="test-model")
+        second = AIGenerator(api_key="other-key", model="test-model")
+
+        assert first.client._client is second.client._client
+        assert first.aclient._client is second.aclient._client
+
+    def test_generators_share_tool_executor(self):
+        """Test that generators reuse one tool thread pool"""
+        first = AIGenerator(api_key="test-key", model="test-model")
+        second = AIGenerator(api_key="other-key", model="test-model")
+
+        assert first.tool_executor is second.tool_executor
+
+    def test_generators_share_client_per_api_key(self):
+        """Test that generators with the same API key reuse one SDK client"""
+        first = AIGenerator(api_key="test-key", model="test-model")
+        second = AIGenerator(api_key="test-key", model="other-model")
+        other = AIGenerator(api_key="other-key", model="test-model")
+
+        assert first.client is second.client
+        assert first.aclient is second.aclient
+        assert other.client is not first.client
+
+    def test_cache_marked_tools_reused_for_same_list(self, generator):
+        """Test that the same tools list maps to one shared cache-marked copy"""
+        tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
+
+        first = generator._build_initial_params("q1", None, tools)["tools"]
+        second = generator._build_initial_params("q2", None, tools)["tools"]
+        other = generator._build_initial_params("q3", None, list(tools))["tools"]
+
+        assert first is second
+        assert other is not first and other == first
+
+    def test_system_blocks_shared_without_history(self, generator):
+        """Test that history-free calls reuse one system list and history gets its own block"""
+        first = generator._build_system(None)
+        second = generator._build_system("")
+        with_history = generator._build_system("User: hi")
+
+        assert first is second
+        assert first == [generator.SYSTEM_BLOCK]
+        assert with_history[0] is generator.SYSTEM_BLOCK
+        assert with_history[1] == {
+            "type": "text",
+            "text": "Previous conversation:\nUser: hi",
+        }
+
+    def test_session_history_extends_cached_prefix(self, generator):
+        """Test that a session's follow-up reuses last turn's history blocks"""
+        first_turn = "User: hi\nAssistant: hello"
+        second_turn = first_turn + "\nUser: more\nAssistant: sure"
+
+        first = generator._build_system(first_turn, "session_1")
+        second = generator._build_system(second_turn, "session_1")
+
+        # The breakpoint sits on the newest block; earlier text is unchanged
+        assert first[1]["text"] == "Previous conversation:\n" + first_turn
+        assert [block.get("cache_control") for block in second] == [
+            {"type": "ephemeral"},
+            None,
+            {"type": "ephemeral"},
+        ]
+        assert second[1]["text"] == first[1]["text"]
+        assert second[2]["text"] == "\nUser: more\nAssistant: sure"
 
-        mock_response = Mock()
-        mock_response.stop_reason = "end"
-        mock_response.content = [Mock(text="This is a simple answer")]
-        mock_client.messages.create.return_value = mock_response
+        # Once the window slides, history starts over as one block
+        slid = generator._build_system("User: more\nAssistant: sure", "session_1")
+        assert len(slid) == 2
+        assert slid[1]["cache_control"] == {"type": "ephemeral"}
 
-        generator = AIGenerator(api_key="test-key", model="test-model")
+    def test_forget_session_drops_history_blocks(self, generator):
+        """Test that a dropped session's cached history is released"""
+        generator._build_system("User: hi\nAssistant: hello", "session_1")
+        generator._build_system("User: yo\nAssistant: hey", "session_2")
+
+        generator.forget_session("session_1")
+        generator.forget_session("missing")
+
+        assert list(generator._session_history) == ["session_2"]
+
+    def test_params_leave_template_untouched(self, generator):
+        """Test that per-call params are built on a copy of the frozen template"""
+        messages = [{"role": "user", "content": "hi"}]
+
+        params = generator._params(messages, [generator.SYSTEM_BLOCK])
+
+        assert params["messages"] is messages
+        assert "tools" not in params and "tool_choice" not in params
+        assert "messages" not in generator.base_params
+        with pytest.raises(TypeError):
+            generator.base_params["max_tokens"] = 10
+
+    def test_generate_response_without_tools(self, generator, mock_anthropic):
+        """Test generating response without tools"""
+        mock_anthropic.queue(text="This is a simple answer")
+        mock_client = mock_anthropic.client
 
         # Test without tools
         result = generator.generate_response(
@@ -52,19 +265,44 @@ class TestAIGenerator:
         assert call_args["model"] == "test-model"
         assert call_args["messages"][0]["content"] == "What is Python?"
         assert "tools" not in call_args
+        assert call_args["system"] == [generator.SYSTEM_BLOCK]
+        assert call_args["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+    def test_repeated_query_served_from_cache(self, generator, mock_anthropic):
+        """Test that an identical direct-answer query skips the API call"""
+        # Only two calls should reach the API
+        for _ in range(2):
+            mock_anthropic.queue(text="Cached answer", stop_reason="end_turn")
+        mock_client = mock_anthropic.client
+
+        first = generator.generate_response(query="What is Python?")
+        second = generator.generate_response(query="What is Python?")
+        other = generator.generate_response(
+            query="What is Python?", conversation_history="User: hi"
+        )
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_with_conversation_history(self, mock_anthropic_class):
-        """Test generating response with conversation history"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        assert first == second == other == "Cached answer"
+        # The differing history is a separate cache entry
+        assert mock_client.messages.create.call_count == 2
 
-        mock_response = Mock()
-        mock_response.stop_reason = "end"
-        mock_response.content = [Mock(text="Answer with context")]
-        mock_client.messages.create.return_value = mock_response
+    def test_cache_key_tracks_tool_schemas(self, generator):
+        """Test that editing a tool schema changes the response cache key"""
+        tools = [{"name": "search_course_content", "description": "Search"}]
+        edited = [{"name": "search_course_content", "description": "Search v2"}]
 
-        generator = AIGenerator(api_key="test-key", model="test-model")
+        key = generator._cache_key("q", None, tools)
+
+        assert generator._cache_key("q", None, tools) == key
+        assert generator._cache_key("q", None, list(tools)) == key
+        assert generator._cache_key("q", None, edited) != key
+        assert generator._cache_key("q", None, None) != key
+
+    def test_generate_response_with_conversation_history(
+        self, generator, mock_anthropic
+    ):
+        """Test generating response with conversation history"""
+        mock_anthropic.queue(text="Answer with context")
+        mock_client = mock_anthropic.client
 
         history = "User: Previous question\nAssistant: Previous answer"
         result = generator.generate_response(
@@ -74,21 +312,18 @@ class TestAIGenerator:
         assert result == "Answer with context"
 
         call_args = mock_client.messages.create.call_args[1]
-        assert "Previous conversation:" in call_args["system"]
-        assert history in call_args["system"]
-
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_with_tools(self, mock_anthropic_class):
+        system_blocks = call_args["system"]
+        assert system_blocks[0]["text"] == generator.SYSTEM_PROMPT
+        assert system_blocks[0]["cache_control"] == {"type": "ephemeral"}
+        assert "Previous conversation:" in system_blocks[1]["text"]
+        assert history in system_blocks[1]["text"]
+        # History block must stay outside the cached prefix
+        assert "cache_control" not in system_blocks[1]
+
+    def test_generate_response_with_tools(self, generator, mock_anthropic):
         """Test generating response with tools available"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = Mock()
-        mock_response.stop_reason = "end"
-        mock_response.content = [Mock(text="Answer using tools")]
-        mock_client.messages.create.return_value = mock_response
-
-        generator = AIGenerator(api_key="test-key", model="test-model")
+        mock_anthropic.queue(text="Answer using tools")
+        mock_client = mock_anthropic.client
 
         tools = [
             {
@@ -106,120 +341,129 @@ class TestAIGenerator:
 
         call_args = mock_client.messages.create.call_args[1]
         assert "tools" in call_args
-        assert call_args["tools"] == tools
+        assert call_args["tools"][0]["name"] == "search_course_content"
+        assert call_args["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in tools[-1]  # Caller's definitions untouched
         assert call_args["tool_choice"] == {"type": "auto"}
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_execution_flow(self, mock_anthropic_class):
-        """Test the single-round tool execution flow when AI decides to use tools"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # First response - AI decides to use tool
-        mock_tool_response = Mock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool_content = Mock()
-        mock_tool_content.type = "tool_use"
-        mock_tool_content.name = "search_course_content"
-        mock_tool_content.input = {"query": "Python basics"}
-        mock_tool_content.id = "tool_123"
-        mock_tool_response.content = [mock_tool_content]
-
-        # Second response - AI decides no more tools needed
-        mock_second_response = Mock()
-        mock_second_response.stop_reason = "end"
-        mock_second_response.content = [
-            Mock(text="Here's what I found about Python basics...")
-        ]
+    @pytest.mark.parametrize("case", FLOW_CASES, ids=lambda case: case.id)
+    def test_generation_flow(self, case, mock_anthropic):
+        """Test scripted tool-calling conversations end to end"""
+        for response in case.responses:
+            mock_anthropic.queue(**response)
 
-        # Third response would be final, but shouldn't be called since second has stop_reason="end"
-        mock_client.messages.create.side_effect = [
-            mock_tool_response,
-            mock_second_response,
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.side_effect = list(case.tool_results)
+
+        generator = AIGenerator(
+            api_key="test-key", model="test-model", max_rounds=case.max_rounds
+        )
+        result = generator.generate_response(
+            query="Tell me about the Python course",
+            tools=[{"name": "get_course_outline"}, {"name": "search_course_content"}],
+            tool_manager=mock_tool_manager,
+        )
+
+        assert result == case.expected_text
+        assert mock_tool_manager.execute_tool.call_args_list == [
+            call(name, arguments) for name, arguments in case.expected_tool_calls
         ]
 
-        # Mock tool manager
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = (
-            "Python is a programming language..."
+        requests = mock_anthropic.requests
+        assert [request["tool_choice"]["type"] for request in requests] == list(
+            case.tool_choices
+        )
+        for round_number, request in enumerate(requests):
+            # Each round appends Claude's tool request and our results
+            messages = request["messages"]
+            assert len(messages) == 1 + 2 * round_number
+            assert [m["role"] for m in messages[1:]] == ["assistant", "user"] * (
+                round_number
+            )
+            # Tools stay in every request so the cached prefix keeps matching
+            assert request["tools"] is requests[0]["tools"]
+
+        last_result = requests[-1]["messages"][-1]["content"][-1]
+        assert last_result["type"] == "tool_result"
+        assert last_result["tool_use_id"] == case.responses[-2]["tool_uses"][-1][0]
+        for text in case.result_contains:
+            assert text in last_result["content"]
+
+    @pytest.mark.parametrize("error", [ConnectionError("refused"), TimeoutError()])
+    def test_tool_execution_error_short_circuit(self, error, generator, mock_anthropic):
+        """Test that an unreachable knowledge base is answered without Claude"""
+        mock_anthropic.queue(
+            tool_uses=[("tool_123", "search_course_content", {"query": "test"})]
         )
 
-        generator = AIGenerator(api_key="test-key", model="test-model")
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.side_effect = error
 
-        tools = [{"name": "search_course_content"}]
         result = generator.generate_response(
-            query="Tell me about Python basics",
-            tools=tools,
+            query="Tell me about the Python course",
+            tools=[{"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
         )
 
-        assert result == "Here's what I found about Python basics..."
-
-        # Verify tool was executed
-        mock_tool_manager.execute_tool.assert_called_once_with(
-            "search_course_content", query="Python basics"
-        )
+        assert result == AIGenerator.UNAVAILABLE_MESSAGE
+        assert len(mock_anthropic.requests) == 1
 
-        # Verify exactly 2 API calls were made (initial + one with tools still available)
-        assert mock_client.messages.create.call_count == 2
+    def test_long_tool_loops_send_a_bounded_window(self, mock_anthropic):
+        """Test that only the question and the newest tool rounds are resent"""
+        rounds = 10
+        for i in range(rounds):
+            mock_anthropic.queue(
+                tool_uses=[(f"tool_{i}", "search_course_content", {"query": f"q{i}"})]
+            )
+        mock_anthropic.queue(text="Done")
 
-        # Check second call still has tools available (key change!)
-        second_call_args = mock_client.messages.create.call_args_list[1][1]
-        assert "tools" in second_call_args  # Tools should still be available
-        assert second_call_args["tool_choice"] == {"type": "auto"}
-
-        # Check messages structure
-        messages = second_call_args["messages"]
-        assert (
-            len(messages) == 3
-        )  # Original user + assistant with tool + user with results
-        assert messages[1]["role"] == "assistant"  # AI's tool use
-        assert messages[2]["role"] == "user"  # Tool results
-        assert messages[2]["content"][0]["type"] == "tool_result"
-        assert (
-            messages[2]["content"][0]["content"]
-            == "Python is a programming language..."
-        )
-
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_multiple_tool_calls(self, mock_anthropic_class):
-        """Test handling multiple tool calls in one response"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.return_value = "Tool result"
 
-        # First response - AI decides to use multiple tools
-        mock_tool_response = Mock()
-        mock_tool_response.stop_reason = "tool_use"
+        generator = AIGenerator(
+            api_key="test-key", model="test-model", max_rounds=rounds
+        )
+        result = generator.generate_response(
+            query="Search a lot",
+            tools=[{"name": "search_course_content"}],
+            tool_manager=mock_tool_manager,
+        )
 
-        tool1 = Mock()
-        tool1.type = "tool_use"
-        tool1.name = "search_course_content"
-        tool1.input = {"query": "Python"}
-        tool1.id = "tool_1"
+        assert result == "Done"
+        cap = 1 + 2 * generator.MAX_HISTORY_TURNS
+        sent = [request["messages"] for request in mock_anthropic.requests]
+        assert max(len(messages) for messages in sent) == cap
 
-        tool2 = Mock()
-        tool2.type = "tool_use"
-        tool2.name = "get_course_outline"
-        tool2.input = {"course_title": "Python Course"}
-        tool2.id = "tool_2"
+        final = sent[-1]
+        assert final[0]["content"] == "Search a lot"
+        # The window starts on a tool_use turn, never an orphaned tool_result
+        oldest_kept = rounds - generator.MAX_HISTORY_TURNS
+        assert final[1]["role"] == "assistant"
+        assert final[1]["content"][0].id == f"tool_{oldest_kept}"
+        assert final[2]["content"][0]["tool_use_id"] == f"tool_{oldest_kept}"
 
-        mock_tool_response.content = [tool1, tool2]
+    def test_multiple_tool_calls(self, generator, mock_anthropic):
+        """Test handling multiple tool calls in one response"""
+        # First response - AI decides to use multiple tools
+        mock_anthropic.queue(
+            tool_uses=[
+                ("tool_1", "search_course_content", {"query": "Python"}),
+                ("tool_2", "get_course_outline", {"course_title": "Python Course"}),
+            ]
+        )
 
         # Second response - Final answer
-        mock_final_response = Mock()
-        mock_final_response.stop_reason = "end"
-        mock_final_response.content = [Mock(text="Combined results")]
+        mock_anthropic.queue("Combined results")
 
-        mock_client.messages.create.side_effect = [
-            mock_tool_response,
-            mock_final_response,
-        ]
+        # Both tools must be in flight at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=2)
 
-        # Mock tool manager
-        mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = ["Result 1", "Result 2"]
+        def concurrent_tool(name, arguments):
+            barrier.wait()
+            return f"Result for {name}"
 
-        generator = AIGenerator(api_key="test-key", model="test-model")
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.side_effect = concurrent_tool
 
         result = generator.generate_response(
             query="Complex query",
@@ -230,205 +474,378 @@ class TestAIGenerator:
         assert result == "Combined results"
         assert mock_tool_manager.execute_tool.call_count == 2
 
-    def test_system_prompt_content(self):
-        """Test that system prompt contains expected content"""
-        generator = AIGenerator(api_key="test-key", model="test-model")
+        tool_results = mock_anthropic.requests[1]["messages"][2]["content"]
+        assert [r["tool_use_id"] for r in tool_results] == ["tool_1", "tool_2"]
+        assert [r["content"] for r in tool_results] == [
+            "Result for search_course_content",
+            "Result for get_course_outline",
+        ]
 
-        assert "get_course_outline" in generator.SYSTEM_PROMPT
-        assert "search_course_content" in generator.SYSTEM_PROMPT
-        assert "Tool Usage Guidelines" in generator.SYSTEM_PROMPT
-        assert "Sequential tool usage" in generator.SYSTEM_PROMPT
-        assert "up to 2 times" in generator.SYSTEM_PROMPT
-        assert "Brief, Concise and focused" in generator.SYSTEM_PROMPT
+    def test_parallel_tool_results_keep_order(self, generator, mock_anthropic):
+        """Test that concurrently executed tools report results in tool_use order"""
+        mock_tool_response = mock_anthropic.response(
+            tool_uses=[
+                (
+                    f"tool_{i}",
+                    "search_course_content",
+                    {"query": f"q{i}", "delay": delay},
+                )
+                for i, delay in enumerate([0.05, 0.0, 0.02])
+            ]
+        )
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_sequential_two_rounds(self, mock_anthropic_class):
-        """Test full two-round sequential tool calling flow"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # Round 1: AI uses get_course_outline tool
-        mock_round1_response = Mock()
-        mock_round1_response.stop_reason = "tool_use"
-        mock_tool1 = Mock()
-        mock_tool1.type = "tool_use"
-        mock_tool1.name = "get_course_outline"
-        mock_tool1.input = {"course_title": "Python Course"}
-        mock_tool1.id = "tool_1"
-        mock_round1_response.content = [mock_tool1]
-
-        # Round 2: After seeing outline, AI uses search_course_content
-        mock_round2_response = Mock()
-        mock_round2_response.stop_reason = "tool_use"
-        mock_tool2 = Mock()
-        mock_tool2.type = "tool_use"
-        mock_tool2.name = "search_course_content"
-        mock_tool2.input = {"query": "advanced topics", "lesson_number": 10}
-        mock_tool2.id = "tool_2"
-        mock_round2_response.content = [mock_tool2]
-
-        # Final response after 2 rounds
-        mock_final_response = Mock()
-        mock_final_response.stop_reason = "end"
-        mock_final_response.content = [
-            Mock(text="Based on the course outline and search results...")
-        ]
+        def slow_tool(name, arguments):
+            time.sleep(arguments["delay"])
+            return f"result for {arguments['query']}"
+
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.side_effect = slow_tool
+
+        results = generator._execute_tool_round(mock_tool_response, mock_tool_manager)
 
-        mock_client.messages.create.side_effect = [
-            mock_round1_response,  # Initial call
-            mock_round2_response,  # After first tool
-            mock_final_response,  # After second tool (max rounds reached)
+        assert [r["tool_use_id"] for r in results] == ["tool_0", "tool_1", "tool_2"]
+        assert [r["content"] for r in results] == [
+            "result for q0",
+            "result for q1",
+            "result for q2",
         ]
 
-        # Mock tool manager
+    def test_duplicate_tool_calls_run_once(self, generator, mock_anthropic):
+        """Test that identical tool calls in one response share a single execution"""
+        mock_tool_response = mock_anthropic.response(
+            tool_uses=[
+                (f"tool_{i}", "search_course_content", arguments)
+                for i, arguments in enumerate(
+                    [
+                        {"query": "MCP", "lesson_number": 1},
+                        {"lesson_number": 1, "query": "MCP"},
+                        {"query": "Chroma"},
+                    ]
+                )
+            ]
+        )
+
         mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = [
-            "Course Title: Python\nLessons:\n- Lesson 1: Basics\n- Lesson 10: Advanced Topics",
-            "Advanced topics include decorators, metaclasses, and async programming...",
+        mock_tool_manager.execute_tool.side_effect = lambda name, arguments: (
+            f"result for {arguments['query']}"
+        )
+
+        results = generator._execute_tool_round(mock_tool_response, mock_tool_manager)
+
+        assert mock_tool_manager.execute_tool.call_count == 2
+        assert [r["tool_use_id"] for r in results] == ["tool_0", "tool_1", "tool_2"]
+        assert [r["content"] for r in results] == [
+            "result for MCP",
+            "result for MCP",
+            "result for Chroma",
         ]
 
-        generator = AIGenerator(api_key="test-key", model="test-model")
+    def test_system_prompt_content(self, generator):
+        """Test that system prompt contains expected content"""
+        assert "get_course_outline" in generator.SYSTEM_PROMPT
+        assert "search_course_content" in generator.SYSTEM_PROMPT
+        assert "Tool Usage Guidelines" in generator.SYSTEM_PROMPT
+        assert "Sequential tool usage" in generator.SYSTEM_PROMPT
+        assert "up to 2 times" in generator.SYSTEM_PROMPT
+        assert "Brief, Concise and focused" in generator.SYSTEM_PROMPT
 
-        tools = [{"name": "get_course_outline"}, {"name": "search_course_content"}]
+    def test_rounds_extend_previous_messages(self, generator, mock_anthropic):
+        """Test that each round appends to the prior messages and marks a cache breakpoint"""
+        for i in range(2):
+            mock_anthropic.queue(
+                tool_uses=[(f"tool_{i}", "search_course_content", {"query": f"q{i}"})]
+            )
+        mock_anthropic.queue("Done")
+
+        # Breakpoints move on later rounds, so note them as each call is sent
+        marked = []
+        send = mock_anthropic.client.messages.create.side_effect
+
+        def record(**params):
+            last_content = params["messages"][-1]["content"]
+            marked.append(
+                isinstance(last_content, list) and "cache_control" in last_content[-1]
+            )
+            return send(**params)
+
+        mock_anthropic.client.messages.create.side_effect = record
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.return_value = "Tool result"
 
         result = generator.generate_response(
-            query="What advanced topics are covered in the Python course?",
-            tools=tools,
+            query="Search twice",
+            tools=[{"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
         )
 
-        assert result == "Based on the course outline and search results..."
+        assert result == "Done"
+        snapshots = [request["messages"] for request in mock_anthropic.requests]
+        for earlier, later in zip(snapshots, snapshots[1:]):
+            assert later[: len(earlier)] == earlier
+        assert marked == [False, True, True]
+
+        # Only the newest tool_result keeps its breakpoint
+        first_results = snapshots[2][2]["content"]
+        second_results = snapshots[2][4]["content"]
+        assert "cache_control" not in first_results[-1]
+        assert second_results[-1]["cache_control"] == {"type": "ephemeral"}
+
+    def test_no_final_call_without_pending_tools(self, generator, mock_anthropic):
+        """Test that a text-only response never triggers the forced final call"""
+        mock_text_response = mock_anthropic.response("Already answered", "end_turn")
+
+        result = generator._handle_tool_execution(
+            mock_text_response,
+            {"messages": [{"role": "user", "content": "q"}], "system": []},
+            Mock(),
+        )
+
+        assert result == "Already answered"
+        assert mock_anthropic.requests == []
 
-        # Verify both tools were executed
-        assert mock_tool_manager.execute_tool.call_count == 2
-        mock_tool_manager.execute_tool.assert_any_call(
-            "get_course_outline", course_title="Python Course"
+    def test_invalid_tool_arguments_rejected_before_execution(
+        self, generator, mock_anthropic
+    ):
+        """Test that arguments failing the tool's input_schema never reach the tool"""
+        mock_anthropic.queue(
+            tool_uses=[("tool_123", "search_course_content", {"lesson_number": "two"})]
         )
-        mock_tool_manager.execute_tool.assert_any_call(
-            "search_course_content", query="advanced topics", lesson_number=10
+        mock_anthropic.queue("Please rephrase", "end_turn")
+        mock_tool_manager = Mock()
+
+        generator.generate_response(
+            query="Search lesson two",
+            tools=[
+                {
+                    "name": "search_course_content",
+                    "input_schema": {
+                        "type": "object",
+                        "properties": {
+                            "query": {"type": "string"},
+                            "lesson_number": {"type": "integer"},
+                        },
+                        "required": ["query"],
+                    },
+                }
+            ],
+            tool_manager=mock_tool_manager,
         )
 
-        # Verify 3 API calls were made
-        assert mock_client.messages.create.call_count == 3
+        mock_tool_manager.execute_tool.assert_not_called()
+        tool_result = mock_anthropic.requests[1]["messages"][2]["content"][0]
+        assert tool_result["content"].startswith(
+            "Tool execution failed: invalid arguments"
+        )
 
-        # Check that tools were available in round 2
-        second_call_args = mock_client.messages.create.call_args_list[1][1]
-        assert "tools" in second_call_args
+    @patch("ai_generator.anthropic.AsyncAnthropic")
+    async def test_agenerate_response_with_tool_round(
+        self, mock_async_class, mock_anthropic
+    ):
+        """Test the async path awaits the client and gathers tool results"""
+        mock_client = Mock()
+        mock_async_class.return_value = mock_client
 
-        # Check final call has no tools (max rounds reached)
-        final_call_args = mock_client.messages.create.call_args_list[2][1]
-        assert "tools" not in final_call_args
+        mock_tool_response = mock_anthropic.response(
+            tool_uses=[
+                ("tool_123", "search_course_content", {"query": "Python basics"})
+            ]
+        )
+        mock_final_response = mock_anthropic.response("Async answer")
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_max_rounds_termination(self, mock_anthropic_class):
-        """Test behavior when Claude wants more than 2 rounds"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # Create responses that always want to use tools
-        mock_tool_response = Mock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool = Mock()
-        mock_tool.type = "tool_use"
-        mock_tool.name = "search_course_content"
-        mock_tool.input = {"query": "test"}
-        mock_tool.id = "tool_id"
-        mock_tool_response.content = [mock_tool]
-
-        # Final response when no tools available
-        mock_final = Mock()
-        mock_final.stop_reason = "end"
-        mock_final.content = [Mock(text="Final answer after 2 rounds")]
-
-        mock_client.messages.create.side_effect = [
-            mock_tool_response,  # Round 1
-            mock_tool_response,  # Round 2 (still wants tools)
-            mock_final,  # Forced final without tools
-        ]
+        mock_client.messages.create = AsyncMock(
+            side_effect=[mock_tool_response, mock_final_response]
+        )
 
         mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.return_value = "Tool result"
+        mock_tool_manager.execute_tool.return_value = "Python is a language..."
 
         generator = AIGenerator(api_key="test-key", model="test-model")
 
-        result = generator.generate_response(
-            query="Complex query",
+        result = await generator.agenerate_response(
+            query="Tell me about Python basics",
             tools=[{"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
         )
 
-        assert result == "Final answer after 2 rounds"
+        assert result == "Async answer"
+        assert mock_client.messages.create.await_count == 2
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", {"query": "Python basics"}
+        )
 
-        # Verify exactly 2 tool executions
-        assert mock_tool_manager.execute_tool.call_count == 2
+        second_call_args = mock_client.messages.create.call_args_list[1][1]
+        tool_result = second_call_args["messages"][2]["content"][0]
+        assert tool_result["tool_use_id"] == "tool_123"
+        assert tool_result["content"] == "Python is a language..."
+
+    @patch("ai_generator.anthropic.AsyncAnthropic")
+    async def test_agenerate_response_stream_yields_chunks(
+        self, mock_async_class, mock_anthropic
+    ):
+        """Test that streamed text arrives in chunks across a tool round"""
+        mock_client = Mock()
+        mock_async_class.return_value = mock_client
 
-        # Verify 3 API calls total
-        assert mock_client.messages.create.call_count == 3
+        tool_message = mock_anthropic.response(
+            tool_uses=[
+                ("tool_123", "search_course_content", {"query": "Python basics"})
+            ]
+        )
+        final_message = mock_anthropic.response("Python", "end_turn")
 
-        # Verify last call has no tools
-        final_call_args = mock_client.messages.create.call_args_list[2][1]
-        assert "tools" not in final_call_args
+        mock_client.messages.stream.side_effect = [
+            FakeAsyncStream([], tool_message),
+            FakeAsyncStream(["Py", "thon"], final_message),
+        ]
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_execution_error_handling(self, mock_anthropic_class):
-        """Test graceful handling of tool execution errors"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # AI decides to use tool
-        mock_tool_response = Mock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool_content = Mock()
-        mock_tool_content.type = "tool_use"
-        mock_tool_content.name = "search_course_content"
-        mock_tool_content.input = {"query": "test"}
-        mock_tool_content.id = "tool_123"
-        mock_tool_response.content = [mock_tool_content]
-
-        # Response after seeing error
-        mock_final = Mock()
-        mock_final.stop_reason = "end"
-        mock_final.content = [
-            Mock(text="I encountered an error but here's what I can tell you...")
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.return_value = "Python is a language..."
+
+        generator = AIGenerator(api_key="test-key", model="test-model")
+
+        chunks = [
+            chunk
+            async for chunk in generator.agenerate_response_stream(
+                query="Tell me about Python basics",
+                tools=[{"name": "search_course_content"}],
+                tool_manager=mock_tool_manager,
+            )
         ]
 
-        mock_client.messages.create.side_effect = [mock_tool_response, mock_final]
+        assert chunks == ["Py", "thon"]
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", {"query": "Python basics"}
+        )
+        second_call_args = mock_client.messages.stream.call_args_list[1][1]
+        tool_result = second_call_args["messages"][2]["content"][0]
+        assert tool_result["tool_use_id"] == "tool_123"
+
+    @patch("ai_generator.anthropic.AsyncAnthropic")
+    async def test_agenerate_response_stream_answers_when_rounds_exhausted(
+        self, mock_async_class, mock_anthropic
+    ):
+        """Test that a tool request with no rounds left gets a tool-free answer"""
+        mock_client = Mock()
+        mock_async_class.return_value = mock_client
 
-        # Mock tool manager that throws error
+        tool_message = mock_anthropic.response(
+            tool_uses=[("tool_123", "search_course_content", {"query": "Python"})]
+        )
+        final_message = mock_anthropic.response("Python", "end_turn")
+        mock_client.messages.stream.side_effect = [
+            FakeAsyncStream([], tool_message),
+            FakeAsyncStream(["Python"], final_message),
+        ]
         mock_tool_manager = Mock()
-        mock_tool_manager.execute_tool.side_effect = Exception(
-            "Database connection failed"
+
+        generator = AIGenerator(api_key="test-key", model="test-model", max_rounds=0)
+
+        chunks = [
+            chunk
+            async for chunk in generator.agenerate_response_stream(
+                query="Tell me about Python",
+                tools=[{"name": "search_course_content"}],
+                tool_manager=mock_tool_manager,
+            )
+        ]
+
+        assert chunks == ["Python"]
+        mock_tool_manager.execute_tool.assert_not_called()
+        tool_choices = [
+            kwargs["tool_choice"]["type"]
+            for _, kwargs in mock_client.messages.stream.call_args_list
+        ]
+        assert tool_choices == ["auto", "none"]
+        # Answered after a tool request, so not a direct answer to cache
+        assert len(generator.response_cache) == 0
+
+    @patch("ai_generator.anthropic.AsyncAnthropic")
+    async def test_agenerate_response_stream_skips_cache_on_tool_use(
+        self, mock_async_class, mock_anthropic
+    ):
+        """Test that a stream stopping on tool_use is not cached as the answer"""
+        mock_client = Mock()
+        mock_async_class.return_value = mock_client
+
+        tool_message = mock_anthropic.response(
+            "Let me search.",
+            tool_uses=[("tool_123", "search_course_content", {"query": "Python"})],
         )
+        mock_client.messages.stream.side_effect = [
+            FakeAsyncStream(["Let me search."], tool_message)
+        ]
 
         generator = AIGenerator(api_key="test-key", model="test-model")
 
+        chunks = [
+            chunk
+            async for chunk in generator.agenerate_response_stream(
+                query="Tell me about Python",
+                tools=[{"name": "search_course_content"}],
+            )
+        ]
+
+        assert chunks == ["Let me search."]
+        assert len(generator.response_cache) == 0
+
+    def test_streaming_starts_tool_before_stream_ends(self, mock_anthropic):
+        """Test that a streamed tool_use block is executed while the stream is open"""
+        mock_client = mock_anthropic.client
+
+        mock_tool_response = mock_anthropic.response(
+            tool_uses=[
+                ("tool_123", "search_course_content", {"query": "Python basics"})
+            ]
+        )
+        mock_tool_content = mock_tool_response.content[0]
+        mock_final_response = mock_anthropic.response("Streamed answer", "end_turn")
+
+        mock_tool_manager = Mock()
+        mock_tool_manager.execute_tool.return_value = "Python is a language..."
+        seen_before_stop = []
+
+        def tool_events():
+            yield Mock(type="content_block_stop", content_block=mock_tool_content)
+            time.sleep(0.1)  # remainder of the stream still arriving
+            seen_before_stop.append(mock_tool_manager.execute_tool.called)
+            yield Mock(type="message_stop")
+
+        tool_stream = MagicMock()
+        tool_stream.__iter__.side_effect = tool_events
+        tool_stream.get_final_message.return_value = mock_tool_response
+
+        final_stream = MagicMock()
+        final_stream.__iter__.return_value = iter([Mock(type="message_stop")])
+        final_stream.get_final_message.return_value = mock_final_response
+
+        managers = [MagicMock(), MagicMock()]
+        managers[0].__enter__.return_value = tool_stream
+        managers[1].__enter__.return_value = final_stream
+        mock_client.messages.stream.side_effect = managers
+
+        generator = AIGenerator(api_key="test-key", model="test-model", stream=True)
+
         result = generator.generate_response(
-            query="Search for something",
+            query="Tell me about Python basics",
             tools=[{"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
         )
 
-        assert result == "I encountered an error but here's what I can tell you..."
+        assert result == "Streamed answer"
+        assert seen_before_stop == [True]
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", {"query": "Python basics"}
+        )
+        mock_client.messages.create.assert_not_called()
 
-        # Verify tool execution was attempted
-        mock_tool_manager.execute_tool.assert_called_once()
+        second_call_args = mock_client.messages.stream.call_args_list[1][1]
+        tool_result = second_call_args["messages"][2]["content"][0]
+        assert tool_result["tool_use_id"] == "tool_123"
+        assert tool_result["content"] == "Python is a language..."
 
-        # Verify error was handled and passed to Claude
-        second_call_args = mock_client.messages.create.call_args_list[1][1]
-        messages = second_call_args["messages"]
-        tool_result = messages[-1]["content"][0]
-        assert "Tool execution failed" in tool_result["content"]
-        assert "Database connection failed" in tool_result["content"]
-
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_error_handling_in_api_call(self, mock_anthropic_class):
+    def test_error_handling_in_api_call(self, generator, mock_anthropic):
         """Test that API errors are properly propagated"""
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_client.messages.create.side_effect = Exception("API Error")
-
-        generator = AIGenerator(api_key="test-key", model="test-model")
+        mock_anthropic.queue_error(Exception("API Error"))
 
         with pytest.raises(Exception) as exc_info:
             generator.generate_response(query="Test query")
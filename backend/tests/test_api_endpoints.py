@@ -1,290 +1,152 @@
 """
 Enhanced API endpoint tests with proper request/response handling
 """
+import asyncio
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch, MagicMock
-import sys
-from pathlib import Path
 
-# Add parent directory to path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from app_factory import health_check, root
 
-
-def create_test_app():
-    """Create a test app without static file mounts"""
-    from fastapi import FastAPI, HTTPException
-    from fastapi.middleware.cors import CORSMiddleware
-    from pydantic import BaseModel
-    from typing import List, Optional, Dict, Any, Union
-    
-    # Create minimal app for testing
-    app = FastAPI(title="Test RAG System")
-    
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    
-    # Define models
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: Optional[str] = None
-    
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: List[Union[str, Dict[str, str]]]
-        session_id: str
-    
-    class CourseStats(BaseModel):
-        total_courses: int
-        total_lessons: int
-        total_chunks: int
-        embedding_model: str
-    
-    # Mock RAG system
-    mock_rag_system = Mock()
-    
-    @app.get("/")
-    async def root():
-        return {"message": "Course Materials RAG System"}
-    
-    @app.get("/api/health")
-    async def health_check():
-        return {"status": "healthy", "service": "rag-system"}
-    
-    @app.post("/api/query", response_model=QueryResponse)
-    async def query_course(request: QueryRequest):
-        try:
-            response = mock_rag_system.process_query(
-                request.query,
-                request.session_id
-            )
-            return QueryResponse(
-                answer=response.get("answer", ""),
-                sources=response.get("sources", []),
-                session_id=response.get("session_id", "")
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    @app.get("/api/courses")
-    async def get_course_list():
-        try:
-            courses = mock_rag_system.get_all_courses()
-            return {"courses": courses}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    @app.get("/api/stats", response_model=CourseStats)
-    async def get_stats():
-        try:
-            stats = mock_rag_system.get_stats()
-            return CourseStats(**stats)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    return app, mock_rag_system
+# Run on the session event loop, which owns the shared api_client
+pytestmark = pytest.mark.asyncio(loop_scope="session")
 
 
 @pytest.fixture
-def test_client():
-    """Create a test client with mocked RAG system"""
-    app, mock_rag = create_test_app()
-    client = TestClient(app)
-    return client, mock_rag
+def test_client(api_client, api_app):
+    """Shared client plus the RAG stub, reset so each test starts clean"""
+    _, mock_rag = api_app
+    mock_rag.reset()
+    return api_client, mock_rag
 
 
-@pytest.fixture
-def mock_rag_response():
-    """Mock RAG system response"""
-    return {
-        "answer": "Python is a high-level programming language known for its simplicity.",
-        "sources": [
-            {"text": "Introduction to Python", "link": "https://example.com/lesson0"},
-            {"text": "Python Basics", "link": "https://example.com/lesson1"}
-        ],
-        "session_id": "test-session-123"
+# Canned RAG payloads, built once at import; tests must not mutate them
+_MOCK_RAG_RESPONSE = {
+    "answer": "Python is a high-level programming language known for its simplicity.",
+    "sources": [
+        {"text": "Introduction to Python", "link": "https://example.com/lesson0"},
+        {"text": "Python Basics", "link": "https://example.com/lesson1"}
+    ],
+    "session_id": "test-session-123"
+}
+
+_MOCK_COURSE_LIST = [
+    {
+        "title": "Python Programming",
+        "instructor": "John Doe",
+        "lessons": 10,
+        "link": "https://example.com/python"
+    },
+    {
+        "title": "Data Science with Python",
+        "instructor": "Jane Smith",
+        "lessons": 8,
+        "link": "https://example.com/datascience"
     }
+]
 
+_MOCK_STATS = {
+    "total_courses": 2,
+    "total_lessons": 18,
+    "total_chunks": 150,
+    "embedding_model": "all-MiniLM-L6-v2"
+}
 
-@pytest.fixture
-def mock_course_list():
-    """Mock course list"""
-    return [
-        {
-            "title": "Python Programming",
-            "instructor": "John Doe",
-            "lessons": 10,
-            "link": "https://example.com/python"
-        },
-        {
-            "title": "Data Science with Python",
-            "instructor": "Jane Smith",
-            "lessons": 8,
-            "link": "https://example.com/datascience"
-        }
-    ]
 
+# Endpoints backed by the RAG system: method, path, RAG method, expected call args
+RAG_ENDPOINTS = [
+    pytest.param("post", "/api/query", "process_query", ("What is Python?", None), id="query"),
+    pytest.param("get", "/api/courses", "get_all_courses", (), id="courses"),
+    pytest.param("get", "/api/stats", "get_stats", (), id="stats"),
+]
 
-@pytest.fixture
-def mock_stats():
-    """Mock system statistics"""
-    return {
-        "total_courses": 2,
-        "total_lessons": 18,
-        "total_chunks": 150,
-        "embedding_model": "all-MiniLM-L6-v2"
-    }
+# Each RAG method's canned payload and the JSON its endpoint returns for it
+PAYLOADS = {
+    "process_query": (_MOCK_RAG_RESPONSE, _MOCK_RAG_RESPONSE),
+    "get_all_courses": (_MOCK_COURSE_LIST, {"courses": _MOCK_COURSE_LIST}),
+    "get_stats": (_MOCK_STATS, _MOCK_STATS),
+}
+
+
+async def call_endpoint(client, method, path):
+    """Send the canned query body to POST endpoints and no body to GET ones"""
+    body = {"query": "What is Python?", "session_id": None} if method == "post" else None
+    return await client.request(method, path, json=body)
 
 
 class TestAPIEndpoints:
     """Test suite for API endpoints"""
     
-    def test_root_endpoint(self, test_client):
+    async def test_root_endpoint(self):
         """Test root endpoint returns expected message"""
-        client, _ = test_client
-        response = client.get("/")
-        assert response.status_code == 200
-        assert response.json() == {"message": "Course Materials RAG System"}
+        # Literal body, no dependencies: call the handler without HTTP
+        assert await root() == {"message": "Course Materials RAG System"}
     
-    def test_health_check(self, test_client):
+    async def test_health_check(self):
         """Test health check endpoint"""
-        client, _ = test_client
-        response = client.get("/api/health")
-        assert response.status_code == 200
-        data = response.json()
+        data = await health_check()
         assert data["status"] == "healthy"
         assert data["service"] == "rag-system"
     
-    def test_query_endpoint_success(self, test_client, mock_rag_response):
-        """Test successful query processing"""
+    @pytest.mark.parametrize(("method", "path", "attr", "call_args"), RAG_ENDPOINTS)
+    async def test_endpoint_success(
+        self, test_client, method, path, attr, call_args
+    ):
+        """Test that each endpoint returns what the RAG system produced"""
         client, mock_rag = test_client
-        mock_rag.process_query.return_value = mock_rag_response
+        payload, expected = PAYLOADS[attr]
+        mock_rag.results[attr] = payload
         
-        request_data = {
-            "query": "What is Python?",
-            "session_id": None
-        }
-        
-        response = client.post("/api/query", json=request_data)
+        response = await call_endpoint(client, method, path)
         assert response.status_code == 200
-        
-        data = response.json()
-        assert "answer" in data
-        assert "sources" in data
-        assert "session_id" in data
-        assert data["answer"] == mock_rag_response["answer"]
-        assert len(data["sources"]) == 2
+        assert response.json() == expected
         
         # Verify RAG system was called correctly
-        mock_rag.process_query.assert_called_once_with(
-            "What is Python?",
-            None
-        )
+        assert mock_rag.calls == [(attr, *call_args)]
+    
+    @pytest.mark.parametrize(("method", "path", "attr", "call_args"), RAG_ENDPOINTS)
+    async def test_endpoint_error(self, test_client, method, path, attr, call_args):
+        """Test that a RAG system failure surfaces as a 500 with its message"""
+        client, mock_rag = test_client
+        mock_rag.results[attr] = Exception(f"{attr} failed")
+        
+        response = await call_endpoint(client, method, path)
+        assert response.status_code == 500
+        assert f"{attr} failed" in response.json()["detail"]
     
-    def test_query_endpoint_with_session(self, test_client, mock_rag_response):
+    async def test_query_endpoint_with_session(self, test_client):
         """Test query with existing session ID"""
         client, mock_rag = test_client
-        mock_rag.process_query.return_value = mock_rag_response
+        mock_rag.results["process_query"] = _MOCK_RAG_RESPONSE
         
         request_data = {
             "query": "Tell me more",
             "session_id": "existing-session-456"
         }
         
-        response = client.post("/api/query", json=request_data)
+        response = await client.post("/api/query", json=request_data)
         assert response.status_code == 200
         
-        mock_rag.process_query.assert_called_once_with(
-            "Tell me more",
-            "existing-session-456"
-        )
-    
-    def test_query_endpoint_error_handling(self, test_client):
-        """Test error handling in query endpoint"""
-        client, mock_rag = test_client
-        mock_rag.process_query.side_effect = Exception("RAG system error")
-        
-        request_data = {
-            "query": "What is Python?",
-            "session_id": None
-        }
-        
-        response = client.post("/api/query", json=request_data)
-        assert response.status_code == 500
-        assert "RAG system error" in response.json()["detail"]
+        assert mock_rag.calls == [
+            ("process_query", "Tell me more", "existing-session-456")
+        ]
     
-    def test_query_endpoint_invalid_request(self, test_client):
+    async def test_query_endpoint_invalid_request(self, test_client):
         """Test query endpoint with invalid request data"""
         client, _ = test_client
         
         # Missing query field
-        response = client.post("/api/query", json={})
+        response = await client.post("/api/query", json={})
         assert response.status_code == 422
-    
-    def test_courses_endpoint(self, test_client, mock_course_list):
-        """Test course list endpoint"""
-        client, mock_rag = test_client
-        mock_rag.get_all_courses.return_value = mock_course_list
-        
-        response = client.get("/api/courses")
-        assert response.status_code == 200
-        
-        data = response.json()
-        assert "courses" in data
-        assert len(data["courses"]) == 2
-        assert data["courses"][0]["title"] == "Python Programming"
-        
-        mock_rag.get_all_courses.assert_called_once()
-    
-    def test_courses_endpoint_error(self, test_client):
-        """Test course list endpoint error handling"""
-        client, mock_rag = test_client
-        mock_rag.get_all_courses.side_effect = Exception("Database error")
-        
-        response = client.get("/api/courses")
-        assert response.status_code == 500
-        assert "Database error" in response.json()["detail"]
-    
-    def test_stats_endpoint(self, test_client, mock_stats):
-        """Test statistics endpoint"""
-        client, mock_rag = test_client
-        mock_rag.get_stats.return_value = mock_stats
-        
-        response = client.get("/api/stats")
-        assert response.status_code == 200
-        
-        data = response.json()
-        assert data["total_courses"] == 2
-        assert data["total_lessons"] == 18
-        assert data["total_chunks"] == 150
-        assert data["embedding_model"] == "all-MiniLM-L6-v2"
-        
-        mock_rag.get_stats.assert_called_once()
-    
-    def test_stats_endpoint_error(self, test_client):
-        """Test statistics endpoint error handling"""
-        client, mock_rag = test_client
-        mock_rag.get_stats.side_effect = Exception("Stats calculation error")
-        
-        response = client.get("/api/stats")
-        assert response.status_code == 500
-        assert "Stats calculation error" in response.json()["detail"]
 
 
 class TestAPIIntegration:
     """Integration tests for API with mocked components"""
     
-    def test_query_with_tool_execution(self, test_client):
+    async def test_query_with_tool_execution(self, test_client):
         """Test query that triggers tool execution"""
         client, mock_rag = test_client
         
         # Mock response with tool execution
-        mock_rag.process_query.return_value = {
+        mock_rag.results["process_query"] = {
             "answer": "Based on the course content, Python uses dynamic typing.",
             "sources": [
                 {"text": "Variables and Data Types", "link": "https://example.com/lesson2"},
@@ -298,18 +160,18 @@ class TestAPIIntegration:
             "session_id": None
         }
         
-        response = client.post("/api/query", json=request_data)
+        response = await client.post("/api/query", json=request_data)
         assert response.status_code == 200
         
         data = response.json()
         assert "dynamic typing" in data["answer"]
         assert len(data["sources"]) == 2
     
-    def test_query_with_empty_sources(self, test_client):
+    async def test_query_with_empty_sources(self, test_client):
         """Test query with no sources found"""
         client, mock_rag = test_client
         
-        mock_rag.process_query.return_value = {
+        mock_rag.results["process_query"] = {
             "answer": "I don't have specific information about that topic.",
             "sources": [],
             "session_id": "session-999"
@@ -320,17 +182,20 @@ class TestAPIIntegration:
             "session_id": None
         }
         
-        response = client.post("/api/query", json=request_data)
+        response = await client.post("/api/query", json=request_data)
         assert response.status_code == 200
         
         data = response.json()
         assert len(data["sources"]) == 0
         assert "don't have specific information" in data["answer"]
     
-    def test_concurrent_queries(self, test_client, mock_rag_response):
+    async def test_concurrent_queries(self, test_client):
         """Test handling multiple concurrent queries"""
         client, mock_rag = test_client
-        mock_rag.process_query.return_value = mock_rag_response
+        # Echo each query so a response crossed with another request shows up
+        mock_rag.results["process_query"] = lambda query, session_id: {
+            **_MOCK_RAG_RESPONSE, "answer": f"Answer to {query}"
+        }
         
         queries = [
             {"query": "What is Python?", "session_id": None},
@@ -338,24 +203,23 @@ class TestAPIIntegration:
             {"query": "Explain loops", "session_id": None}
         ]
         
-        responses = []
-        for query_data in queries:
-            response = client.post("/api/query", json=query_data)
-            responses.append(response)
+        responses = await asyncio.gather(
+            *(client.post("/api/query", json=query_data) for query_data in queries)
+        )
         
-        # All requests should succeed
-        for response in responses:
+        # All requests should succeed, each with the answer to its own query
+        for query_data, response in zip(queries, responses):
             assert response.status_code == 200
-            assert "answer" in response.json()
+            assert response.json()["answer"] == f"Answer to {query_data['query']}"
         
         # Verify all queries were processed
-        assert mock_rag.process_query.call_count == 3
+        assert len(mock_rag.calls) == 3
 
 
 class TestAPIValidation:
     """Test request validation and error responses"""
     
-    def test_query_validation_empty_string(self, test_client):
+    async def test_query_validation_empty_string(self, test_client):
         """Test that empty query strings are rejected"""
         client, _ = test_client
         
@@ -364,35 +228,35 @@ class TestAPIValidation:
             "session_id": None
         }
         
-        response = client.post("/api/query", json=request_data)
+        response = await client.post("/api/query", json=request_data)
         # Note: Depending on validation, this might be 422 or process as normal
         # Adjust based on actual validation requirements
     
-    def test_query_validation_long_query(self, test_client, mock_rag_response):
-        """Test handling of very long queries"""
+    @pytest.mark.parametrize(
+        "repeats", [1, pytest.param(100, marks=pytest.mark.slow)], ids=["short", "long"]
+    )
+    async def test_query_validation_long_query(self, test_client, repeats):
+        """Test handling of queries from one sentence up to very long ones"""
         client, mock_rag = test_client
-        mock_rag.process_query.return_value = mock_rag_response
+        mock_rag.results["process_query"] = _MOCK_RAG_RESPONSE
         
-        long_query = "What is Python? " * 100  # Very long query
+        long_query = "What is Python? " * repeats
         request_data = {
             "query": long_query,
             "session_id": None
         }
         
-        response = client.post("/api/query", json=request_data)
+        response = await client.post("/api/query", json=request_data)
         assert response.status_code == 200
     
-    def test_invalid_http_methods(self, test_client):
-        """Test that invalid HTTP methods are rejected"""
-        client, _ = test_client
-        
-        # GET request to POST endpoint
-        response = client.get("/api/query")
-        assert response.status_code == 405
-        
-        # POST request to GET endpoint
-        response = client.post("/api/courses", json={})
-        assert response.status_code == 405
+    async def test_invalid_http_methods(self, api_app):
+        """Test that each endpoint only accepts its own HTTP method"""
+        app, _ = api_app
+        methods = {route.path: route.methods for route in app.routes}
+        
+        # POST-only query endpoint, GET-only courses endpoint
+        assert methods["/api/query"] == {"POST"}
+        assert methods["/api/courses"] == {"GET"}
 
 
 if __name__ == "__main__":
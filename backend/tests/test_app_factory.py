@@ -1,103 +1,31 @@
 """
 Test app factory to handle static file mounting issues in tests
 """
+import asyncio
 import pytest
-from fastapi import FastAPI
-from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch
-import sys
-from pathlib import Path
+from httpx import ASGITransport, AsyncClient
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from app_factory import create_app_for_testing, get_rag
 
 
-def create_app_for_testing(mock_rag_system=None):
-    """
-    Create a FastAPI app specifically for testing that avoids static file issues.
-    This factory pattern allows tests to create isolated app instances.
-    """
-    from fastapi import HTTPException
-    from fastapi.middleware.cors import CORSMiddleware
-    from pydantic import BaseModel
-    from typing import List, Optional, Dict, Any, Union
-    
-    app = FastAPI(title="Test RAG System")
-    
-    # Add CORS middleware
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    
-    # Use provided mock or create a new one
-    rag_system = mock_rag_system or Mock()
-    
-    # Define request/response models
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: Optional[str] = None
-    
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: List[Union[str, Dict[str, str]]]
-        session_id: str
-    
-    # Define endpoints
-    @app.get("/")
-    async def root():
-        return {"message": "Course Materials RAG System"}
-    
-    @app.get("/api/health")
-    async def health_check():
-        return {"status": "healthy", "service": "rag-system"}
-    
-    @app.post("/api/query", response_model=QueryResponse)
-    async def query_course(request: QueryRequest):
-        try:
-            # Use the injected RAG system
-            response = rag_system.process_query(
-                request.query,
-                request.session_id
-            )
-            return QueryResponse(**response)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    @app.get("/api/courses")
-    async def get_course_list():
-        try:
-            courses = rag_system.get_all_courses()
-            return {"courses": courses}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    @app.get("/api/stats")
-    async def get_stats():
-        try:
-            stats = rag_system.get_stats()
-            return stats
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    return app, rag_system
+def async_client(app):
+    """In-process async client that calls the ASGI app directly"""
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
 
 
 @pytest.fixture
-def app_with_mocked_rag(mock_rag_system):
+def app_with_mocked_rag():
     """Fixture that provides app and RAG system for testing"""
-    app, rag = create_app_for_testing(mock_rag_system)
+    app, rag = create_app_for_testing()
     return app, rag
 
 
 @pytest.fixture
-def test_client_with_app(app_with_mocked_rag):
+async def test_client_with_app(app_with_mocked_rag):
     """Fixture that provides a test client with the app"""
     app, rag = app_with_mocked_rag
-    client = TestClient(app)
-    return client, rag
+    async with async_client(app) as client:
+        yield client, rag
 
 
 class TestAppFactory:
@@ -117,7 +45,7 @@ class TestAppFactory:
         assert "/api/courses" in routes
         assert "/api/stats" in routes
     
-    def test_app_with_custom_rag(self, mock_rag_system):
+    async def test_app_with_custom_rag(self, mock_rag_system):
         """Test app creation with custom RAG system"""
         app, rag = create_app_for_testing(mock_rag_system)
         
@@ -125,8 +53,8 @@ class TestAppFactory:
         assert rag == mock_rag_system
         
         # Test with client
-        client = TestClient(app)
-        response = client.get("/api/health")
+        async with async_client(app) as client:
+            response = await client.get("/api/health")
         assert response.status_code == 200
     
     def test_isolated_app_instances(self):
@@ -135,33 +63,31 @@ class TestAppFactory:
         app2, rag2 = create_app_for_testing()
         
         # Apps should be different instances
-        assert app1 != app2
-        assert rag1 != rag2
+        assert app1 is not app2
+        assert rag1 is not rag2
         
-        # Each should have its own RAG system mock
-        rag1.test_value = "app1"
-        rag2.test_value = "app2"
-        
-        assert rag1.test_value != rag2.test_value
+        # Each app resolves the RAG dependency to its own system
+        assert app1.dependency_overrides[get_rag]() is rag1
+        assert app2.dependency_overrides[get_rag]() is rag2
 
 
 class TestIntegrationWithFactory:
     """Integration tests using the factory pattern"""
     
     @pytest.mark.api
-    def test_full_query_flow(self, test_client_with_app):
+    async def test_full_query_flow(self, test_client_with_app):
         """Test complete query flow with factory-created app"""
         client, mock_rag = test_client_with_app
         
         # Configure mock response
-        mock_rag.process_query.return_value = {
+        mock_rag.results["process_query"] = {
             "answer": "Test answer from factory app",
             "sources": [{"text": "Source 1", "link": "https://example.com"}],
             "session_id": "factory-session-123"
         }
         
         # Make request
-        response = client.post("/api/query", json={
+        response = await client.post("/api/query", json={
             "query": "Test query",
             "session_id": None
         })
@@ -172,17 +98,17 @@ class TestIntegrationWithFactory:
         assert data["session_id"] == "factory-session-123"
         
         # Verify mock was called
-        mock_rag.process_query.assert_called_once_with("Test query", None)
+        assert mock_rag.calls == [("process_query", "Test query", None)]
     
     @pytest.mark.api
-    def test_error_handling_in_factory_app(self, test_client_with_app):
+    async def test_error_handling_in_factory_app(self, test_client_with_app):
         """Test error handling in factory-created app"""
         client, mock_rag = test_client_with_app
         
         # Configure mock to raise exception
-        mock_rag.process_query.side_effect = Exception("Test error from factory")
+        mock_rag.results["process_query"] = Exception("Test error from factory")
         
-        response = client.post("/api/query", json={
+        response = await client.post("/api/query", json={
             "query": "Error query",
             "session_id": None
         })
@@ -191,16 +117,16 @@ class TestIntegrationWithFactory:
         assert "Test error from factory" in response.json()["detail"]
     
     @pytest.mark.api
-    def test_courses_endpoint_with_factory(self, test_client_with_app):
+    async def test_courses_endpoint_with_factory(self, test_client_with_app):
         """Test courses endpoint with factory app"""
         client, mock_rag = test_client_with_app
         
-        mock_rag.get_all_courses.return_value = [
+        mock_rag.results["get_all_courses"] = [
             {"title": "Course 1", "instructor": "Teacher 1"},
             {"title": "Course 2", "instructor": "Teacher 2"}
         ]
         
-        response = client.get("/api/courses")
+        response = await client.get("/api/courses")
         assert response.status_code == 200
         
         data = response.json()
@@ -208,7 +134,7 @@ class TestIntegrationWithFactory:
         assert data["courses"][0]["title"] == "Course 1"
 
 
-def test_app_import_isolation():
+async def test_app_import_isolation():
     """
     Test that the factory pattern avoids import issues.
     This test verifies that we can create an app without importing
@@ -216,10 +142,10 @@ def test_app_import_isolation():
     """
     # This should work without any import errors
     app, rag = create_app_for_testing()
-    client = TestClient(app)
     
     # Basic smoke test
-    response = client.get("/")
+    async with async_client(app) as client:
+        response = await client.get("/")
     assert response.status_code == 200
     assert response.json()["message"] == "Course Materials RAG System"
 
@@ -230,8 +156,11 @@ if __name__ == "__main__":
     app, rag = create_app_for_testing()
     print(f"✅ App created successfully: {app.title}")
     
-    client = TestClient(app)
-    response = client.get("/api/health")
+    async def check_health():
+        async with async_client(app) as client:
+            return await client.get("/api/health")
+
+    response = asyncio.run(check_health())
     print(f"✅ Health check: {response.json()}")
     
     print("\nFactory pattern working correctly!")
\ No newline at end of file
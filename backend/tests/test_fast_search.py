@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from fast_search import ContentMatrix, nearest
+
+
+class TestNearest:
+    """Test the exact nearest-neighbour kernel"""
+
+    @pytest.fixture
+    def vectors(self):
+        rng = np.random.default_rng(0)
+        query = rng.standard_normal(8, dtype=np.float32)
+        matrix = rng.standard_normal((50, 8), dtype=np.float32)
+        return query, matrix
+
+    @pytest.mark.parametrize(
+        "space, distance",
+        [
+            ("l2", lambda q, m: ((m - q) ** 2).sum(axis=1)),
+            (
+                "cosine",
+                lambda q, m: 1
+                - m @ q / (np.linalg.norm(m, axis=1) * np.linalg.norm(q)),
+            ),
+            ("ip", lambda q, m: 1 - m @ q),
+        ],
+    )
+    def test_matches_full_sort(self, vectors, space, distance):
+        """Test that the top k match a brute-force sort in every space"""
+        query, matrix = vectors
+        expected = distance(query, matrix)
+
+        indices, distances = nearest(query, matrix, 5, space)
+
+        assert indices.tolist() == np.argsort(expected)[:5].tolist()
+        np.testing.assert_allclose(distances, np.sort(expected)[:5], rtol=1e-4)
+
+    def test_k_larger_than_matrix(self, vectors):
+        """Test that asking for more rows than exist returns them all, ordered"""
+        query, matrix = vectors
+
+        indices, distances = nearest(query, matrix[:3], 10)
+
+        assert sorted(indices.tolist()) == [0, 1, 2]
+        assert list(distances) == sorted(distances)
+
+    def test_unknown_space(self, vectors):
+        """Test that an unsupported distance space is rejected"""
+        with pytest.raises(ValueError):
+            nearest(*vectors, 1, space="hamming")
+
+
+class TestContentMatrix:
+    """Test the column-oriented exact search copy of a collection"""
+
+    @pytest.fixture
+    def matrix(self):
+        rng = np.random.default_rng(1)
+        metadatas = [
+            {"course_title": course, "lesson_number": lesson, "chunk_index": i}
+            for i, (course, lesson) in enumerate(
+                [("A", 0), ("A", 1), ("B", 0), ("B", 1), ("A", 1), ("B", 0)]
+            )
+        ]
+        return ContentMatrix(
+            rng.standard_normal((6, 8)),
+            [f"doc {i}" for i in range(6)],
+            metadatas,
+        )
+
+    def test_filters_mask_rows(self, matrix):
+        """Test that course and lesson filters restrict the candidates"""
+        query = np.ones(8, dtype=np.float32)
+
+        _, metadatas, _ = matrix.search(query, 10, course_title="A", lesson_number=1)
+        assert sorted(m["chunk_index"] for m in metadatas) == [1, 4]
+
+        _, metadatas, _ = matrix.search(query, 10, lesson_number=0)
+        assert sorted(m["chunk_index"] for m in metadatas) == [0, 2, 5]
+
+        assert matrix.search(query, 10, course_title="C") == ([], [], [])
+
+    def test_unfiltered_matches_nearest(self, matrix):
+        """Test that an unfiltered search ranks every row like nearest()"""
+        query = np.ones(8, dtype=np.float32)
+
+        documents, _, distances = matrix.search(query, 3)
+        indices, expected = nearest(query, matrix.embeddings, 3)
+
+        assert documents == [f"doc {i}" for i in indices]
+        assert distances == pytest.approx(expected.tolist())
+
+    def test_int8_copy_returns_exact_results(self, matrix):
+        """Test that the int8 copy re-scores its shortlist to exact distances"""
+        ids = [f"id{i}" for i in range(len(matrix))]
+        vectors = dict(zip(ids, matrix.embeddings))
+        fetched = []
+
+        def fetch(wanted):
+            fetched.append(wanted)
+            return np.array([vectors[i] for i in wanted])
+
+        quantized = ContentMatrix(
+            matrix.embeddings,
+            matrix.documents,
+            matrix.metadatas,
+            ids=ids,
+            fetch_embeddings=fetch,
+            rerank=4,
+        )
+        query = np.ones(8, dtype=np.float32)
+
+        assert quantized.embeddings is None
+        assert quantized.search(query, 2, lesson_number=0) == matrix.search(
+            query, 2, lesson_number=0
+        )
+        # Only the shortlist is fetched in float32
+        assert len(fetched) == 1 and len(fetched[0]) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from quant import int8_dot, quantize_int8
+
+
+class TestQuantizeInt8:
+    """Test symmetric per-vector int8 quantization"""
+
+    def test_round_trip_error_is_within_half_a_step(self):
+        """Test that dequantized rows stay within half a quantization step"""
+        vectors = np.random.default_rng(0).standard_normal((20, 16))
+
+        codes, scales = quantize_int8(vectors)
+
+        assert codes.dtype == np.int8 and scales.dtype == np.float32
+        assert np.abs(codes).max(axis=1).tolist() == [127] * 20
+        error = np.abs(codes * scales[:, None] - vectors)
+        assert (error <= scales[:, None] / 2 + 1e-6).all()
+
+    def test_zero_vector(self):
+        """Test that an all-zero row quantizes to zeros without dividing by zero"""
+        codes, scales = quantize_int8(np.zeros(4))
+
+        assert codes.tolist() == [[0, 0, 0, 0]]
+        assert scales.tolist() == [1.0]
+
+    def test_int8_dot_approximates_float_dot(self):
+        """Test that quantized dot products track the float32 ones"""
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((50, 384)).astype(np.float32)
+        query = rng.standard_normal(384).astype(np.float32)
+
+        approximate = int8_dot(query, *quantize_int8(vectors))
+
+        np.testing.assert_allclose(approximate, vectors @ query, atol=0.5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from query_batcher import QueryBatcher
+
+
+class TestQueryBatcher:
+    """Test coalescing of concurrent identical queries"""
+
+    async def test_identical_queries_share_one_call(self):
+        """Test that repeats of an in-flight question wait on its answer"""
+        calls = []
+
+        async def generate(query):
+            calls.append(query)
+            await asyncio.sleep(0.01)
+            return f"Answer to {query}"
+
+        batcher = QueryBatcher()
+        results = await asyncio.gather(
+            *(
+                batcher.submit(query, lambda query=query: generate(query))
+                for query in ["q1", "q2", "q1", "q1", "q2"]
+            )
+        )
+
+        assert results == [
+            "Answer to q1",
+            "Answer to q2",
+            "Answer to q1",
+            "Answer to q1",
+            "Answer to q2",
+        ]
+        # Distinct questions never share a call
+        assert calls == ["q1", "q2"]
+
+    async def test_finished_query_is_not_reused(self):
+        """Test that only in-flight calls are joined, not completed ones"""
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return "Answer"
+
+        batcher = QueryBatcher()
+        assert await batcher.submit("q1", generate) == "Answer"
+        assert await batcher.submit("q1", generate) == "Answer"
+        assert len(calls) == 2
+
+    async def test_failure_reaches_every_waiter(self):
+        """Test that a failed call raises for each coalesced caller and is dropped"""
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("API Error")
+
+        batcher = QueryBatcher()
+        results = await asyncio.gather(
+            batcher.submit("q1", fail),
+            batcher.submit("q1", fail),
+            return_exceptions=True,
+        )
+
+        assert [str(result) for result in results] == ["API Error", "API Error"]
+        assert await batcher.submit("q1", lambda: asyncio.sleep(0, "ok")) == "ok"
+
+    async def test_cancelled_waiter_leaves_call_running(self):
+        """Test that one caller giving up does not cancel the shared call"""
+        release = asyncio.Event()
+
+        async def generate():
+            await release.wait()
+            return "Answer"
+
+        batcher = QueryBatcher()
+        first = asyncio.ensure_future(batcher.submit("q1", generate))
+        second = asyncio.ensure_future(batcher.submit("q1", generate))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        release.set()
+
+        assert await second == "Answer"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
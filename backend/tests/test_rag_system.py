@@ -1,29 +1,50 @@
-import os
-import sys
-from pathlib import Path
-from unittest.mock import MagicMock, Mock, patch
+import asyncio
+from dataclasses import replace
+from unittest.mock import DEFAULT, AsyncMock, Mock, patch
 
 import pytest
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from config import Config
 from models import Course, CourseChunk, Lesson
 from rag_system import RAGSystem
+from response_cache import ResponseCache
+
+# RAGSystem dependencies replaced by MagicMock classes in one patch.multiple
+_PATCHED_DEPENDENCIES = dict(
+    AIGenerator=DEFAULT, VectorStore=DEFAULT, DocumentProcessor=DEFAULT
+)
+
+
+@pytest.fixture(scope="class")
+def shared_rag(mock_config):
+    """One RAGSystem over patched dependencies, built once per test class"""
+    with patch.multiple("rag_system", **_PATCHED_DEPENDENCIES):
+        yield RAGSystem(mock_config)
+
+
+@pytest.fixture
+def rag_classes():
+    """Patched dependency classes, for tests that build their own RAGSystem"""
+    with patch.multiple("rag_system", **_PATCHED_DEPENDENCIES) as classes:
+        yield classes
+
+
+@pytest.fixture
+def rag_system(shared_rag):
+    """The shared RAGSystem with its mocked dependencies reset for this test"""
+    for dependency in (
+        shared_rag.ai_generator,
+        shared_rag.vector_store,
+        shared_rag.document_processor,
+    ):
+        dependency.reset_mock(return_value=True, side_effect=True)
+    return shared_rag
 
 
 class TestRAGSystem:
     """Test the RAGSystem end-to-end functionality"""
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_initialization(
-        self, mock_doc_processor, mock_vector_store, mock_ai_generator, mock_config
-    ):
+    def test_initialization(self, rag_system, mock_config):
         """Test RAGSystem initialization"""
-        rag_system = RAGSystem(mock_config)
-
         assert rag_system.config == mock_config
         assert rag_system.document_processor is not None
         assert rag_system.vector_store is not None
@@ -36,31 +57,16 @@ class TestRAGSystem:
         # Verify tools are registered
         assert len(rag_system.tool_manager.tools) == 2
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
     def test_add_course_document_success(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
-        sample_course,
-        sample_chunks,
+        self, rag_system, sample_course, sample_chunks
     ):
         """Test successfully adding a course document"""
-        # Setup mocks
-        mock_doc_processor = Mock()
-        mock_doc_processor_class.return_value = mock_doc_processor
+        mock_doc_processor = rag_system.document_processor
         mock_doc_processor.process_course_document.return_value = (
             sample_course,
             sample_chunks,
         )
-
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
-
-        rag_system = RAGSystem(mock_config)
+        mock_vector_store = rag_system.vector_store
 
         # Add course document
         course, num_chunks = rag_system.add_course_document("/path/to/course.txt")
@@ -75,25 +81,12 @@ class TestRAGSystem:
         mock_vector_store.add_course_metadata.assert_called_once_with(sample_course)
         mock_vector_store.add_course_content.assert_called_once_with(sample_chunks)
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_add_course_document_error(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
-    ):
+    def test_add_course_document_error(self, rag_system):
         """Test error handling when adding course document fails"""
-        mock_doc_processor = Mock()
-        mock_doc_processor_class.return_value = mock_doc_processor
-        mock_doc_processor.process_course_document.side_effect = Exception(
+        rag_system.document_processor.process_course_document.side_effect = Exception(
             "Parse error"
         )
 
-        rag_system = RAGSystem(mock_config)
-
         course, num_chunks = rag_system.add_course_document("/path/to/bad.txt")
 
         assert course is None
@@ -102,18 +95,12 @@ class TestRAGSystem:
     @patch("rag_system.os.path.exists")
     @patch("rag_system.os.listdir")
     @patch("rag_system.os.path.isfile")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
     def test_add_course_folder(
         self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
         mock_isfile,
         mock_listdir,
         mock_exists,
-        mock_config,
+        rag_system,
         sample_course,
         sample_chunks,
     ):
@@ -123,18 +110,15 @@ class TestRAGSystem:
         mock_listdir.return_value = ["course1.txt", "course2.pdf", "readme.md"]
         mock_isfile.side_effect = [True, True, True]
 
-        mock_doc_processor = Mock()
-        mock_doc_processor_class.return_value = mock_doc_processor
-        mock_doc_processor.process_course_document.return_value = (
-            sample_course,
-            sample_chunks,
+        # Two distinct courses: a repeated title would be skipped as a duplicate
+        second_course = sample_course.model_copy(
+            update={"title": f"{sample_course.title} II"}
         )
-
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
-        mock_vector_store.get_existing_course_titles.return_value = []
-
-        rag_system = RAGSystem(mock_config)
+        rag_system.document_processor.process_course_document.side_effect = [
+            (sample_course, sample_chunks),
+            (second_course, sample_chunks),
+        ]
+        rag_system.vector_store.get_existing_course_titles.return_value = []
 
         total_courses, total_chunks = rag_system.add_course_folder("/docs")
 
@@ -142,27 +126,11 @@ class TestRAGSystem:
         assert total_courses == 2
         assert total_chunks == 2 * len(sample_chunks)
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_query_without_session(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
-    ):
+    def test_query_without_session(self, rag_system):
         """Test querying without a session ID"""
-        # Setup mocks
-        mock_ai_generator = Mock()
-        mock_ai_generator_class.return_value = mock_ai_generator
+        mock_ai_generator = rag_system.ai_generator
         mock_ai_generator.generate_response.return_value = "Test response"
 
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
-
-        rag_system = RAGSystem(mock_config)
-
         response, sources = rag_system.query("What is Python?")
 
         assert response == "Test response"
@@ -174,27 +142,11 @@ class TestRAGSystem:
         assert "tools" in call_args
         assert call_args["tool_manager"] is not None
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_query_with_session(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
-    ):
+    def test_query_with_session(self, rag_system):
         """Test querying with a session ID for conversation context"""
-        # Setup mocks
-        mock_ai_generator = Mock()
-        mock_ai_generator_class.return_value = mock_ai_generator
+        mock_ai_generator = rag_system.ai_generator
         mock_ai_generator.generate_response.return_value = "Response with context"
 
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
-
-        rag_system = RAGSystem(mock_config)
-
         # Create a session
         session_id = rag_system.session_manager.create_session()
 
@@ -212,61 +164,251 @@ class TestRAGSystem:
         assert call_args["conversation_history"] is not None
         assert "Previous question" in call_args["conversation_history"]
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_query_with_tool_execution(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
-    ):
+    def test_query_with_tool_execution(self, rag_system):
         """Test query that triggers tool execution"""
-        # Setup mocks
-        mock_ai_generator = Mock()
-        mock_ai_generator_class.return_value = mock_ai_generator
-        mock_ai_generator.generate_response.return_value = (
+        rag_system.ai_generator.generate_response.return_value = (
             "Found information about Python"
         )
 
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
-
-        rag_system = RAGSystem(mock_config)
-
-        # Mock tool manager to simulate tool execution
-        rag_system.tool_manager.get_last_sources = Mock(
-            return_value=[
-                {
-                    "text": "Python Course - Lesson 1",
-                    "link": "https://example.com/lesson1",
-                }
-            ]
-        )
-
-        response, sources = rag_system.query("Search for Python basics")
+        # Mock tool manager to simulate tool execution; patched, not assigned,
+        # so the shared tool manager is restored for the next test
+        tool_sources = [
+            {
+                "text": "Python Course - Lesson 1",
+                "link": "https://example.com/lesson1",
+            }
+        ]
+        with (
+            patch.object(
+                rag_system.tool_manager, "get_last_sources", return_value=tool_sources
+            ),
+            patch.object(rag_system.tool_manager, "reset_sources") as reset_sources,
+        ):
+            response, sources = rag_system.query("Search for Python basics")
 
         assert response == "Found information about Python"
         assert len(sources) == 1
         assert sources[0]["text"] == "Python Course - Lesson 1"
 
         # Verify sources were reset after retrieval
-        rag_system.tool_manager.reset_sources.assert_called_once()
+        reset_sources.assert_called_once()
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_get_course_analytics(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
+    async def test_aquery_with_session(self, rag_system):
+        """Test the async query path awaits the generator and records history"""
+        mock_ai_generator = rag_system.ai_generator
+        mock_ai_generator.agenerate_response = AsyncMock(return_value="Async response")
+
+        session_id = rag_system.session_manager.create_session()
+
+        response, sources = await rag_system.aquery("What is Python?", session_id)
+
+        assert response == "Async response"
+        assert sources == []
+        mock_ai_generator.agenerate_response.assert_awaited_once()
+        mock_ai_generator.generate_response.assert_not_called()
+
+        history = rag_system.session_manager.get_conversation_history(session_id)
+        assert "What is Python?" in history
+        assert "Async response" in history
+
+    async def test_aquery_stream_emits_tokens_then_done(self, rag_system):
+        """Test that streamed tokens are followed by one done event with sources"""
+
+        async def fake_stream(**kwargs):
+            for chunk in ("Async ", "response"):
+                yield chunk
+
+        session_id = rag_system.session_manager.create_session()
+
+        with patch.object(
+            rag_system.ai_generator, "agenerate_response_stream", fake_stream
+        ):
+            events = [
+                event
+                async for event in rag_system.aquery_stream(
+                    "What is Python?", session_id
+                )
+            ]
+
+        assert events == [
+            {"type": "token", "text": "Async "},
+            {"type": "token", "text": "response"},
+            {"type": "done", "answer": "Async response", "sources": []},
+        ]
+        history = rag_system.session_manager.get_conversation_history(session_id)
+        assert "Async response" in history
+
+    async def test_aquery_coalesces_identical_fresh_queries(
+        self, rag_classes, mock_config
+    ):
+        """Test that concurrent repeats of a fresh question share one generation"""
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+        release = asyncio.Event()
+
+        async def answer(**kwargs):
+            await release.wait()
+            return f"Answer to {kwargs['query']}"
+
+        mock_ai_generator.agenerate_response = AsyncMock(side_effect=answer)
+        rag_system = RAGSystem(replace(mock_config, BATCH_QUERIES=True))
+        rag_system.tool_manager.get_last_sources = Mock(return_value=["Source"])
+
+        pending = [
+            asyncio.ensure_future(rag_system.aquery(query))
+            for query in ["What is Python?", "What is Python?", "What is Rust?"]
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*pending)
+
+        # Distinct questions keep their own prompt; repeats reuse its answer
+        prompts = [
+            call.kwargs["query"]
+            for call in mock_ai_generator.agenerate_response.await_args_list
+        ]
+        assert len(prompts) == 2
+        assert "What is Python?" in prompts[0] and "What is Rust?" in prompts[1]
+        assert results[0] == results[1] == (f"Answer to {prompts[0]}", ["Source"])
+        assert results[2] == (f"Answer to {prompts[1]}", ["Source"])
+
+    def test_semantic_cache_reuses_answer(self, rag_classes, mock_config):
+        """Test that a repeated fresh question is answered from the semantic cache"""
+        mock_vector_store = rag_classes["VectorStore"].return_value
+        mock_vector_store.embedding_function = lambda texts: [[1.0, 0.0] for _ in texts]
+
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+        mock_ai_generator.generate_response.return_value = "MCP is a protocol"
+
+        rag_system = RAGSystem(replace(mock_config, SEMANTIC_CACHE=True))
+
+        first = rag_system.query("What is MCP?")
+        second = rag_system.query("What is MCP?")
+
+        assert first == second == ("MCP is a protocol", [])
+        mock_ai_generator.generate_response.assert_called_once()
+
+        # New content invalidates cached answers
+        rag_system._invalidate_cached_answers()
+        rag_system.query("What is MCP?")
+        assert mock_ai_generator.generate_response.call_count == 2
+
+    def test_query_cache_reuses_exact_repeats(self, rag_classes, mock_config):
+        """Test that an exact repeat with the same history skips generation"""
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+        mock_ai_generator.generate_response.return_value = "MCP is a protocol"
+
+        rag_system = RAGSystem(mock_config, query_cache=ResponseCache(maxsize=128))
+
+        first = rag_system.query("What is MCP?")
+        second = rag_system.query("What is MCP?")
+
+        assert first == second == ("MCP is a protocol", [])
+        mock_ai_generator.generate_response.assert_called_once()
+
+        # The same question with conversation history is a different entry
+        session_id = rag_system.session_manager.create_session()
+        rag_system.session_manager.add_exchange(session_id, "Hi", "Hello")
+        rag_system.query("What is MCP?", session_id)
+        assert mock_ai_generator.generate_response.call_count == 2
+
+        # New content invalidates cached answers
+        rag_system._invalidate_cached_answers()
+        rag_system.query("What is MCP?")
+        assert mock_ai_generator.generate_response.call_count == 3
+
+    def test_reingest_clears_generator_response_cache(self, rag_classes, mock_config):
+        """Test that rebuilding the store drops the generator's cached answers"""
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+
+        rag_system = RAGSystem(mock_config)
+        rag_system.add_course_folder("/missing", clear_existing=True)
+
+        mock_ai_generator.response_cache.clear.assert_called_once_with()
+
+    def test_deleted_session_releases_generator_history(self, rag_classes, mock_config):
+        """Test that deleting a session drops the generator's cached history"""
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+
+        rag_system = RAGSystem(mock_config)
+        session_id = rag_system.session_manager.create_session()
+        rag_system.session_manager.delete_session(session_id)
+
+        mock_ai_generator.forget_session.assert_called_once_with(session_id)
+
+    def test_tool_gating_skips_tools_for_general_queries(
+        self, rag_classes, mock_config
     ):
+        """Test that only course-related questions are offered the search tools"""
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+        mock_ai_generator.generate_response.return_value = "Answer"
+
+        rag_system = RAGSystem(replace(mock_config, TOOL_GATING=True))
+
+        rag_system.query("What is the capital of France?")
+        general_call = mock_ai_generator.generate_response.call_args[1]
+        assert general_call["tools"] is None
+
+        rag_system.query("What does lesson 2 of the MCP course cover?")
+        course_call = mock_ai_generator.generate_response.call_args[1]
+        assert {tool["name"] for tool in course_call["tools"]} == {
+            "search_course_content",
+            "get_course_outline",
+        }
+
+    def test_direct_lookup_skips_generation(self, rag_classes, mock_config):
+        """Test that catalog and outline requests are answered without Claude"""
+        mock_vector_store = rag_classes["VectorStore"].return_value
+        mock_vector_store.get_existing_course_titles.return_value = [
+            "MCP: Build Rich-Context AI Apps",
+            "Python Basics",
+        ]
+        mock_vector_store.match_course_title.return_value = (
+            "MCP: Build Rich-Context AI Apps"
+        )
+        mock_vector_store._resolve_course_name.return_value = (
+            "MCP: Build Rich-Context AI Apps"
+        )
+        mock_vector_store.get_course_metadata.return_value = {
+            "title": "MCP: Build Rich-Context AI Apps"
+        }
+
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+        mock_ai_generator.generate_response.return_value = "Generated"
+
+        rag_system = RAGSystem(replace(mock_config, DIRECT_LOOKUP=True))
+
+        listing, _ = rag_system.query("What courses are available?")
+        outline, sources = rag_system.query("Show me the course outline for MCP")
+
+        assert "- Python Basics" in listing
+        assert outline.startswith("**Course Title:** MCP: Build Rich-Context AI Apps")
+        mock_vector_store.match_course_title.assert_called_once_with("MCP")
+        assert sources == [{"text": "MCP: Build Rich-Context AI Apps"}]
+        mock_ai_generator.generate_response.assert_not_called()
+
+        # Other questions still go to Claude
+        assert rag_system.query("What does the MCP course cover?")[0] == "Generated"
+
+    def test_direct_lookup_defers_unmatched_outline(self, rag_classes, mock_config):
+        """Test that an outline for an unknown course title goes to Claude"""
+        mock_vector_store = rag_classes["VectorStore"].return_value
+        mock_vector_store.match_course_title.return_value = None
+
+        mock_ai_generator = rag_classes["AIGenerator"].return_value
+        mock_ai_generator.generate_response.return_value = "No such course"
+
+        rag_system = RAGSystem(replace(mock_config, DIRECT_LOOKUP=True))
+
+        response, _ = rag_system.query("Show me the course outline for Cooking")
+
+        assert response == "No such course"
+        mock_vector_store.match_course_title.assert_called_once_with("Cooking")
+        # The nearest-embedding fallback is never consulted directly
+        mock_vector_store._resolve_course_name.assert_not_called()
+
+    def test_get_course_analytics(self, rag_system):
         """Test getting course analytics"""
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
+        mock_vector_store = rag_system.vector_store
         mock_vector_store.get_course_count.return_value = 5
         mock_vector_store.get_existing_course_titles.return_value = [
             "Course 1",
@@ -276,32 +418,15 @@ class TestRAGSystem:
             "Course 5",
         ]
 
-        rag_system = RAGSystem(mock_config)
-
         analytics = rag_system.get_course_analytics()
 
         assert analytics["total_courses"] == 5
         assert len(analytics["course_titles"]) == 5
         assert "Course 1" in analytics["course_titles"]
 
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.DocumentProcessor")
-    def test_query_types_differentiation(
-        self,
-        mock_doc_processor_class,
-        mock_vector_store_class,
-        mock_ai_generator_class,
-        mock_config,
-    ):
+    def test_query_types_differentiation(self, rag_system):
         """Test that different query types are handled appropriately"""
-        mock_ai_generator = Mock()
-        mock_ai_generator_class.return_value = mock_ai_generator
-
-        mock_vector_store = Mock()
-        mock_vector_store_class.return_value = mock_vector_store
-
-        rag_system = RAGSystem(mock_config)
+        mock_ai_generator = rag_system.ai_generator
 
         # Test outline query
         mock_ai_generator.generate_response.return_value = "Course outline response"
@@ -330,47 +455,28 @@ class TestRAGSystem:
 class TestRAGSystemIntegration:
     """Integration tests with real components (but mocked API)"""
 
-    @patch("ai_generator.anthropic.Anthropic")
     def test_full_query_flow_with_mock_api(
-        self, mock_anthropic_class, mock_config, temp_chroma_db
+        self, mock_anthropic, mock_config, temp_chroma_db, fake_embeddings
     ):
         """Test full query flow with mocked Anthropic API"""
-        # Setup mock Anthropic client
-        mock_client = Mock()
-        mock_anthropic_class.return_value = mock_client
-
-        # Mock response that uses tool
-        mock_tool_response = Mock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool_content = Mock()
-        mock_tool_content.type = "tool_use"
-        mock_tool_content.name = "search_course_content"
-        mock_tool_content.input = {"query": "Python basics"}
-        mock_tool_content.id = "tool_123"
-        mock_tool_response.content = [mock_tool_content]
-
-        # Mock final response
-        mock_final_response = Mock()
-        mock_final_response.stop_reason = "end"
-        mock_final_response.content = [
-            Mock(text="Python is a high-level programming language.")
-        ]
-
-        mock_client.messages.create.side_effect = [
-            mock_tool_response,
-            mock_final_response,
-        ]
+        # Tool use round, then the final answer
+        mock_anthropic.queue(
+            tool_uses=[
+                ("tool_123", "search_course_content", {"query": "Python basics"})
+            ]
+        )
+        mock_anthropic.queue("Python is a high-level programming language.")
 
-        # Setup config with temp database
-        mock_config.CHROMA_PATH = temp_chroma_db
+        # Setup config with temp database (mock_config is shared across tests)
+        config = replace(mock_config, CHROMA_PATH=temp_chroma_db)
 
         # Create RAG system
-        rag_system = RAGSystem(mock_config)
+        rag_system = RAGSystem(config)
 
         # Add some test data
         from document_processor import DocumentProcessor
 
-        processor = DocumentProcessor(mock_config.CHUNK_SIZE, mock_config.CHUNK_OVERLAP)
+        processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
 
         # Create a simple course
         course = Course(title="Python Basics Course", instructor="Test Instructor")
@@ -395,13 +501,85 @@ class TestRAGSystemIntegration:
         assert "Python is a high-level programming language" in response
 
         # Verify the flow
-        assert mock_client.messages.create.call_count == 2
+        assert len(mock_anthropic.requests) == 2
 
         # Check that tool was called
-        first_call = mock_client.messages.create.call_args_list[0][1]
+        first_call = mock_anthropic.requests[0]
         assert "tools" in first_call
         assert first_call["tool_choice"] == {"type": "auto"}
 
+    @staticmethod
+    def _folder_of_courses(rag_system, folder, *courses_with_chunks):
+        """One file per course, parsed into the given course and chunks"""
+        parsed = {}
+        for index, entry in enumerate(courses_with_chunks):
+            path = folder / f"course{index}.txt"
+            path.write_text("")
+            parsed[str(path)] = entry
+        rag_system.document_processor = Mock()
+        rag_system.document_processor.process_course_document.side_effect = (
+            parsed.__getitem__
+        )
+        return str(folder)
+
+    @staticmethod
+    def _course(title, chunk_indexes):
+        course = Course(title=title, course_link="https://example.com", instructor="X")
+        chunks = [
+            CourseChunk(course_title=title, content=f"{title} {i}", chunk_index=i)
+            for i in chunk_indexes
+        ]
+        return course, chunks
+
+    def test_add_course_folder_writes_courses_in_one_batch(
+        self, mock_config, temp_chroma_db, fake_embeddings, tmp_path
+    ):
+        """Test that a folder's courses share one catalog and one content write"""
+        rag_system = RAGSystem(replace(mock_config, CHROMA_PATH=temp_chroma_db))
+        store = rag_system.vector_store
+        folder = self._folder_of_courses(
+            rag_system,
+            tmp_path,
+            *(self._course(f"Course {n}", [0, 1]) for n in range(3)),
+        )
+
+        with (
+            patch.object(
+                store.course_catalog, "add", wraps=store.course_catalog.add
+            ) as catalog_add,
+            patch.object(
+                store.course_content, "add", wraps=store.course_content.add
+            ) as content_add,
+        ):
+            assert rag_system.add_course_folder(folder) == (3, 6)
+
+        catalog_add.assert_called_once()
+        content_add.assert_called_once()
+        assert len(content_add.call_args.kwargs["documents"]) == 6
+
+    def test_add_course_folder_isolates_a_bad_course(
+        self, mock_config, temp_chroma_db, fake_embeddings, tmp_path
+    ):
+        """Test that a course whose chunks fail to store does not drop the others"""
+        rag_system = RAGSystem(replace(mock_config, CHROMA_PATH=temp_chroma_db))
+        # Two chunks with one index collide on their ID, failing the write
+        folder = self._folder_of_courses(
+            rag_system,
+            tmp_path,
+            self._course("Good One", [0, 1]),
+            self._course("Bad", [0, 0]),
+            self._course("Good Two", [0]),
+        )
+
+        assert rag_system.add_course_folder(folder) == (2, 3)
+
+        # The bad course's catalog entry is rolled back, so a later load retries
+        assert sorted(rag_system.vector_store.get_existing_course_titles()) == [
+            "Good One",
+            "Good Two",
+        ]
+        assert rag_system.vector_store.get_course_metadata("Bad") is None
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
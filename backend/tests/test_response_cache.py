@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+import pytest
+
+from response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test the TTL/LRU answer cache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted when full"""
+        cache = ResponseCache(maxsize=2, ttl=60)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+
+        assert cache.get("a") == "A"
+        assert cache.get("b") is None
+        assert cache.get("c") == "C"
+
+    def test_entries_expire_after_ttl(self):
+        """Test that stale entries are treated as misses and dropped"""
+        cache = ResponseCache(maxsize=10, ttl=5)
+
+        with patch("response_cache.time.monotonic", return_value=100.0):
+            cache.set("q", "answer")
+        with patch("response_cache.time.monotonic", return_value=104.0):
+            assert cache.get("q") == "answer"
+        with patch("response_cache.time.monotonic", return_value=106.0):
+            assert cache.get("q") is None
+
+        assert len(cache) == 0
+
+    def test_stats_count_hits_and_misses(self):
+        """Test that lookups are counted and reported with the cache size"""
+        cache = ResponseCache(maxsize=10, ttl=60)
+        cache.set("q", "answer")
+        cache.get("q")
+        cache.get("other")
+        cache.clear()
+
+        stats = cache.stats()
+        assert (stats["size"], stats["hits"], stats["misses"]) == (0, 1, 1)
+        assert stats["hit_rate"] == 0.5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
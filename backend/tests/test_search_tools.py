@@ -1,23 +1,30 @@
-import json
-import sys
-from pathlib import Path
-from unittest.mock import MagicMock, Mock, patch
+import contextvars
+from unittest.mock import Mock
 
 import pytest
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from search_tools import (
+    CourseOutlineTool,
+    CourseSearchTool,
+    ToolManager,
+    _request_sources,
+)
+from vector_store import SearchResults
 
-from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
-from vector_store import SearchResults, VectorStore
+
+def _links(links_by_context):
+    """get_links_bulk stand-in answering from a {(course, lesson): links} dict"""
+    return lambda contexts: [
+        links_by_context.get(context, (None, None)) for context in contexts
+    ]
 
 
 class TestCourseSearchTool:
     """Test the CourseSearchTool functionality"""
 
-    def test_tool_definition(self):
+    def test_tool_definition(self, mock_vector_store):
         """Test that tool definition is properly formatted"""
-        mock_store = Mock(spec=VectorStore)
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
 
         definition = tool.get_tool_definition()
 
@@ -30,19 +37,20 @@ class TestCourseSearchTool:
         assert "lesson_number" in definition["input_schema"]["properties"]
         assert definition["input_schema"]["required"] == ["query"]
 
-    def test_execute_with_results(self, sample_search_results):
+    def test_execute_with_results(self, mock_vector_store, sample_search_results):
         """Test execute method with successful search results"""
-        mock_store = Mock(spec=VectorStore)
-        mock_store.search.return_value = sample_search_results
-        mock_store.get_lesson_link.return_value = "https://example.com/lesson1"
-        mock_store.get_course_link.return_value = "https://example.com/course"
+        mock_vector_store.search.return_value = sample_search_results
+        mock_vector_store.get_links_bulk.side_effect = lambda contexts: [
+            ("https://example.com/lesson1", "https://example.com/course")
+            for _ in contexts
+        ]
 
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
 
         result = tool.execute(query="Python programming")
 
         # Verify search was called
-        mock_store.search.assert_called_once_with(
+        mock_vector_store.search.assert_called_once_with(
             query="Python programming", course_name=None, lesson_number=None
         )
 
@@ -51,83 +59,75 @@ class TestCourseSearchTool:
         assert "Python" in result
         assert len(tool.last_sources) > 0
 
-    def test_execute_with_course_filter(self):
+    def test_execute_with_course_filter(self, mock_vector_store):
         """Test execute with course name filter"""
-        mock_store = Mock(spec=VectorStore)
         mock_results = SearchResults(
             documents=["Content about Python"],
             metadata=[{"course_title": "Python Course", "lesson_number": 1}],
             distances=[0.1],
         )
-        mock_store.search.return_value = mock_results
-        mock_store.get_lesson_link.return_value = None
-        mock_store.get_course_link.return_value = None
+        mock_vector_store.search.return_value = mock_results
 
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
 
         result = tool.execute(query="variables", course_name="Python")
 
-        mock_store.search.assert_called_once_with(
+        mock_vector_store.search.assert_called_once_with(
             query="variables", course_name="Python", lesson_number=None
         )
 
         assert "Python Course" in result
 
-    def test_execute_with_lesson_filter(self):
+    def test_execute_with_lesson_filter(self, mock_vector_store):
         """Test execute with lesson number filter"""
-        mock_store = Mock(spec=VectorStore)
         mock_results = SearchResults(
             documents=["Lesson 2 content"],
             metadata=[{"course_title": "Test Course", "lesson_number": 2}],
             distances=[0.1],
         )
-        mock_store.search.return_value = mock_results
-        mock_store.get_lesson_link.return_value = None
+        mock_vector_store.search.return_value = mock_results
 
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
 
         result = tool.execute(query="control flow", lesson_number=2)
 
-        mock_store.search.assert_called_once_with(
+        mock_vector_store.search.assert_called_once_with(
             query="control flow", course_name=None, lesson_number=2
         )
 
         assert "Lesson 2" in result
 
-    def test_execute_with_error(self):
+    def test_execute_with_error(self, mock_vector_store):
         """Test execute handles search errors"""
-        mock_store = Mock(spec=VectorStore)
         error_result = SearchResults(
             documents=[],
             metadata=[],
             distances=[],
             error="No course found matching 'NonExistent'",
         )
-        mock_store.search.return_value = error_result
+        mock_vector_store.search.return_value = error_result
 
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
 
         result = tool.execute(query="test", course_name="NonExistent")
 
         assert "No course found" in result
         assert len(tool.last_sources) == 0
 
-    def test_execute_empty_results(self):
+    def test_execute_empty_results(self, mock_vector_store):
         """Test execute with empty search results"""
-        mock_store = Mock(spec=VectorStore)
         empty_results = SearchResults(documents=[], metadata=[], distances=[])
-        mock_store.search.return_value = empty_results
+        mock_vector_store.search.return_value = empty_results
 
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
 
         result = tool.execute(query="xyz123")
 
         assert "No relevant content found" in result
         assert len(tool.last_sources) == 0
 
-    def test_source_tracking_with_links(self):
+    def test_source_tracking_with_links(self, mock_vector_store):
         """Test that sources are properly tracked with links"""
-        mock_store = Mock(spec=VectorStore)
         mock_results = SearchResults(
             documents=["Content 1", "Content 2"],
             metadata=[
@@ -136,11 +136,15 @@ class TestCourseSearchTool:
             ],
             distances=[0.1, 0.2],
         )
-        mock_store.search.return_value = mock_results
-        mock_store.get_lesson_link.side_effect = ["https://lesson1.com", None]
-        mock_store.get_course_link.return_value = "https://courseb.com"
+        mock_vector_store.search.return_value = mock_results
+        mock_vector_store.get_links_bulk.side_effect = _links(
+            {
+                ("Course A", 1): ("https://lesson1.com", "https://coursea.com"),
+                ("Course B", None): (None, "https://courseb.com"),
+            }
+        )
 
-        tool = CourseSearchTool(mock_store)
+        tool = CourseSearchTool(mock_vector_store)
         result = tool.execute(query="test")
 
         assert len(tool.last_sources) == 2
@@ -149,14 +153,48 @@ class TestCourseSearchTool:
         assert tool.last_sources[1]["text"] == "Course B"
         assert tool.last_sources[1]["link"] == "https://courseb.com"
 
+    def test_links_fetched_in_one_call(self, mock_vector_store):
+        """Test that links for all distinct course/lessons come from one call"""
+        mock_vector_store.search.return_value = SearchResults(
+            documents=["Chunk 1", "Chunk 2", "Chunk 3"],
+            metadata=[
+                {"course_title": "Course A", "lesson_number": 1},
+                {"course_title": "Course A", "lesson_number": 1},
+                {"course_title": "Course A", "lesson_number": 2},
+            ],
+            distances=[0.1, 0.2, 0.3],
+        )
+        mock_vector_store.get_links_bulk.side_effect = _links(
+            {
+                ("Course A", 1): ("https://lesson1.com", None),
+                ("Course A", 2): ("https://lesson2.com", None),
+            }
+        )
+
+        tool = CourseSearchTool(mock_vector_store)
+        result = tool.execute(query="test")
+
+        assert result == (
+            "[Course A - Lesson 1]\nChunk 1\n\n"
+            "[Course A - Lesson 1]\nChunk 2\n\n"
+            "[Course A - Lesson 2]\nChunk 3"
+        )
+        mock_vector_store.get_links_bulk.assert_called_once_with(
+            [("Course A", 1), ("Course A", 2)]
+        )
+        assert [source["link"] for source in tool.last_sources] == [
+            "https://lesson1.com",
+            "https://lesson1.com",
+            "https://lesson2.com",
+        ]
+
 
 class TestCourseOutlineTool:
     """Test the CourseOutlineTool functionality"""
 
-    def test_tool_definition(self):
+    def test_tool_definition(self, mock_vector_store):
         """Test that tool definition is properly formatted"""
-        mock_store = Mock(spec=VectorStore)
-        tool = CourseOutlineTool(mock_store)
+        tool = CourseOutlineTool(mock_vector_store)
 
         definition = tool.get_tool_definition()
 
@@ -165,37 +203,29 @@ class TestCourseOutlineTool:
         assert "input_schema" in definition
         assert definition["input_schema"]["required"] == ["course_title"]
 
-    def test_execute_with_course(self):
+    def test_execute_with_course(self, mock_vector_store):
         """Test execute method returns course outline"""
-        mock_store = Mock(spec=VectorStore)
-        mock_store._resolve_course_name.return_value = "Test Course"
-
-        # Mock course catalog response
-        mock_catalog = Mock()
-        mock_store.course_catalog = mock_catalog
-
-        lessons_data = [
-            {
-                "lesson_number": 0,
-                "lesson_title": "Intro",
-                "lesson_link": "https://intro.com",
-            },
-            {"lesson_number": 1, "lesson_title": "Basics", "lesson_link": None},
-        ]
-        mock_catalog.get.return_value = {
-            "metadatas": [
+        mock_vector_store._resolve_course_name.return_value = "Test Course"
+
+        # Mock catalog metadata, lessons already parsed by the store
+        mock_vector_store.get_course_metadata.return_value = {
+            "title": "Test Course",
+            "instructor": "John Doe",
+            "course_link": "https://course.com",
+            "lessons": [
                 {
-                    "title": "Test Course",
-                    "instructor": "John Doe",
-                    "course_link": "https://course.com",
-                    "lessons_json": json.dumps(lessons_data),
-                }
-            ]
+                    "lesson_number": 0,
+                    "lesson_title": "Intro",
+                    "lesson_link": "https://intro.com",
+                },
+                {"lesson_number": 1, "lesson_title": "Basics", "lesson_link": None},
+            ],
         }
 
-        tool = CourseOutlineTool(mock_store)
+        tool = CourseOutlineTool(mock_vector_store)
         result = tool.execute(course_title="Test")
 
+        mock_vector_store.get_course_metadata.assert_called_once_with("Test Course")
         assert "Test Course" in result
         assert "John Doe" in result
         assert "https://course.com" in result
@@ -204,26 +234,22 @@ class TestCourseOutlineTool:
         assert len(tool.last_sources) == 1
         assert tool.last_sources[0]["link"] == "https://course.com"
 
-    def test_execute_course_not_found(self):
+    def test_execute_course_not_found(self, mock_vector_store):
         """Test execute when course is not found"""
-        mock_store = Mock(spec=VectorStore)
-        mock_store._resolve_course_name.return_value = None
+        mock_vector_store._resolve_course_name.return_value = None
 
-        tool = CourseOutlineTool(mock_store)
+        tool = CourseOutlineTool(mock_vector_store)
         result = tool.execute(course_title="NonExistent")
 
         assert "No course found" in result
         assert len(tool.last_sources) == 0
 
-    def test_execute_with_exception(self):
+    def test_execute_with_exception(self, mock_vector_store):
         """Test execute handles exceptions gracefully"""
-        mock_store = Mock(spec=VectorStore)
-        mock_store._resolve_course_name.return_value = "Test Course"
-        mock_catalog = Mock()
-        mock_store.course_catalog = mock_catalog
-        mock_catalog.get.side_effect = Exception("Database error")
+        mock_vector_store._resolve_course_name.return_value = "Test Course"
+        mock_vector_store.get_course_metadata.side_effect = Exception("Database error")
 
-        tool = CourseOutlineTool(mock_store)
+        tool = CourseOutlineTool(mock_vector_store)
         result = tool.execute(course_title="Test")
 
         assert "Error retrieving course outline" in result
@@ -262,6 +288,13 @@ class TestToolManager:
         assert {"name": "tool1"} in definitions
         assert {"name": "tool2"} in definitions
 
+        # Definitions are built once and rebuilt only after a new registration
+        assert manager.get_tool_definitions() is definitions
+        mock_tool3 = Mock()
+        mock_tool3.get_tool_definition.return_value = {"name": "tool3"}
+        manager.register_tool(mock_tool3)
+        assert len(manager.get_tool_definitions()) == 3
+
     def test_execute_tool(self):
         """Test executing a registered tool"""
         manager = ToolManager()
@@ -271,16 +304,32 @@ class TestToolManager:
 
         manager.register_tool(mock_tool)
 
-        result = manager.execute_tool("test_tool", query="test")
+        result = manager.execute_tool("test_tool", {"query": "test"})
 
         assert result == "Tool result"
         mock_tool.execute.assert_called_once_with(query="test")
 
+    def test_execute_tool_routes_among_many_tools(self):
+        """Test that dispatch picks the right tool out of a large registry"""
+        manager = ToolManager()
+        tools = []
+        for i in range(50):
+            tool = Mock()
+            tool.get_tool_definition.return_value = {"name": f"tool{i}"}
+            tool.execute.return_value = f"result {i}"
+            manager.register_tool(tool)
+            tools.append(tool)
+
+        assert manager.execute_tool("tool49", {"query": "q"}) == "result 49"
+        assert manager.execute_tool("tool0", {"query": "q"}) == "result 0"
+        tools[49].execute.assert_called_once_with(query="q")
+        assert not any(t.execute.called for t in tools[1:49])
+
     def test_execute_nonexistent_tool(self):
         """Test executing a non-existent tool"""
         manager = ToolManager()
 
-        result = manager.execute_tool("nonexistent", query="test")
+        result = manager.execute_tool("nonexistent", {"query": "test"})
 
         assert "not found" in result
 
@@ -299,6 +348,28 @@ class TestToolManager:
         assert len(sources) == 1
         assert sources[0]["text"] == "Source 1"
 
+    def test_request_scope_isolates_sources(self, mock_vector_store):
+        """Test that sources recorded in a request scope stay in that context"""
+        manager = ToolManager()
+        mock_vector_store.search.return_value = SearchResults(
+            documents=["Content"],
+            metadata=[{"course_title": "Course A", "lesson_number": None}],
+            distances=[0.1],
+        )
+        tool = CourseSearchTool(mock_vector_store)
+        manager.register_tool(tool)
+
+        def run_scoped_query():
+            manager.start_request_scope()
+            tool.execute(query="test")
+            return manager.get_last_sources()
+
+        scoped_sources = contextvars.copy_context().run(run_scoped_query)
+
+        assert scoped_sources == [{"text": "Course A"}]
+        # A different request (no scope) never sees the scoped bucket
+        assert contextvars.copy_context().run(_request_sources.get) is None
+
     def test_reset_sources(self):
         """Test resetting sources in all tools"""
         manager = ToolManager()
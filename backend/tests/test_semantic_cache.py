@@ -0,0 +1,53 @@
+import pytest
+
+from semantic_cache import SemanticCache
+
+VECTORS = {
+    "What is MCP?": [1.0, 0.0, 0.0],
+    "what is mcp": [0.99, 0.05, 0.0],
+    "How do I use Chroma?": [0.0, 1.0, 0.0],
+}
+
+
+def fake_embed(texts):
+    return [VECTORS[text] for text in texts]
+
+
+class TestSemanticCache:
+    """Test similarity-based answer reuse"""
+
+    def test_near_duplicate_hits(self):
+        """Test that a close paraphrase returns the stored answer"""
+        cache = SemanticCache(fake_embed, capacity=8, threshold=0.95)
+        cache.store(cache.embed_query("What is MCP?"), "tools", ("MCP is...", []))
+
+        assert cache.lookup(cache.embed_query("what is mcp"), "tools") == (
+            "MCP is...",
+            [],
+        )
+        assert cache.lookup(cache.embed_query("How do I use Chroma?"), "tools") is None
+
+    def test_signature_mismatch_misses(self):
+        """Test that answers produced with a different tool set are not reused"""
+        cache = SemanticCache(fake_embed, capacity=8, threshold=0.95)
+        cache.store(cache.embed_query("What is MCP?"), "tools", "MCP is...")
+
+        assert cache.lookup(cache.embed_query("What is MCP?"), "other") is None
+
+    def test_ring_buffer_and_clear(self):
+        """Test that the oldest entry is overwritten when full and clear empties it"""
+        cache = SemanticCache(fake_embed, capacity=1, threshold=0.95)
+        cache.store(cache.embed_query("What is MCP?"), "tools", "first")
+        cache.store(cache.embed_query("How do I use Chroma?"), "tools", "second")
+
+        assert cache.lookup(cache.embed_query("What is MCP?"), "tools") is None
+        assert cache.lookup(cache.embed_query("How do I use Chroma?"), "tools") == (
+            "second"
+        )
+
+        cache.clear()
+        assert cache.lookup(cache.embed_query("How do I use Chroma?"), "tools") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,57 @@
+import pytest
+
+from session_manager import CHARS_PER_TOKEN, SessionManager
+
+
+class TestSessionManager:
+    """Test conversation history handling"""
+
+    def test_history_without_budget_keeps_everything(self):
+        """Test that history is untrimmed when no budget is configured"""
+        manager = SessionManager(max_history=2)
+        session_id = manager.create_session()
+        manager.add_exchange(session_id, "a" * 5000, "b" * 5000)
+
+        history = manager.get_conversation_history(session_id)
+
+        assert history == f"User: {'a' * 5000}\nAssistant: {'b' * 5000}"
+
+    def test_history_trimmed_to_token_budget(self):
+        """Test that the oldest messages are dropped once over budget"""
+        manager = SessionManager(max_history=5, history_token_budget=50)
+        session_id = manager.create_session()
+        manager.add_exchange(session_id, "old question " * 20, "old answer " * 20)
+        manager.add_exchange(session_id, "What is RAG?", "Retrieval augmented.")
+
+        history = manager.get_conversation_history(session_id)
+
+        assert history == "User: What is RAG?\nAssistant: Retrieval augmented."
+        assert len(history) <= 50 * CHARS_PER_TOKEN
+
+    def test_latest_message_kept_even_if_over_budget(self):
+        """Test that the newest message survives a budget it alone exceeds"""
+        manager = SessionManager(max_history=2, history_token_budget=1)
+        session_id = manager.create_session()
+        manager.add_exchange(session_id, "question", "a long answer")
+
+        assert (
+            manager.get_conversation_history(session_id) == "Assistant: a long answer"
+        )
+
+    def test_dropping_a_session_notifies_listener(self):
+        """Test that clearing or deleting a session reports its ID once"""
+        dropped = []
+        manager = SessionManager(on_session_dropped=dropped.append)
+        session_id = manager.create_session()
+        manager.add_exchange(session_id, "question", "answer")
+
+        manager.clear_session(session_id)
+        manager.delete_session(session_id)
+        manager.delete_session(session_id)
+
+        assert dropped == [session_id, session_id]
+        assert session_id not in manager.sessions
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
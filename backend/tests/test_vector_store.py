@@ -1,19 +1,22 @@
-import sys
-from pathlib import Path
+from unittest.mock import Mock, patch
 
 import pytest
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from models import Course, CourseChunk, Lesson
-from vector_store import SearchResults, VectorStore
+from models import Course, CourseChunk
+from response_cache import ResponseCache
+from vector_store import (
+    COSINE_HNSW,
+    SearchQuery,
+    VectorStore,
+    _shared_embedding_function,
+)
 
 
 class TestVectorStore:
     """Test the VectorStore class functionality"""
 
-    def test_initialization(self, temp_chroma_db, mock_config):
-        """Test VectorStore initialization"""
+    def test_initialization(self, temp_chroma_db, mock_config, fake_embeddings):
+        """Test VectorStore initialization on a fresh directory"""
         store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
 
         assert store is not None
@@ -21,74 +24,128 @@ class TestVectorStore:
         assert store.course_content is not None
         assert store.max_results == 5
 
-    def test_add_course_metadata(self, temp_chroma_db, mock_config, sample_course):
+    def test_add_course_metadata(self, vector_store, sample_course):
         """Test adding course metadata to the catalog"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
         # Add course metadata
-        store.add_course_metadata(sample_course)
+        vector_store.add_course_metadata(sample_course)
 
         # Check if course was added
-        titles = store.get_existing_course_titles()
+        titles = vector_store.get_existing_course_titles()
         assert sample_course.title in titles
 
         # Check course count
-        count = store.get_course_count()
+        count = vector_store.get_course_count()
         assert count == 1
 
-    def test_add_course_content(self, temp_chroma_db, mock_config, sample_chunks):
-        """Test adding course content chunks"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
+    def test_add_course_metadata_batch(self, vector_store, sample_course):
+        """Test adding several courses to the catalog in one call"""
+        other = Course(
+            title="Data Science Basics",
+            course_link="https://example.com/ds",
+            instructor="Jane Smith",
+        )
+
+        vector_store.add_course_metadata(sample_course, other)
 
+        assert set(vector_store.get_existing_course_titles()) == {
+            sample_course.title,
+            other.title,
+        }
+        assert vector_store.get_course_link(other.title) == "https://example.com/ds"
+
+    def test_add_course_content(self, vector_store, sample_chunks):
+        """Test adding course content chunks"""
         # Add chunks
-        store.add_course_content(sample_chunks)
+        vector_store.add_course_content(sample_chunks)
 
         # Search for content
-        results = store.search("Python programming", limit=5)
+        results = vector_store.search("Python programming", limit=5)
 
         assert results is not None
         assert not results.is_empty()
         assert len(results.documents) > 0
 
-    def test_course_name_resolution(self, temp_chroma_db, mock_config, sample_course):
+    def test_course_name_resolution(self, vector_store, sample_course):
         """Test fuzzy course name matching"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
         # Add course
-        store.add_course_metadata(sample_course)
+        vector_store.add_course_metadata(sample_course)
 
         # Test exact match
-        resolved = store._resolve_course_name("Test Course on Python Programming")
+        resolved = vector_store._resolve_course_name(
+            "Test Course on Python Programming"
+        )
         assert resolved == sample_course.title
 
         # Test partial match
-        resolved = store._resolve_course_name("Python")
+        resolved = vector_store._resolve_course_name("Python")
         assert resolved == sample_course.title
 
         # Test fuzzy match
-        resolved = store._resolve_course_name("python course")
+        resolved = vector_store._resolve_course_name("python course")
         assert resolved == sample_course.title
 
         # Test no match - Note: vector search may still find some similarity
         # For a truly non-matching course, we need something very different
-        resolved = store._resolve_course_name(
+        resolved = vector_store._resolve_course_name(
             "完全不同的课程"
         )  # Completely different course in Chinese
         # Due to semantic similarity, even different topics might match, so we'll just check it returns something
         # The important part is that partial matches work correctly above
 
-    def test_search_with_filters(
-        self, temp_chroma_db, mock_config, sample_course, sample_chunks
-    ):
+    def test_course_name_resolution_in_memory(self, vector_store, sample_course):
+        """Test that names resolve in memory, embedding only the name"""
+        other = Course(
+            title="Python Data Analysis",
+            course_link="https://example.com/data",
+            instructor="Jane Roe",
+        )
+        vector_store.add_course_metadata(sample_course, other)
+        # "Python" is in both titles, so it needs a similarity search
+        closest = vector_store.course_catalog.query(
+            query_texts=["Python"], n_results=1
+        )["ids"][0][0]
+
+        embed = Mock(wraps=vector_store.embedding_function)
+        with (
+            patch.object(
+                vector_store.course_catalog,
+                "query",
+                side_effect=AssertionError("catalog queried"),
+            ),
+            patch.object(vector_store, "embedding_function", embed),
+        ):
+            assert vector_store._resolve_course_name("python data analysis") == (
+                other.title
+            )
+            assert vector_store._resolve_course_name("Programming") == (
+                sample_course.title
+            )
+            embed.assert_not_called()
+
+            assert vector_store._resolve_course_name("Python") == closest
+            # Only the name is embedded; title vectors come from ingest
+            embed.assert_called_once_with(["Python"])
+
+    def test_match_course_title(self, vector_store, sample_course):
+        """Test that only unambiguous names match without a vector search"""
+        other = Course(title="Python Data Analysis", instructor="Jane Roe")
+        vector_store.add_course_metadata(sample_course, other)
+
+        assert vector_store.match_course_title("python data analysis") == (other.title)
+        assert vector_store.match_course_title("Programming") == sample_course.title
+        # Part of both titles, or of neither: left to the embedding fallback
+        assert vector_store.match_course_title("Python") is None
+        assert vector_store.match_course_title("Cooking") is None
+        assert vector_store.match_course_title("  ") is None
+
+    def test_search_with_filters(self, vector_store, sample_course, sample_chunks):
         """Test search with course and lesson filters"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
         # Add course and content
-        store.add_course_metadata(sample_course)
-        store.add_course_content(sample_chunks)
+        vector_store.add_course_metadata(sample_course)
+        vector_store.add_course_content(sample_chunks)
 
         # Search with course filter
-        results = store.search(query="variables", course_name="Python")
+        results = vector_store.search(query="variables", course_name="Python")
 
         assert not results.is_empty()
         if not results.is_empty():
@@ -97,7 +154,7 @@ class TestVectorStore:
                 assert meta.get("course_title") == sample_course.title
 
         # Search with lesson filter
-        results = store.search(query="programming", lesson_number=0)
+        results = vector_store.search(query="programming", lesson_number=0)
 
         assert not results.is_empty()
         if not results.is_empty():
@@ -106,7 +163,9 @@ class TestVectorStore:
                 assert meta.get("lesson_number") == 0
 
         # Search with both filters
-        results = store.search(query="variables", course_name="Python", lesson_number=1)
+        results = vector_store.search(
+            query="variables", course_name="Python", lesson_number=1
+        )
 
         assert not results.is_empty()
         if not results.is_empty():
@@ -114,79 +173,268 @@ class TestVectorStore:
                 assert meta.get("course_title") == sample_course.title
                 assert meta.get("lesson_number") == 1
 
-    def test_search_nonexistent_course(self, temp_chroma_db, mock_config):
+    def test_search_nonexistent_course(self, vector_store):
         """Test search for non-existent course"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
-        results = store.search(query="test", course_name="Non-existent Course")
+        results = vector_store.search(query="test", course_name="Non-existent Course")
 
         assert results.error is not None
         assert "No course found" in results.error
 
-    def test_get_lesson_link(self, temp_chroma_db, mock_config, sample_course):
+    def test_get_lesson_link(self, vector_store, sample_course):
         """Test retrieving lesson links"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
         # Add course
-        store.add_course_metadata(sample_course)
+        vector_store.add_course_metadata(sample_course)
 
         # Get existing lesson link
-        link = store.get_lesson_link(sample_course.title, 0)
+        link = vector_store.get_lesson_link(sample_course.title, 0)
         assert link == "https://example.com/lesson0"
 
         # Get lesson without link
-        link = store.get_lesson_link(sample_course.title, 2)
+        link = vector_store.get_lesson_link(sample_course.title, 2)
         assert link is None
 
         # Get non-existent lesson
-        link = store.get_lesson_link(sample_course.title, 99)
+        link = vector_store.get_lesson_link(sample_course.title, 99)
         assert link is None
 
-    def test_get_course_link(self, temp_chroma_db, mock_config, sample_course):
+    def test_get_course_link(self, vector_store, sample_course):
         """Test retrieving course link"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
         # Add course
-        store.add_course_metadata(sample_course)
+        vector_store.add_course_metadata(sample_course)
 
         # Get course link
-        link = store.get_course_link(sample_course.title)
+        link = vector_store.get_course_link(sample_course.title)
         assert link == "https://example.com/course"
 
         # Get non-existent course link
-        link = store.get_course_link("Non-existent Course")
+        link = vector_store.get_course_link("Non-existent Course")
         assert link is None
 
-    def test_empty_search_results(self, temp_chroma_db, mock_config):
+    def test_get_course_metadata(self, vector_store, sample_course):
+        """Test that catalog metadata comes back parsed and memoized"""
+        vector_store.add_course_metadata(sample_course)
+
+        metadata = vector_store.get_course_metadata(sample_course.title)
+
+        assert metadata["instructor"] == "John Doe"
+        assert [lesson["lesson_title"] for lesson in metadata["lessons"]] == [
+            lesson.title for lesson in sample_course.lessons
+        ]
+        assert vector_store.get_course_metadata(sample_course.title) is metadata
+        assert vector_store.get_course_metadata("Missing") is None
+
+    def test_course_without_link_or_lesson(self, vector_store):
+        """Test that unset course and chunk fields are stored as absent"""
+        course = Course(title="Untitled Links Course")
+        chunk = CourseChunk(
+            course_title=course.title, content="Course overview", chunk_index=0
+        )
+
+        vector_store.add_course_metadata(course)
+        vector_store.add_course_content([chunk])
+
+        assert vector_store.get_course_link(course.title) is None
+        assert "instructor" not in vector_store.get_course_metadata(course.title)
+        results = vector_store.search("overview", course_name=course.title)
+        assert results.documents == ["Course overview"]
+        assert "lesson_number" not in results.metadata[0]
+
+    def test_get_links_bulk(self, vector_store, sample_course):
+        """Test that links for many course/lessons come from one catalog read"""
+        vector_store.add_course_metadata(sample_course)
+        title = sample_course.title
+
+        with patch.object(
+            vector_store.course_catalog,
+            "get",
+            wraps=vector_store.course_catalog.get,
+        ) as catalog_get:
+            links = vector_store.get_links_bulk(
+                [(title, 0), (title, 2), (title, None), ("Missing", 1)]
+            )
+            # Later lookups are served from the parsed catalog entries
+            assert vector_store.get_lesson_link(title, 1) == (
+                "https://example.com/lesson1"
+            )
+
+        assert links == [
+            ("https://example.com/lesson0", "https://example.com/course"),
+            (None, "https://example.com/course"),
+            (None, "https://example.com/course"),
+            (None, None),
+        ]
+        catalog_get.assert_called_once()
+
+        # A catalog write drops the memoized entries, including misses
+        assert vector_store.get_course_link("Another Course") is None
+        vector_store.add_course_metadata(
+            Course(
+                title="Another Course",
+                course_link="https://example.com/another",
+                instructor="Jane Roe",
+            )
+        )
+        assert vector_store.get_course_link("Another Course") == (
+            "https://example.com/another"
+        )
+
+    def test_empty_search_results(self, vector_store):
         """Test search with no documents returns empty results"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
-        results = store.search("test query")
+        results = vector_store.search("test query")
 
         assert results.is_empty()
         assert len(results.documents) == 0
 
-    def test_clear_all_data(
-        self, temp_chroma_db, mock_config, sample_course, sample_chunks
-    ):
+    def test_clear_all_data(self, vector_store, sample_course, sample_chunks):
         """Test clearing all data from vector store"""
-        store = VectorStore(temp_chroma_db, mock_config.EMBEDDING_MODEL)
-
         # Add data
-        store.add_course_metadata(sample_course)
-        store.add_course_content(sample_chunks)
+        vector_store.add_course_metadata(sample_course)
+        vector_store.add_course_content(sample_chunks)
 
         # Verify data exists
-        assert store.get_course_count() == 1
+        assert vector_store.get_course_count() == 1
 
         # Clear data
-        store.clear_all_data()
+        vector_store.clear_all_data()
 
         # Verify data is cleared
-        assert store.get_course_count() == 0
-        results = store.search("test")
+        assert vector_store.get_course_count() == 0
+        results = vector_store.search("test")
         assert results.is_empty()
 
+    @pytest.mark.parametrize("exact_search_max", [0, 2000], ids=["index", "exact"])
+    @pytest.mark.parametrize("batch_size", [4, 32])
+    def test_search_many_matches_search(
+        self,
+        vector_store,
+        monkeypatch,
+        sample_course,
+        sample_chunks,
+        batch_size,
+        exact_search_max,
+    ):
+        """Test that batched searches return what one-at-a-time searches do"""
+        monkeypatch.setattr(vector_store, "exact_search_max", exact_search_max)
+        vector_store.add_course_metadata(sample_course)
+        vector_store.add_course_content(sample_chunks)
+
+        shapes = [
+            SearchQuery("variables"),
+            SearchQuery("functions", course_name="Python"),
+            SearchQuery("programming", lesson_number=0, limit=1),
+            SearchQuery("loops", course_name="Python", lesson_number=1),
+        ]
+        queries = [shapes[i % len(shapes)] for i in range(batch_size)]
+
+        results = vector_store.search_many(queries)
+
+        assert len(results) == batch_size
+        for query, found in zip(queries, results):
+            expected = vector_store.search(
+                query.query, query.course_name, query.lesson_number, query.limit
+            )
+            assert found.documents == expected.documents
+            assert found.metadata == expected.metadata
+            assert found.distances == pytest.approx(expected.distances, rel=1e-5)
+
+    def test_search_many_unknown_course(self, vector_store):
+        """Test that an unresolvable course name fails only its own search"""
+        results = vector_store.search_many(
+            [SearchQuery("variables", course_name="Missing"), SearchQuery("x")]
+        )
+
+        assert results[0].error == "No course found matching 'Missing'"
+        assert results[1].error is None
+        assert results[1].is_empty()
+
+    @pytest.mark.parametrize("int8", [False, True], ids=["float32", "int8"])
+    def test_exact_search_matches_index(
+        self, vector_store, monkeypatch, sample_course, sample_chunks, int8
+    ):
+        """Test that the in-memory exact scan returns what the index does"""
+        vector_store.add_course_metadata(sample_course)
+        vector_store.add_course_content(sample_chunks)
+        searches = [
+            dict(query="variables"),
+            dict(query="functions", course_name="Python", limit=2),
+            dict(query="programming", lesson_number=0),
+            dict(query="anything", lesson_number=99),
+        ]
+        expected = [vector_store.search(**search) for search in searches]
+
+        monkeypatch.setattr(vector_store, "exact_search_max", 2000)
+        monkeypatch.setattr(vector_store, "exact_search_int8", int8)
+        with patch.object(
+            vector_store.course_content,
+            "query",
+            side_effect=AssertionError("index queried"),
+        ):
+            for search, indexed in zip(searches, expected):
+                exact = vector_store.search(**search)
+                assert exact.documents == indexed.documents
+                assert exact.metadata == indexed.metadata
+                assert exact.distances == pytest.approx(indexed.distances, rel=1e-3)
+
+    def test_exact_search_falls_back_when_large(
+        self, vector_store, monkeypatch, sample_course, sample_chunks
+    ):
+        """Test that collections above the limit are searched through the index"""
+        vector_store.add_course_metadata(sample_course)
+        vector_store.add_course_content(sample_chunks)
+        monkeypatch.setattr(vector_store, "exact_search_max", 1)
+
+        assert not vector_store.search("variables").is_empty()
+        assert vector_store._exact_matrix is None
+
+    def test_search_cache(
+        self, vector_store, monkeypatch, sample_course, sample_chunks
+    ):
+        """Test that repeated searches are cached until the data changes"""
+        monkeypatch.setattr(vector_store, "search_cache", ResponseCache())
+        vector_store.add_course_metadata(sample_course)
+        vector_store.add_course_content(sample_chunks)
+
+        first = vector_store.search(query="variables", course_name="Python")
+        assert vector_store.search(query="variables", course_name="Python") is first
+        assert vector_store.search(query="variables") is not first
+        assert vector_store.get_cache_stats()["hits"] == 1
+
+        vector_store.add_course_content(sample_chunks[:1])
+        assert vector_store.get_cache_stats()["size"] == 0
+
+        # Errors are not cached
+        vector_store.clear_all_data()
+        assert vector_store.search(query="variables", course_name="Python").error
+        assert vector_store.get_cache_stats()["size"] == 0
+
+    def test_cosine_hnsw_collections(
+        self, temp_chroma_db, mock_config, fake_embeddings, sample_course, sample_chunks
+    ):
+        """Test that a store built with HNSW settings indexes and searches with them"""
+        store = VectorStore(
+            temp_chroma_db, mock_config.EMBEDDING_MODEL, hnsw=COSINE_HNSW
+        )
+
+        for collection in (store.course_catalog, store.course_content):
+            assert collection.configuration["hnsw"]["space"] == "cosine"
+            assert collection.configuration["hnsw"]["ef_search"] == 40
+
+        store.add_course_metadata(sample_course)
+        store.add_course_content(sample_chunks)
+        results = store.search(query="variables", course_name="Python")
+
+        assert not results.is_empty()
+        assert all(0.0 <= distance <= 2.0 for distance in results.distances)
+
+    def test_embedding_function_shared_per_model(self):
+        """Test that each model's embedding function is built only once"""
+        function_cls = Mock(side_effect=lambda model_name: object())
+
+        first = _shared_embedding_function(function_cls, "model-a")
+        assert _shared_embedding_function(function_cls, "model-a") is first
+        assert _shared_embedding_function(function_cls, "model-b") is not first
+        assert function_cls.call_count == 2
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
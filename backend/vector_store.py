@@ -1,13 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import chromadb
+import numpy as np
+import orjson
 from chromadb.config import Settings
+from fast_search import ContentMatrix, nearest
 from models import Course, CourseChunk
-from sentence_transformers import SentenceTransformer
+from response_cache import ResponseCache
 
 
-@dataclass
+@dataclass(frozen=True)
 class SearchResults:
     """Container for search results with metadata"""
 
@@ -17,17 +22,23 @@ class SearchResults:
     error: Optional[str] = None
 
     @classmethod
-    def from_chroma(cls, chroma_results: Dict) -> "SearchResults":
-        """Create SearchResults from ChromaDB query results"""
+    def from_chroma(cls, chroma_results: Dict, index: int = 0) -> "SearchResults":
+        """Create SearchResults from ChromaDB query results (one query's worth)"""
         return cls(
             documents=(
-                chroma_results["documents"][0] if chroma_results["documents"] else []
+                chroma_results["documents"][index]
+                if chroma_results["documents"]
+                else []
             ),
             metadata=(
-                chroma_results["metadatas"][0] if chroma_results["metadatas"] else []
+                chroma_results["metadatas"][index]
+                if chroma_results["metadatas"]
+                else []
             ),
             distances=(
-                chroma_results["distances"][0] if chroma_results["distances"] else []
+                chroma_results["distances"][index]
+                if chroma_results["distances"]
+                else []
             ),
         )
 
@@ -41,22 +52,155 @@ class SearchResults:
         return len(self.documents) == 0
 
 
+@dataclass(frozen=True)
+class SearchQuery:
+    """One search for VectorStore.search_many, with search()'s arguments"""
+
+    query: str
+    course_name: Optional[str] = None
+    lesson_number: Optional[int] = None
+    limit: Optional[int] = None
+
+
+def _search_key(q: SearchQuery) -> Tuple:
+    """Search cache key, the same one search() uses"""
+    return (q.query, q.course_name, q.lesson_number, q.limit)
+
+
+def _lesson_link(
+    metadata: Optional[Dict[str, Any]], lesson_number: Optional[int]
+) -> Optional[str]:
+    """Link of a lesson in parsed catalog metadata, if it has one"""
+    if metadata is None or lesson_number is None:
+        return None
+    for lesson in metadata["lessons"]:
+        if lesson.get("lesson_number") == lesson_number:
+            return lesson.get("lesson_link")
+    return None
+
+
+@lru_cache(maxsize=4)
+def _shared_embedding_function(function_cls: type, model_name: str):
+    """
+    One embedding function per model, shared by every VectorStore.
+
+    Keyed on the class too, so a patched embedding function class never
+    receives an instance cached before the patch.
+    """
+    return function_cls(model_name=model_name)
+
+
+def _without_none(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop unset fields: Chroma rejects None metadata values, and readers .get()"""
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+# Cosine HNSW tuned for small corpora: a sparser graph and a shorter search
+# beam than Chroma's L2 defaults (max_neighbors=16, ef_construction=100,
+# ef_search=100). Only applies to collections created with it; existing ones
+# keep the configuration they were built with.
+COSINE_HNSW: Dict[str, Any] = {
+    "space": "cosine",
+    "max_neighbors": 16,
+    "ef_construction": 64,
+    "ef_search": 40,
+}
+
+
 class VectorStore:
     """Vector storage using ChromaDB for course content and metadata"""
 
-    def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
-        self.max_results = max_results
+    def __init__(
+        self,
+        chroma_path: str,
+        embedding_model: str,
+        max_results: int = 5,
+        embedding_function=None,
+        hnsw: Optional[Dict[str, Any]] = None,
+        search_cache: Optional[ResponseCache] = None,
+        exact_search_max: int = 0,
+        exact_search_int8: bool = False,
+    ):
         # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
+        client = chromadb.PersistentClient(
             path=chroma_path, settings=Settings(anonymized_telemetry=False)
         )
+        self._setup(
+            client,
+            embedding_model,
+            max_results,
+            embedding_function,
+            hnsw,
+            search_cache,
+            exact_search_max,
+            exact_search_int8,
+        )
 
-        # Set up sentence transformer embedding function
-        self.embedding_function = (
-            chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name=embedding_model
-            )
+    @classmethod
+    def from_client(
+        cls,
+        client,
+        embedding_model: str,
+        max_results: int = 5,
+        embedding_function=None,
+        hnsw: Optional[Dict[str, Any]] = None,
+        search_cache: Optional[ResponseCache] = None,
+        exact_search_max: int = 0,
+        exact_search_int8: bool = False,
+    ) -> "VectorStore":
+        """Create a store on an existing ChromaDB client, e.g. an in-memory one"""
+        store = cls.__new__(cls)
+        store._setup(
+            client,
+            embedding_model,
+            max_results,
+            embedding_function,
+            hnsw,
+            search_cache,
+            exact_search_max,
+            exact_search_int8,
         )
+        return store
+
+    def _setup(
+        self,
+        client,
+        embedding_model: str,
+        max_results: int,
+        embedding_function,
+        hnsw: Optional[Dict[str, Any]],
+        search_cache: Optional[ResponseCache],
+        exact_search_max: int,
+        exact_search_int8: bool,
+    ):
+        self.max_results = max_results
+        self.client = client
+        self.hnsw = hnsw
+        # Optional cache of search results, cleared whenever the data changes
+        self.search_cache = search_cache
+        # Course titles (lowercased -> title) and their embeddings, loaded
+        # from the catalog on first use
+        self._known_titles: Optional[Dict[str, str]] = None
+        # Parsed catalog metadata by title, dropped on every catalog write
+        self._catalog_cache: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._title_ids: List[str] = []
+        self._title_embeddings: Optional[np.ndarray] = None
+        # Content collections up to this many chunks are searched by an exact
+        # scan over an in-memory copy (0 disables it); loaded on first search
+        self.exact_search_max = exact_search_max
+        # Keep that copy as int8 codes, re-scoring a shortlist in float32
+        self.exact_search_int8 = exact_search_int8
+        self._exact_matrix: Optional[ContentMatrix] = None
+        self._exact_loaded = False
+
+        # Set up sentence transformer embedding function, unless one is given
+        # (tests pass a cheap deterministic one)
+        if embedding_function is None:
+            embedding_function = _shared_embedding_function(
+                chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction,
+                embedding_model,
+            )
+        self.embedding_function = embedding_function
 
         # Create collections for different types of data
         self.course_catalog = self._create_collection(
@@ -67,9 +211,12 @@ class VectorStore:
         )  # Actual course material
 
     def _create_collection(self, name: str):
-        """Create or get a ChromaDB collection"""
+        """Create or get a ChromaDB collection, with the store's HNSW settings if any"""
+        configuration = {"hnsw": self.hnsw} if self.hnsw else None
         return self.client.get_or_create_collection(
-            name=name, embedding_function=self.embedding_function
+            name=name,
+            embedding_function=self.embedding_function,
+            configuration=configuration,
         )
 
     def search(
@@ -91,6 +238,17 @@ class VectorStore:
         Returns:
             SearchResults object with documents and metadata
         """
+        if self.search_cache is not None:
+            return self._search_cached(query, course_name, lesson_number, limit)
+        return self._search(query, course_name, lesson_number, limit)
+
+    def _search(
+        self,
+        query: str,
+        course_name: Optional[str],
+        lesson_number: Optional[int],
+        limit: Optional[int],
+    ) -> SearchResults:
         # Step 1: Resolve course name if provided
         course_title = None
         if course_name:
@@ -105,6 +263,16 @@ class VectorStore:
         # Use provided limit or fall back to configured max_results
         search_limit = limit if limit is not None else self.max_results
 
+        if self.exact_search_max:
+            try:
+                results = self._exact_search(
+                    query, course_title, lesson_number, search_limit
+                )
+            except Exception as e:
+                return SearchResults.empty(f"Search error: {str(e)}")
+            if results is not None:
+                return results
+
         try:
             results = self.course_content.query(
                 query_texts=[query], n_results=search_limit, where=filter_dict
@@ -113,14 +281,285 @@ class VectorStore:
         except Exception as e:
             return SearchResults.empty(f"Search error: {str(e)}")
 
+    def _load_exact_matrix(self):
+        """Copy the content collection into memory if it is small enough"""
+        self._exact_loaded = True
+        self._exact_matrix = None
+        if self.course_content.count() > self.exact_search_max:
+            return
+
+        stored = self.course_content.get(
+            include=["embeddings", "documents", "metadatas"]
+        )
+        if len(stored["ids"]) == 0:
+            return
+        self._exact_matrix = ContentMatrix(
+            stored["embeddings"],
+            stored["documents"],
+            stored["metadatas"],
+            space=self.course_content.configuration["hnsw"]["space"],
+            ids=stored["ids"],
+            fetch_embeddings=(
+                self._fetch_content_embeddings if self.exact_search_int8 else None
+            ),
+        )
+
+    def _fetch_content_embeddings(self, ids: List[str]) -> np.ndarray:
+        """Stored float32 embeddings of content chunks, in the order given"""
+        stored = self.course_content.get(ids=ids, include=["embeddings"])
+        by_id = dict(zip(stored["ids"], stored["embeddings"]))
+        return np.array([by_id[chunk_id] for chunk_id in ids], dtype=np.float32)
+
+    def _exact_search(
+        self,
+        query: str,
+        course_title: Optional[str],
+        lesson_number: Optional[int],
+        limit: int,
+    ) -> Optional[SearchResults]:
+        """Exact scan of the in-memory copy, or None if the corpus is too big"""
+        if not self._exact_loaded:
+            self._load_exact_matrix()
+        if self._exact_matrix is None:
+            return None
+
+        query_embedding = self.embedding_function([query])[0]
+        documents, metadata, distances = self._exact_matrix.search(
+            query_embedding, limit, course_title, lesson_number
+        )
+        return SearchResults(
+            documents=documents, metadata=metadata, distances=distances
+        )
+
+    def _search_cached(
+        self,
+        query: str,
+        course_name: Optional[str],
+        lesson_number: Optional[int],
+        limit: Optional[int],
+    ) -> SearchResults:
+        """search() through the search cache; errors are never cached"""
+        key = (query, course_name, lesson_number, limit)
+        results = self.search_cache.get(key)
+        if results is None:
+            results = self._search(query, course_name, lesson_number, limit)
+            if results.error is None:
+                self.search_cache.set(key, results)
+        return results
+
+    def _invalidate_search_cache(self):
+        if self.search_cache is not None:
+            self.search_cache.clear()
+
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Search cache size and hit/miss counts, or None when caching is off"""
+        if self.search_cache is None:
+            return None
+        return self.search_cache.stats()
+
+    def search_many(
+        self, queries: List[SearchQuery], max_workers: int = 4
+    ) -> List[SearchResults]:
+        """
+        Run several searches at once; results come back in the order asked.
+
+        Course names are resolved in one catalog query and every query text is
+        embedded in one batch. Searches sharing a filter and limit then go to
+        the content collection together, one query per group, with groups run
+        on a small thread pool.
+
+        Args:
+            queries: Searches to run
+            max_workers: Most content queries in flight at once
+
+        Returns:
+            One SearchResults per query, as search() would return it
+        """
+        results = [self._cached_search(q) for q in queries]
+        pending = [i for i, found in enumerate(results) if found is None]
+        if not pending:
+            return results
+
+        groups = self._group_searches(queries, pending, results)
+        if not groups:
+            return results
+
+        texts = list({queries[i].query for indices in groups.values() for i in indices})
+        try:
+            embeddings = dict(zip(texts, self.embedding_function(texts)))
+        except Exception as e:
+            error = SearchResults.empty(f"Search error: {str(e)}")
+            return [error if found is None else found for found in results]
+
+        def run_group(group):
+            filters, indices = group
+            return self._run_search_group(
+                filters, [embeddings[queries[i].query] for i in indices]
+            )
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as pool:
+            for (_, indices), group_results in zip(
+                groups.items(), pool.map(run_group, groups.items())
+            ):
+                for i, found in zip(indices, group_results):
+                    results[i] = found
+                    if self.search_cache is not None and found.error is None:
+                        self.search_cache.set(_search_key(queries[i]), found)
+        return results
+
+    def _cached_search(self, q: SearchQuery) -> Optional[SearchResults]:
+        if self.search_cache is None:
+            return None
+        return self.search_cache.get(_search_key(q))
+
+    def _group_searches(
+        self,
+        queries: List[SearchQuery],
+        pending: List[int],
+        results: List[Optional[SearchResults]],
+    ) -> Dict[Tuple, List[int]]:
+        """
+        Group pending searches by (course title, lesson number, limit).
+
+        Searches naming a course that cannot be resolved get their error
+        result here and join no group.
+        """
+        course_titles = self._resolve_course_names(
+            {queries[i].course_name for i in pending if queries[i].course_name}
+        )
+
+        groups: Dict[Tuple, List[int]] = {}
+        for i in pending:
+            q = queries[i]
+            course_title = None
+            if q.course_name:
+                course_title = course_titles.get(q.course_name)
+                if not course_title:
+                    results[i] = SearchResults.empty(
+                        f"No course found matching '{q.course_name}'"
+                    )
+                    continue
+            limit = q.limit if q.limit is not None else self.max_results
+            groups.setdefault((course_title, q.lesson_number, limit), []).append(i)
+        return groups
+
+    def _run_search_group(
+        self, filters: Tuple, query_embeddings: List
+    ) -> List[SearchResults]:
+        """Content search for embeddings sharing one filter and limit"""
+        course_title, lesson_number, limit = filters
+        try:
+            if self.exact_search_max:
+                if not self._exact_loaded:
+                    self._load_exact_matrix()
+                if self._exact_matrix is not None:
+                    return [
+                        SearchResults(
+                            *self._exact_matrix.search(
+                                embedding, limit, course_title, lesson_number
+                            )
+                        )
+                        for embedding in query_embeddings
+                    ]
+
+            chroma_results = self.course_content.query(
+                query_embeddings=query_embeddings,
+                n_results=limit,
+                where=self._build_filter(course_title, lesson_number),
+            )
+            return [
+                SearchResults.from_chroma(chroma_results, n)
+                for n in range(len(query_embeddings))
+            ]
+        except Exception as e:
+            return [SearchResults.empty(f"Search error: {str(e)}")] * len(
+                query_embeddings
+            )
+
+    def _resolve_course_names(self, course_names) -> Dict[str, str]:
+        """_resolve_course_name for several names, embedding them in one batch"""
+        resolved = {}
+        for name in course_names:
+            title = self.match_course_title(name)
+            if title:
+                resolved[name] = title
+        course_names = [name for name in course_names if name not in resolved]
+        if not course_names:
+            return resolved
+
+        try:
+            resolved.update(self._closest_titles(course_names))
+        except Exception as e:
+            print(f"Error resolving course name: {e}")
+        return resolved
+
+    def _load_titles(self):
+        """Load catalog titles and their stored embeddings into memory"""
+        try:
+            stored = self.course_catalog.get(include=["embeddings"])
+            titles, embeddings = stored["ids"], stored["embeddings"]
+        except Exception as e:
+            print(f"Error getting existing course titles: {e}")
+            titles, embeddings = [], []
+
+        self._known_titles = {title.lower(): title for title in titles}
+        self._title_ids = list(titles)
+        self._title_embeddings = (
+            np.asarray(embeddings, dtype=np.float32) if len(titles) else None
+        )
+        self._title_space = self.course_catalog.configuration["hnsw"]["space"]
+
+    def _closest_titles(self, course_names: List[str]) -> Dict[str, str]:
+        """
+        Nearest catalog title for each name, by embedding similarity.
+
+        Titles were embedded once at ingest, so only the names are embedded
+        here, and the search over the (small) catalog is an exact scan.
+        """
+        if self._known_titles is None:
+            self._load_titles()
+        if self._title_embeddings is None:
+            return {}
+
+        closest = {}
+        for name, embedding in zip(course_names, self.embedding_function(course_names)):
+            indices, _ = nearest(
+                embedding, self._title_embeddings, 1, self._title_space
+            )
+            closest[name] = self._title_ids[indices[0]]
+        return closest
+
+    def match_course_title(self, course_name: str) -> Optional[str]:
+        """
+        Resolve a name without a vector search, when that is unambiguous.
+
+        An exact title (ignoring case) wins; otherwise the name must be part
+        of exactly one title, e.g. "Python" for "Introduction to Python".
+        Returns None when neither holds, where search would fall back to
+        the closest title by embedding.
+        """
+        if self._known_titles is None:
+            self._load_titles()
+
+        name = course_name.strip().lower()
+        if not name:
+            return None
+        if name in self._known_titles:
+            return self._known_titles[name]
+
+        matches = [
+            title for lowered, title in self._known_titles.items() if name in lowered
+        ]
+        return matches[0] if len(matches) == 1 else None
+
     def _resolve_course_name(self, course_name: str) -> Optional[str]:
         """Use vector search to find best matching course by name"""
-        try:
-            results = self.course_catalog.query(query_texts=[course_name], n_results=1)
+        title = self.match_course_title(course_name)
+        if title:
+            return title
 
-            if results["documents"][0] and results["metadatas"][0]:
-                # Return the title (which is now the ID)
-                return results["metadatas"][0][0]["title"]
+        try:
+            return self._closest_titles([course_name]).get(course_name)
         except Exception as e:
             print(f"Error resolving course name: {e}")
 
@@ -147,38 +586,52 @@ class VectorStore:
 
         return {"lesson_number": lesson_number}
 
-    def add_course_metadata(self, course: Course):
-        """Add course information to the catalog for semantic search"""
-        import json
-
-        course_text = course.title
+    def add_course_metadata(self, *courses: Course):
+        """Add course information to the catalog for semantic search, in one batch"""
+        if not courses:
+            return
 
-        # Build lessons metadata and serialize as JSON string
-        lessons_metadata = []
-        for lesson in course.lessons:
-            lessons_metadata.append(
-                {
-                    "lesson_number": lesson.lesson_number,
-                    "lesson_title": lesson.title,
-                    "lesson_link": lesson.lesson_link,
-                }
+        documents, metadatas = [], []
+        for course in courses:
+            # Build lessons metadata and serialize as JSON string
+            lessons_metadata = []
+            for lesson in course.lessons:
+                lessons_metadata.append(
+                    {
+                        "lesson_number": lesson.lesson_number,
+                        "lesson_title": lesson.title,
+                        "lesson_link": lesson.lesson_link,
+                    }
+                )
+
+            documents.append(course.title)
+            metadatas.append(
+                _without_none(
+                    {
+                        "title": course.title,
+                        "instructor": course.instructor,
+                        "course_link": course.course_link,
+                        # Serialize as JSON string
+                        "lessons_json": orjson.dumps(lessons_metadata).decode(),
+                        "lesson_count": len(course.lessons),
+                    }
+                )
             )
 
+        # Embed the titles here, once, so name resolution can reuse the vectors
+        embeddings = self.embedding_function(documents)
+
+        # Course title is the ID
         self.course_catalog.add(
-            documents=[course_text],
-            metadatas=[
-                {
-                    "title": course.title,
-                    "instructor": course.instructor,
-                    "course_link": course.course_link,
-                    "lessons_json": json.dumps(
-                        lessons_metadata
-                    ),  # Serialize as JSON string
-                    "lesson_count": len(course.lessons),
-                }
-            ],
-            ids=[course.title],
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=documents,
         )
+        if self._known_titles is not None:
+            self._add_known_titles(documents, embeddings)
+        self._catalog_cache.clear()
+        self._invalidate_search_cache()
 
     def add_course_content(self, chunks: List[CourseChunk]):
         """Add course content chunks to the vector store"""
@@ -187,11 +640,13 @@ class VectorStore:
 
         documents = [chunk.content for chunk in chunks]
         metadatas = [
-            {
-                "course_title": chunk.course_title,
-                "lesson_number": chunk.lesson_number,
-                "chunk_index": chunk.chunk_index,
-            }
+            _without_none(
+                {
+                    "course_title": chunk.course_title,
+                    "lesson_number": chunk.lesson_number,
+                    "chunk_index": chunk.chunk_index,
+                }
+            )
             for chunk in chunks
         ]
         # Use title with chunk index for unique IDs
@@ -201,9 +656,44 @@ class VectorStore:
         ]
 
         self.course_content.add(documents=documents, metadatas=metadatas, ids=ids)
+        self._invalidate_search_cache()
+        self._exact_loaded = False
+
+    def _add_known_titles(self, titles: List[str], embeddings):
+        """Extend the in-memory title list after a catalog write"""
+        new = [
+            (title, embedding)
+            for title, embedding in zip(titles, embeddings)
+            if title.lower() not in self._known_titles
+        ]
+        if not new:
+            return
+
+        self._known_titles.update((title.lower(), title) for title, _ in new)
+        self._title_ids.extend(title for title, _ in new)
+        rows = np.asarray([embedding for _, embedding in new], dtype=np.float32)
+        self._title_embeddings = (
+            rows
+            if self._title_embeddings is None
+            else np.vstack([self._title_embeddings, rows])
+        )
+
+    def delete_course_metadata(self, course_titles: List[str]):
+        """Remove courses from the catalog, e.g. to undo a failed ingest"""
+        if not course_titles:
+            return
+        self.course_catalog.delete(ids=list(course_titles))
+        # Title list and embeddings are reloaded from the catalog on next use
+        self._known_titles = None
+        self._catalog_cache.clear()
+        self._invalidate_search_cache()
 
     def clear_all_data(self):
         """Clear all data from both collections"""
+        self._invalidate_search_cache()
+        self._known_titles = None
+        self._catalog_cache.clear()
+        self._exact_loaded = False
         try:
             self.client.delete_collection("course_catalog")
             self.client.delete_collection("course_content")
@@ -238,8 +728,6 @@ class VectorStore:
 
     def get_all_courses_metadata(self) -> List[Dict[str, Any]]:
         """Get metadata for all courses in the vector store"""
-        import json
-
         try:
             results = self.course_catalog.get()
             if results and "metadatas" in results:
@@ -248,7 +736,9 @@ class VectorStore:
                 for metadata in results["metadatas"]:
                     course_meta = metadata.copy()
                     if "lessons_json" in course_meta:
-                        course_meta["lessons"] = json.loads(course_meta["lessons_json"])
+                        course_meta["lessons"] = orjson.loads(
+                            course_meta["lessons_json"]
+                        )
                         del course_meta[
                             "lessons_json"
                         ]  # Remove the JSON string version
@@ -259,35 +749,87 @@ class VectorStore:
             print(f"Error getting courses metadata: {e}")
             return []
 
+    def _catalog_entries(
+        self, course_titles: List[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Catalog metadata for each title, with its lessons parsed.
+
+        Titles not seen since the catalog last changed are fetched in one read;
+        entries are then memoized until the next catalog write. Unknown titles
+        map to None.
+        """
+        missing = [
+            title
+            for title in dict.fromkeys(course_titles)
+            if title not in self._catalog_cache
+        ]
+        if missing:
+            results = self.course_catalog.get(ids=missing, include=["metadatas"])
+            found = dict(zip(results["ids"], results["metadatas"]))
+            for title in missing:
+                metadata = found.get(title)
+                if metadata is not None:
+                    metadata = dict(metadata)
+                    metadata["lessons"] = orjson.loads(
+                        metadata.get("lessons_json") or "[]"
+                    )
+                self._catalog_cache[title] = metadata
+        return {title: self._catalog_cache[title] for title in course_titles}
+
+    def get_course_metadata(self, course_title: str) -> Optional[Dict[str, Any]]:
+        """
+        Catalog metadata for a course, or None if it is not in the catalog.
+
+        Adds the parsed lesson list under "lessons". The dict is shared by
+        later calls until the catalog changes, so callers must not modify it.
+        """
+        return self._catalog_entries([course_title])[course_title]
+
     def get_course_link(self, course_title: str) -> Optional[str]:
         """Get course link for a given course title"""
         try:
-            # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
-            if results and "metadatas" in results and results["metadatas"]:
-                metadata = results["metadatas"][0]
-                return metadata.get("course_link")
-            return None
+            metadata = self._catalog_entries([course_title])[course_title]
+            return metadata.get("course_link") if metadata else None
         except Exception as e:
             print(f"Error getting course link: {e}")
             return None
 
     def get_lesson_link(self, course_title: str, lesson_number: int) -> Optional[str]:
         """Get lesson link for a given course title and lesson number"""
-        import json
-
         try:
-            # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
-            if results and "metadatas" in results and results["metadatas"]:
-                metadata = results["metadatas"][0]
-                lessons_json = metadata.get("lessons_json")
-                if lessons_json:
-                    lessons = json.loads(lessons_json)
-                    # Find the lesson with matching number
-                    for lesson in lessons:
-                        if lesson.get("lesson_number") == lesson_number:
-                            return lesson.get("lesson_link")
-            return None
+            metadata = self._catalog_entries([course_title])[course_title]
+            return _lesson_link(metadata, lesson_number)
         except Exception as e:
             print(f"Error getting lesson link: {e}")
+            return None
+
+    def get_links_bulk(
+        self, contexts: List[Tuple[str, Optional[int]]]
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Lesson and course links for many (course title, lesson number) pairs.
+
+        All courses are read from the catalog at once, instead of one
+        get_lesson_link/get_course_link round trip per pair.
+
+        Returns:
+            One (lesson link, course link) tuple per pair; the lesson link is
+            None when the lesson number is None or unknown
+        """
+        try:
+            entries = self._catalog_entries([title for title, _ in contexts])
+        except Exception as e:
+            print(f"Error getting links: {e}")
+            return [(None, None)] * len(contexts)
+
+        links = []
+        for course_title, lesson_number in contexts:
+            metadata = entries[course_title]
+            links.append(
+                (
+                    _lesson_link(metadata, lesson_number),
+                    metadata.get("course_link") if metadata else None,
+                )
+            )
+        return links